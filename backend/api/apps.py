@@ -12,9 +12,10 @@ class ApiConfig(AppConfig):
     name = 'api'
     
     def ready(self):
-        """Initialize RotatingClient when Django app starts."""
+        """Initialize RotatingClient and AIService when Django app starts."""
         # Import here to avoid circular imports
-        from api.dependencies import initialize_rotating_client
+        from api.dependencies import initialize_ai_service, initialize_rotating_client
         
-        # Initialize the global RotatingClient singleton
+        # Initialize the global RotatingClient and AIService singletons
         initialize_rotating_client()
+        initialize_ai_service()
@@ -1,33 +1,59 @@
 """
 Dependency injection for RotatingClient and AIService.
 
-Uses Django app hooks for initialization instead of FastAPI lifespan.
+Both are process-wide singletons created by Django app hooks (ApiConfig.ready).
+Under ASGI, api.lifespan warms the AIService at startup and drains it at shutdown.
 """
 
 import os
 from typing import Optional
+from django.conf import settings
+from django.utils.module_loading import import_string
 from rotator_library import RotatingClient
 from api.services import AIService
 
-# Global singleton instance
+# Global singleton instances
 _rotating_client: Optional[RotatingClient] = None
+_ai_service: Optional[AIService] = None
 
 
 def initialize_rotating_client() -> RotatingClient:
     """
     Initialize RotatingClient singleton (called by Django AppConfig).
     
-    Auto-discovers API keys from environment variables.
+    Auto-discovers API keys from environment variables. The client class can
+    be replaced with settings.ROTATING_CLIENT_CLASS (a dotted path), e.g.
+    with benchmarks.fake_provider.FakeRotatingClient for load tests.
     """
     global _rotating_client
     
     if _rotating_client is None:
-        _rotating_client = RotatingClient()
-        print("✓ RotatingClient initialized successfully")
+        client_class = import_string(getattr(settings, 'ROTATING_CLIENT_CLASS', 'rotator_library.RotatingClient'))
+        _rotating_client = client_class()
+        print(f"✓ {client_class.__name__} initialized successfully")
     
     return _rotating_client
 
 
+def set_rotating_client(client) -> Optional[RotatingClient]:
+    """
+    Replace the RotatingClient singleton (load tests, in-process benchmarks).
+    
+    Args:
+        client: Object with the RotatingClient interface
+    
+    Returns:
+        The previous client, for restoring it afterwards
+    """
+    global _rotating_client
+    
+    previous = _rotating_client
+    _rotating_client = client
+    if _ai_service is not None:
+        _ai_service.client = client
+    return previous
+
+
 def get_rotating_client(request=None) -> RotatingClient:
     """
     Get RotatingClient instance (dependency injection).
@@ -49,6 +75,20 @@ def get_rotating_client(request=None) -> RotatingClient:
     return _rotating_client
 
 
+def initialize_ai_service() -> AIService:
+    """
+    Initialize AIService singleton (called by Django AppConfig).
+    
+    Uses the RotatingClient singleton, which must be initialized first.
+    """
+    global _ai_service
+    
+    if _ai_service is None:
+        _ai_service = AIService(get_rotating_client())
+    
+    return _ai_service
+
+
 def get_ai_service(request=None) -> AIService:
     """
     Get AIService instance (dependency injection).
@@ -57,7 +97,14 @@ def get_ai_service(request=None) -> AIService:
         request: Optional Django request object (unused, for compatibility)
     
     Returns:
-        AIService instance with initialized RotatingClient
+        Process-wide AIService instance
+    
+    Raises:
+        RuntimeError: If service not initialized
     """
-    client = get_rotating_client(request)
-    return AIService(client)
+    if _ai_service is None:
+        raise RuntimeError(
+            "AIService not initialized. "
+            "Ensure Django app has started properly."
+        )
+    return _ai_service
@@ -0,0 +1,53 @@
+"""
+ASGI lifespan handling for the AIService singleton.
+
+Django's ASGI handler does not implement the lifespan protocol, so
+LifespanApp wraps it: at server startup the AIService warms its shared caches
+and the cache connection pool, at shutdown it drains in-flight generations and
+closes the RotatingClient. All other connections go to the Django application.
+
+Servers without lifespan support (runserver, WSGI) skip both: connections
+and caches are then set up by the first requests that need them.
+"""
+
+import logging
+
+from django.conf import settings
+
+from api.dependencies import get_ai_service
+
+logger = logging.getLogger(__name__)
+
+
+class LifespanApp:
+    """ASGI application answering lifespan events and delegating everything else."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self._run(self.startup, 'startup', send)
+            elif message['type'] == 'lifespan.shutdown':
+                await self._run(self.shutdown, 'shutdown', send)
+                return
+
+    @staticmethod
+    async def _run(hook, event: str, send) -> None:
+        try:
+            await hook()
+        except Exception as e:
+            logger.exception(f"Lifespan {event} failed")
+            await send({'type': f'lifespan.{event}.failed', 'message': repr(e)})
+        else:
+            await send({'type': f'lifespan.{event}.complete'})
+
+    async def startup(self) -> None:
+        await get_ai_service().startup(timeout=getattr(settings, 'AI_SERVICE_WARMUP_TIMEOUT', 10.0))
+
+    async def shutdown(self) -> None:
+        await get_ai_service().shutdown(timeout=getattr(settings, 'AI_SERVICE_DRAIN_TIMEOUT', 30.0))
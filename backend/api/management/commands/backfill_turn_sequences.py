@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.models import Adventure, AdventureTurn
+
+
+class Command(BaseCommand):
+    help = 'Numbers turns of existing adventures (AdventureTurn.sequence) in timestamp order'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of turns written per bulk update (default: 500).',
+        )
+        parser.add_argument(
+            '--adventure',
+            type=int,
+            help='Only number turns of this adventure id.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # Adventures whose history predates sequence numbers
+        adventures = Adventure.objects.filter(turnSequence=0, adventureHistory__isnull=False).distinct()
+        if options['adventure']:
+            adventures = adventures.filter(pk=options['adventure'])
+
+        numbered = 0
+        for adventure_id in adventures.values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                # Lock the counter so no turn is appended while the history is numbered
+                Adventure.objects.select_for_update().filter(pk=adventure_id).values_list('id').get()
+                turns = AdventureTurn.objects.filter(adventure_id=adventure_id).order_by('timestamp', 'id').only('id')
+
+                sequence = 0
+                batch = []
+                for turn in turns.iterator(chunk_size=batch_size):
+                    sequence += 1
+                    turn.sequence = sequence
+                    batch.append(turn)
+                    if len(batch) >= batch_size:
+                        AdventureTurn.objects.bulk_update(batch, ['sequence'])
+                        batch = []
+                if batch:
+                    AdventureTurn.objects.bulk_update(batch, ['sequence'])
+
+                Adventure.objects.filter(pk=adventure_id).update(turnSequence=sequence)
+            numbered += 1
+            self.stdout.write(f'  Adventure {adventure_id}: {sequence} turns')
+
+        self.stdout.write(self.style.SUCCESS(f'Numbered turns of {numbered} adventures.'))
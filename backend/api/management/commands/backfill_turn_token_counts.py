@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import AdventureTurn
+from api.dependencies import get_rotating_client
+from api.services.token_counting import count_turn_tokens, get_tokenizer_family
+
+
+class Command(BaseCommand):
+    help = 'Backfills memoized per-turn token counts (AdventureTurn.tokenCounts) for a model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model',
+            help='Model whose tokenizer family is backfilled, e.g. gemini/gemini-1.5-flash',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of turns tokenized and written per batch (default: 500).',
+        )
+        parser.add_argument(
+            '--adventure',
+            type=int,
+            help='Only backfill turns of this adventure id.',
+        )
+
+    def handle(self, *args, **options):
+        model = options['model']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        client = get_rotating_client()
+        family = get_tokenizer_family(model)
+
+        queryset = AdventureTurn.objects.exclude(tokenCounts__has_key=family)
+        if options['adventure']:
+            queryset = queryset.filter(adventure_id=options['adventure'])
+
+        self.stdout.write(f'Backfilling token counts for tokenizer family "{family}"...')
+
+        processed = 0
+        last_id = 0
+        while True:
+            # Keyset pagination keeps each batch query cheap on large tables
+            batch = list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'role', 'text', 'tokenCounts')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for turn in batch:
+                counts = turn.tokenCounts or {}
+                counts[family] = count_turn_tokens(client, model, turn.role, turn.text)
+                turn.tokenCounts = counts
+
+            AdventureTurn.objects.bulk_update(batch, ['tokenCounts'])
+            processed += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'  {processed} turns processed (last id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled token counts for {processed} turns.'))
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import SnapshotBlob
+
+
+class Command(BaseCommand):
+    help = 'Deletes shared snapshot blobs that no adventure references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age-hours',
+            type=int,
+            default=24,
+            help='Only delete blobs created at least this many hours ago (default: 24), '
+                 'so blobs of adventures being started are kept.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many blobs would be deleted.',
+        )
+
+    def handle(self, *args, **options):
+        min_age = options['min_age_hours']
+        if min_age < 0:
+            raise CommandError('--min-age-hours must not be negative')
+
+        orphans = SnapshotBlob.objects.filter(
+            adventures__isnull=True,
+            createdAt__lte=timezone.now() - timedelta(hours=min_age),
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{orphans.count()} unreferenced snapshot blobs would be deleted.')
+            return
+
+        deleted, _ = orphans.delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unreferenced snapshot blobs.'))
@@ -0,0 +1,55 @@
+"""
+Middleware for ImaginAI backend.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from api.services.request_timing import request_timing
+from api.utils.timing import activate
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request and report it as a Server-Timing header and to the timing sinks.
+
+    Views add stages with api.utils.timing.span() and labels (e.g. the model)
+    with set_label(); the endpoint label is the URL name. Removed from the
+    middleware chain unless REQUEST_TIMING_ENABLED is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not request_timing.enabled:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing = request_timing.start()
+        with activate(timing):
+            response = self.get_response(request)
+        self._finish(request, response, timing)
+        return response
+
+    async def __acall__(self, request):
+        timing = request_timing.start()
+        with activate(timing):
+            response = await self.get_response(request)
+        self._finish(request, response, timing)
+        return response
+
+    @staticmethod
+    def _finish(request, response, timing):
+        match = request.resolver_match
+        timing.labels.setdefault('endpoint', match.url_name if match and match.url_name else 'unmatched')
+        request_timing.finish(timing)
+        if request_timing.header:
+            # Streaming responses report the time until their headers were ready
+            response['Server-Timing'] = timing.server_timing()
@@ -3,12 +3,12 @@ Django models for ImaginAI backend.
 
 Models are organized by domain:
 - scenario: Scenario and Card models
-- adventure: Adventure and AdventureTurn models
+- adventure: Adventure, AdventureTurn, AdventureCard and SnapshotBlob models
 - settings: GlobalSettings and TokenUsageStats models
 """
 
 from .scenario import Scenario, Card
-from .adventure import Adventure, AdventureTurn
+from .adventure import Adventure, AdventureTurn, AdventureCard, SnapshotBlob
 from .settings import GlobalSettings, TokenUsageStats
 
 __all__ = [
@@ -16,6 +16,8 @@ __all__ = [
     'Card',
     'Adventure',
     'AdventureTurn',
+    'AdventureCard',
+    'SnapshotBlob',
     'GlobalSettings',
     'TokenUsageStats',
 ]
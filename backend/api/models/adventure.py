@@ -3,6 +3,24 @@ from django.utils import timezone
 from .scenario import Scenario
 
 
+class SnapshotBlob(models.Model):
+    """Content-addressed, immutable story card set shared by adventures (card storage 'shared')."""
+    
+    # sha256 of the canonical JSON of cards
+    hash = models.CharField(max_length=64, primary_key=True)
+    cards = models.JSONField(help_text="Frozen story cards, in snapshot order")
+    cardCount = models.PositiveIntegerField(default=0)
+    
+    createdAt = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Snapshot Blob"
+        verbose_name_plural = "Snapshot Blobs"
+    
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.cardCount} cards)"
+
+
 class Adventure(models.Model):
     """An active story adventure derived from a scenario."""
     
@@ -28,6 +46,44 @@ class Adventure(models.Model):
         verbose_name="Scenario Snapshot",
         help_text="Frozen copy of scenario state at adventure creation"
     )
+    # Where the snapshot's story cards live
+    CARD_STORAGE_CHOICES = [
+        ('snapshot', 'Snapshot JSON'),
+        ('table', 'Adventure card table'),
+        ('shared', 'Shared snapshot blob'),
+    ]
+    cardStorage = models.CharField(
+        max_length=10,
+        choices=CARD_STORAGE_CHOICES,
+        default='snapshot',
+        verbose_name="Card Storage",
+        help_text="'table' keeps snapshot cards in AdventureCard rows, 'shared' in a SnapshotBlob "
+                  "plus snapshotOverlay, instead of scenarioSnapshot['cards']"
+    )
+    # Card storage 'shared': base cards shared by hash, plus this adventure's card edits
+    snapshotBlob = models.ForeignKey(
+        SnapshotBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='adventures'
+    )
+    snapshotOverlay = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Snapshot Overlay",
+        help_text="Card edits applied on top of snapshotBlob"
+    )
+    snapshotVersion = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Snapshot Version",
+        help_text="Incremented by every snapshot card edit (optimistic concurrency)"
+    )
+    turnSequence = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Turn Sequence",
+        help_text="Last sequence number allocated to a turn of this adventure"
+    )
     
     # Timestamps
     createdAt = models.DateTimeField(auto_now_add=True)
@@ -79,6 +135,13 @@ class AdventureTurn(models.Model):
     # Token usage (legacy JSON field kept for compatibility)
     tokenUsage = models.JSONField(null=True, blank=True)
     
+    # Memoized prompt token count of this turn, keyed by tokenizer family
+    tokenCounts = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Prompt token count of this turn per tokenizer family"
+    )
+    
     # Link to detailed token stats
     token_usage = models.OneToOneField(
         'TokenUsageStats',
@@ -88,16 +151,58 @@ class AdventureTurn(models.Model):
         related_name='turn'
     )
     
+    # Position in the adventure (from Adventure.turnSequence); history is
+    # ordered by (sequence, id), never by wall-clock time
+    sequence = models.PositiveIntegerField(default=0)
+    
     # Timestamp
     timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        ordering = ['timestamp']
+        ordering = ['sequence', 'id']
         indexes = [
-            models.Index(fields=['adventure', 'timestamp']),
+            models.Index(fields=['adventure', 'sequence', 'id']),
         ]
         verbose_name = "Adventure Turn"
         verbose_name_plural = "Adventure Turns"
     
     def __str__(self):
         return f'{self.role} turn in {self.adventure.adventureName}'
+
+
+class AdventureCard(models.Model):
+    """A story card frozen into an adventure (card storage mode 'table')."""
+    
+    # Relationships
+    adventure = models.ForeignKey(
+        Adventure,
+        on_delete=models.CASCADE,
+        related_name='snapshotCards'
+    )
+    
+    # Card id as it appears in the snapshot (scenario card id or generated uuid)
+    cardId = models.CharField(max_length=64)
+    position = models.PositiveIntegerField(default=0)
+    
+    # Card fields (same names as the snapshot card dicts; NULL if the card has no such key)
+    title = models.CharField(max_length=255, null=True, blank=True)
+    card_type = models.CharField(max_length=50, null=True, blank=True)
+    trigger_words = models.TextField(null=True, blank=True)
+    short_description = models.TextField(null=True, blank=True)
+    full_content = models.TextField(null=True, blank=True)
+    
+    # Any other keys of the snapshot card dict
+    extra = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['adventure', 'cardId']),
+            models.Index(fields=['adventure', 'position']),
+            models.Index(fields=['adventure', 'card_type']),
+        ]
+        verbose_name = "Adventure Card"
+        verbose_name_plural = "Adventure Cards"
+    
+    def __str__(self):
+        return f"{self.title} ({self.card_type})"
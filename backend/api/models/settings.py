@@ -9,6 +9,8 @@ class TokenUsageStats(models.Model):
     api_reported_prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
     api_reported_output_tokens = models.PositiveIntegerField(null=True, blank=True)
     api_reported_thinking_tokens = models.PositiveIntegerField(null=True, blank=True)
+    # Prompt tokens served from the provider's prompt cache
+    api_reported_cached_prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
     
     # Precise input breakdown (from individual token counts)
     precise_system_instruction_block_tokens = models.PositiveIntegerField(
@@ -36,6 +38,9 @@ class TokenUsageStats(models.Model):
         null=True, blank=True
     )
     
+    # Share of the prompt repeated from the adventure's previous prompt
+    prefix_hit_ratio = models.FloatField(null=True, blank=True)
+    
     # Metadata
     timestamp = models.DateTimeField(default=timezone.now)
     model_used = models.CharField(max_length=100, null=True, blank=True)
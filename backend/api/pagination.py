@@ -0,0 +1,26 @@
+"""
+Pagination classes for ImaginAI backend.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class AdventureTurnCursorPagination(CursorPagination):
+    """
+    Cursor pagination over one adventure's turns.
+    
+    Ordered by (sequence, id) so pages are served from the
+    (adventure, sequence, id) index and stay stable while new turns are appended.
+    Pass ?order=newest to page backwards from the latest turn.
+    """
+    
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('sequence', 'id')
+    newest_first_ordering = ('-sequence', '-id')
+    
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('order') == 'newest':
+            return self.newest_first_ordering
+        return self.ordering
@@ -12,6 +12,7 @@ from .scenario_serializers import (
 )
 from .adventure_serializers import (
     AdventureSerializer,
+    AdventureListSerializer,
     AdventureTurnSerializer,
     TokenUsageStatsSerializer
 )
@@ -23,6 +24,7 @@ __all__ = [
     'AIDExportSerializer',
     'AIDImportSerializer',
     'AdventureSerializer',
+    'AdventureListSerializer',
     'AdventureTurnSerializer',
     'TokenUsageStatsSerializer',
     'GlobalSettingsSerializer',
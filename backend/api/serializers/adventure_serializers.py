@@ -2,8 +2,18 @@
 Serializers for adventure-related models.
 """
 
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from api.models import Adventure, AdventureTurn, TokenUsageStats
+from api.services.adventure_cards import (
+    keeps_cards_in_snapshot,
+    list_adventure_cards,
+    replace_adventure_cards,
+    uses_card_table,
+)
+from api.services.snapshot_blobs import blob_for_cards
+from api.services.snapshot_cards import SnapshotConflict
 
 
 class TokenUsageStatsSerializer(serializers.ModelSerializer):
@@ -21,6 +31,10 @@ class TokenUsageStatsSerializer(serializers.ModelSerializer):
         source='api_reported_thinking_tokens',
         required=False
     )
+    apiReportedCachedPromptTokens = serializers.IntegerField(
+        source='api_reported_cached_prompt_tokens',
+        required=False
+    )
     preciseSystemInstructionBlockTokens = serializers.IntegerField(
         source='precise_system_instruction_block_tokens',
         required=False
@@ -53,6 +67,7 @@ class TokenUsageStatsSerializer(serializers.ModelSerializer):
         source='total_input_tokens_from_precise_sum',
         required=False
     )
+    prefixHitRatio = serializers.FloatField(source='prefix_hit_ratio', required=False)
     modelUsed = serializers.CharField(source='model_used', required=False)
     promptPayload = serializers.JSONField(source='prompt_payload', required=False)
     
@@ -62,6 +77,7 @@ class TokenUsageStatsSerializer(serializers.ModelSerializer):
             'apiReportedPromptTokens',
             'apiReportedOutputTokens',
             'apiReportedThinkingTokens',
+            'apiReportedCachedPromptTokens',
             'preciseSystemInstructionBlockTokens',
             'preciseScenarioInstructionsTokens',
             'precisePlotEssentialsTokens',
@@ -70,6 +86,7 @@ class TokenUsageStatsSerializer(serializers.ModelSerializer):
             'preciseCardsTokens',
             'preciseCurrentUserMessageTokens',
             'totalInputTokensFromPreciseSum',
+            'prefixHitRatio',
             'timestamp',
             'modelUsed',
             'promptPayload'
@@ -88,17 +105,20 @@ class AdventureTurnSerializer(serializers.ModelSerializer):
             'adventure',
             'role',
             'text',
+            'sequence',
             'timestamp',
             'actionType',
             'tokenUsage'
         ]
-        read_only_fields = ['id', 'timestamp', 'tokenUsage']
+        read_only_fields = ['id', 'sequence', 'timestamp', 'tokenUsage']
 
 
 class AdventureSerializer(serializers.ModelSerializer):
     """Serializer for adventures with history."""
     
     adventureHistory = AdventureTurnSerializer(many=True, read_only=True)
+    # On writes: the version the client last saw, checked when scenarioSnapshot is replaced
+    snapshotVersion = serializers.IntegerField(required=False, min_value=0)
     
     class Meta:
         model = Adventure
@@ -108,8 +128,77 @@ class AdventureSerializer(serializers.ModelSerializer):
             'sourceScenarioName',
             'adventureName',
             'scenarioSnapshot',
+            'snapshotVersion',
             'createdAt',
             'lastPlayedAt',
             'adventureHistory'
         ]
         read_only_fields = ['id', 'createdAt', 'lastPlayedAt']
+    
+    def to_representation(self, instance):
+        """Expose table- and blob-stored cards under scenarioSnapshot['cards'], as in snapshot mode."""
+        data = super().to_representation(instance)
+        if not keeps_cards_in_snapshot(instance) and 'scenarioSnapshot' in data:
+            data['scenarioSnapshot'] = {
+                **(data['scenarioSnapshot'] or {}),
+                'cards': list_adventure_cards(instance),
+            }
+        return data
+    
+    def create(self, validated_data):
+        validated_data.pop('snapshotVersion', None)
+        return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        """
+        Route scenarioSnapshot['cards'] writes to AdventureCard rows in table
+        mode, and to the blob of the new cards (with an empty overlay) in
+        shared mode.
+        
+        Replacing scenarioSnapshot increments snapshotVersion, like the card
+        mutations do. If the request carries snapshotVersion, it must match the
+        current version, or SnapshotConflict is raised and nothing is written.
+        """
+        expected_version = validated_data.pop('snapshotVersion', None)
+        if 'scenarioSnapshot' not in validated_data:
+            return super().update(instance, validated_data)
+        
+        with transaction.atomic():
+            current_version = (
+                Adventure.objects.select_for_update()
+                .values_list('snapshotVersion', flat=True)
+                .get(pk=instance.pk)
+            )
+            if expected_version is not None and current_version != expected_version:
+                raise SnapshotConflict(current_version)
+            
+            snapshot = validated_data['scenarioSnapshot']
+            if not keeps_cards_in_snapshot(instance) and snapshot and 'cards' in snapshot:
+                snapshot = dict(snapshot)
+                cards = snapshot.pop('cards') or []
+                if uses_card_table(instance):
+                    replace_adventure_cards(instance, cards)
+                else:
+                    instance.snapshotBlob = blob_for_cards(cards)
+                    instance.snapshotOverlay = {}
+                validated_data['scenarioSnapshot'] = snapshot
+            instance.snapshotVersion = F('snapshotVersion') + 1
+            instance = super().update(instance, validated_data)
+        instance.refresh_from_db(fields=['snapshotVersion'])
+        return instance
+
+
+class AdventureListSerializer(serializers.ModelSerializer):
+    """Slim adventure representation for list views (no history or snapshot)."""
+    
+    class Meta:
+        model = Adventure
+        fields = [
+            'id',
+            'sourceScenario',
+            'sourceScenarioName',
+            'adventureName',
+            'createdAt',
+            'lastPlayedAt'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,281 @@
+"""
+Story card storage for adventures.
+
+An adventure keeps its frozen story cards in one of three places, chosen by
+Adventure.cardStorage when the adventure is started:
+
+- 'snapshot': scenarioSnapshot['cards'], a JSON array (the original layout)
+- 'table': AdventureCard rows, indexed by adventure and card id. Generation
+  then loads only card ids and trigger words up front and fetches full_content
+  for the triggered cards alone.
+- 'shared': a content-addressed SnapshotBlob referenced by every adventure
+  started from the same cards, plus a per-adventure overlay of card edits
+  (see api.services.snapshot_blobs). Starting and duplicating adventures
+  then copies no cards at all.
+
+All modes expose the same card dicts ({'id', 'title', 'card_type',
+'trigger_words', 'short_description', 'full_content', ...}) to the API and the
+prompt builder.
+"""
+
+import uuid
+from typing import Iterable, Optional, Tuple, Union
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from api.models import Adventure, AdventureCard
+from api.services.snapshot_blobs import SharedCardEditor, alist_shared_cards, list_shared_cards
+from api.services.snapshot_cards import SnapshotCardEditor, SnapshotCardNotFound, SnapshotConflict
+
+# AdventureCard columns holding the card dict keys of the same name
+CARD_FIELDS = ('title', 'card_type', 'trigger_words', 'short_description', 'full_content')
+
+# Rows per bulk_create round trip when copying cards
+CARD_BATCH_SIZE = 500
+
+CARD_STORAGE_MODES = {choice for choice, _ in Adventure.CARD_STORAGE_CHOICES}
+
+
+def uses_card_table(adventure: Adventure) -> bool:
+    return adventure.cardStorage == 'table'
+
+
+def uses_shared_blob(adventure: Adventure) -> bool:
+    return adventure.cardStorage == 'shared'
+
+
+def keeps_cards_in_snapshot(adventure: Adventure) -> bool:
+    """Whether the cards live in scenarioSnapshot['cards'] itself."""
+    return adventure.cardStorage == 'snapshot'
+
+
+def card_to_fields(card: dict) -> dict:
+    """Map a snapshot card dict to AdventureCard column values (without cardId)."""
+    fields = {name: card.get(name) for name in CARD_FIELDS}
+    fields['extra'] = {
+        key: value for key, value in card.items()
+        if key != 'id' and key not in CARD_FIELDS
+    }
+    return fields
+
+
+def row_to_card(values: dict) -> dict:
+    """Map AdventureCard values() (cardId, CARD_FIELDS, extra) to a snapshot card dict."""
+    card_id = values['cardId']
+    # Ids copied from scenario cards are integers in the snapshot JSON
+    card = {'id': int(card_id) if card_id.isdigit() else card_id}
+    for name in CARD_FIELDS:
+        if values[name] is not None:
+            card[name] = values[name]
+    card.update(values.get('extra') or {})
+    return card
+
+
+def _build_rows(adventure: Adventure, cards: Iterable[dict], start_position: int = 0):
+    for position, card in enumerate(cards, start=start_position):
+        card_id = card.get('id')
+        if card_id is None or card_id == '':
+            card_id = uuid.uuid4()
+        yield AdventureCard(
+            adventure=adventure,
+            cardId=str(card_id),
+            position=position,
+            **card_to_fields(card)
+        )
+
+
+def create_adventure_cards(adventure: Adventure, cards: Iterable[dict]) -> int:
+    """
+    Store cards as AdventureCard rows in chunked bulk inserts.
+
+    Args:
+        adventure: Adventure using the 'table' card storage
+        cards: Card dicts in snapshot order (may be a lazy iterator)
+
+    Returns:
+        Number of cards stored
+    """
+    created = 0
+    batch = []
+    for row in _build_rows(adventure, cards):
+        batch.append(row)
+        if len(batch) >= CARD_BATCH_SIZE:
+            AdventureCard.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        AdventureCard.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def copy_adventure_cards(source: Adventure, target: Adventure) -> int:
+    """Copy the AdventureCard rows of one adventure to another."""
+    rows = (
+        AdventureCard.objects.filter(adventure=source)
+        .values('cardId', 'position', 'extra', *CARD_FIELDS)
+        .iterator(chunk_size=CARD_BATCH_SIZE)
+    )
+    created = 0
+    batch = []
+    for values in rows:
+        batch.append(AdventureCard(adventure=target, **values))
+        if len(batch) >= CARD_BATCH_SIZE:
+            AdventureCard.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        AdventureCard.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def replace_adventure_cards(adventure: Adventure, cards: list) -> None:
+    """Replace all AdventureCard rows of an adventure (full snapshot writes)."""
+    with transaction.atomic():
+        AdventureCard.objects.filter(adventure=adventure).delete()
+        create_adventure_cards(adventure, cards)
+
+
+def list_adventure_cards(adventure: Adventure) -> list:
+    """
+    The adventure's cards as snapshot card dicts, in order.
+
+    Uses prefetched snapshotCards when available.
+    """
+    if uses_shared_blob(adventure):
+        return list_shared_cards(adventure)
+    if not uses_card_table(adventure):
+        return (adventure.scenarioSnapshot or {}).get('cards', [])
+    return [
+        row_to_card({'cardId': row.cardId, 'extra': row.extra,
+                     **{name: getattr(row, name) for name in CARD_FIELDS}})
+        for row in adventure.snapshotCards.all()
+    ]
+
+
+async def aload_trigger_cards(adventure: Adventure) -> list:
+    """
+    Cards for trigger detection: full cards in 'snapshot' mode, only id and
+    trigger_words in 'table' mode (see aload_card_contents).
+    """
+    if uses_shared_blob(adventure):
+        return await alist_shared_cards(adventure)
+    if not uses_card_table(adventure):
+        return (adventure.scenarioSnapshot or {}).get('cards', [])
+    rows = AdventureCard.objects.filter(adventure=adventure).values_list('cardId', 'trigger_words')
+    return [{'id': card_id, 'trigger_words': trigger_words or ''} async for card_id, trigger_words in rows]
+
+
+async def aload_card_contents(adventure: Adventure, cards: list) -> list:
+    """Complete cards returned by aload_trigger_cards with all their fields."""
+    if not uses_card_table(adventure) or not cards:
+        return cards
+    card_ids = [card['id'] for card in cards]
+    rows = AdventureCard.objects.filter(adventure=adventure, cardId__in=card_ids).values(
+        'cardId', 'extra', *CARD_FIELDS
+    )
+    by_id = {values['cardId']: row_to_card(values) async for values in rows}
+    return [by_id[card_id] for card_id in card_ids if card_id in by_id]
+
+
+class AdventureCardEditor:
+    """
+    Card mutations on an adventure using the 'table' card storage.
+
+    Same interface and exceptions as SnapshotCardEditor; each mutation touches
+    only the affected AdventureCard rows and bumps Adventure.snapshotVersion.
+    """
+
+    def __init__(self, adventure_id: int):
+        """
+        Args:
+            adventure_id: Primary key of the adventure to modify
+        """
+        self.adventure_id = adventure_id
+
+    def add(self, card: dict, expected_version: Optional[int] = None) -> int:
+        with transaction.atomic():
+            current = self._check_version(expected_version)
+            last = AdventureCard.objects.filter(adventure_id=self.adventure_id).aggregate(
+                last=Max('position')
+            )['last']
+            AdventureCard.objects.create(
+                adventure_id=self.adventure_id,
+                cardId=str(card['id']),
+                position=0 if last is None else last + 1,
+                **card_to_fields(card)
+            )
+            return self._bump_version(current)
+
+    def edit(self, card_id, card: dict, expected_version: Optional[int] = None) -> int:
+        with transaction.atomic():
+            current = self._check_version(expected_version)
+            if not self._cards(card_id).update(**card_to_fields(card)):
+                raise SnapshotCardNotFound(card_id)
+            return self._bump_version(current)
+
+    def delete(self, card_id, expected_version: Optional[int] = None) -> int:
+        with transaction.atomic():
+            current = self._check_version(expected_version)
+            row = self._cards(card_id).only('id').first()
+            if row is None:
+                raise SnapshotCardNotFound(card_id)
+            row.delete()
+            return self._bump_version(current)
+
+    def duplicate(self, card_id, expected_version: Optional[int] = None) -> Tuple[str, int]:
+        with transaction.atomic():
+            current = self._check_version(expected_version)
+            original = self._cards(card_id).first()
+            if original is None:
+                raise SnapshotCardNotFound(card_id)
+
+            # Make room right after the original
+            AdventureCard.objects.filter(
+                adventure_id=self.adventure_id, position__gt=original.position
+            ).update(position=F('position') + 1)
+
+            new_id = str(uuid.uuid4())
+            original.pk = None
+            original.cardId = new_id
+            original.title = f"{original.title or ''} (Copy)"
+            original.position += 1
+            original.save(force_insert=True)
+            return new_id, self._bump_version(current)
+
+    def _cards(self, card_id):
+        return AdventureCard.objects.filter(adventure_id=self.adventure_id, cardId=str(card_id))
+
+    def _check_version(self, expected_version: Optional[int]) -> int:
+        """Lock the adventure row (serializing card edits) and return its checked version."""
+        current = (
+            Adventure.objects.select_for_update()
+            .filter(pk=self.adventure_id)
+            .values_list('snapshotVersion', flat=True)
+            .get()
+        )
+        if expected_version is not None and current != expected_version:
+            raise SnapshotConflict(current)
+        return current
+
+    def _bump_version(self, current: int) -> int:
+        # The row is locked by _check_version, so the version cannot have moved
+        Adventure.objects.filter(pk=self.adventure_id).update(
+            snapshotVersion=current + 1,
+            lastPlayedAt=timezone.now()
+        )
+        return current + 1
+
+
+def card_editor_for(
+    adventure: Adventure
+) -> Union[SnapshotCardEditor, AdventureCardEditor, SharedCardEditor]:
+    """Card editor matching the adventure's card storage."""
+    if uses_card_table(adventure):
+        return AdventureCardEditor(adventure.pk)
+    if uses_shared_blob(adventure):
+        return SharedCardEditor(adventure.pk)
+    return SnapshotCardEditor(adventure.pk)
@@ -6,24 +6,87 @@ Two-layer architecture:
 2. Project-specific helpers: Domain logic for story generation
 """
 
-from typing import Optional, Dict, Any, AsyncGenerator
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, AsyncGenerator, AsyncIterator, Awaitable, Callable
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
 from rotator_library import RotatingClient
-from api.models import Adventure, Card
-import re
+from api.models import Adventure, AdventureTurn, Card
+from api.utils.coalescing import SingleFlight, StreamCoalescer
+from api.utils.timing import span, timed
+from api.utils.trigger_index import TriggerIndex
+from api.services.trigger_cache import trigger_index_cache
+from api.services.adventure_cards import aload_card_contents, aload_trigger_cards
+from api.services.context_window import (
+    ContextWindow,
+    ContextWindowSelector,
+    get_model_context_window
+)
+from api.services.token_counting import (
+    TurnTokenCounter,
+    count_turn_tokens,
+    get_tokenizer_family
+)
+from api.services.completion_cache import completion_cache
+from api.services.metrics import generations_in_flight, record_completion
+from api.services.model_catalog import model_catalog
+from api.services.prompt_cache import prefix_cache_tracker, with_cache_hints
+from api.services.settings_cache import global_settings
+from api.services.stream_buffer import stream_buffer
+from api.services.turn_ordering import adventure_locks
+from api.services.usage_recorder import usage_recorder
+
+logger = logging.getLogger(__name__)
+
+# Number of newest turns scanned for trigger words
+TRIGGER_CONTEXT_TURNS = 5
+
+
+@dataclass
+class AdventurePrompt:
+    """Assembled adventure prompt plus the history selection behind it."""
+    
+    messages: list[dict]
+    context_window: ContextWindow
+    # Raw text of each prompt section, keyed like TokenUsageStats' precise_* fields
+    sections: dict = field(default_factory=dict)
+    # Leading messages that stay identical across turns (system instruction + history)
+    prefix_length: int = 0
+    # Share of the prompt repeated from the adventure's previous prompt (None if unknown)
+    prefix_hit_ratio: Optional[float] = None
+    
+    def messages_for(self, model: str) -> list[dict]:
+        """Messages to send, with prefix cache hints if the model's provider takes them."""
+        return with_cache_hints(model, self.messages, self.prefix_length)
 
 
 class AIService:
     """
     AI service with generic wrappers and project-specific helpers.
     
+    One instance per process (api.dependencies.get_ai_service) serves all
+    requests, from any thread and event loop, so per-process state lives on
+    it; it holds no event-loop-bound objects.
+    
+    Lifecycle (ASGI lifespan, see api.lifespan):
+    - startup(): Warm the shared cache pool, tokenizer and model catalog before the first request
+    - shutdown(): Drain in-flight work and close the client's connections
+    
     Layer 1 (Generic Wrappers):
     - complete(): Simple completion calls
     - complete_stream(): Streaming completions
     - count_tokens(): Token counting
     
     Layer 2 (Project-Specific Helpers):
+    - coalesce() / coalesce_stream(): Share in-flight identical generations
     - generate_adventure_turn(): Full adventure turn generation with trigger words
     - _build_adventure_messages(): Message construction with context window
+    - build_adventure_prompt(): Token-budgeted prompt assembly with report
+    - record_turn_usage(): Background TokenUsageStats accounting
     - _inject_triggered_cards(): Trigger word detection and card injection
     """
     
@@ -35,6 +98,81 @@ class AIService:
             client: Configured RotatingClient instance
         """
         self.client = client
+        # Identical in-flight generations of this process (see coalesce)
+        self.flights = SingleFlight()
+        self.stream_coalescer = StreamCoalescer()
+    
+    # ==================== Lifecycle ====================
+    
+    async def startup(self, timeout: float = 10.0) -> None:
+        """
+        Warm per-process resources so the first request pays no cold-start costs.
+        
+        Opens the cache's connection pool, loads the default model's
+        tokenizer and fetches the model catalog, concurrently. These are
+        shared by all requests of the process. The database is not touched:
+        its connections are per request thread, so the requests open them
+        (and load the GlobalSettings row) themselves. The tokenizer is that
+        of the settings' model if this worker already loaded them, otherwise
+        of DEFAULT_GENERATION_MODEL. A failing or slow step is logged and
+        skipped; the server starts regardless.
+        
+        Args:
+            timeout: Seconds allowed for each warm-up step
+        """
+        async def warm_tokenizer():
+            defaults = global_settings.loaded_generation_defaults()
+            await sync_to_async(self.client.token_count, thread_sensitive=False)(
+                model=defaults.model, text='warm-up'
+            )
+        
+        steps = {
+            'cache': lambda: cache.aget('ai_service:warm-up'),
+            'tokenizer': warm_tokenizer,
+            'model catalog': lambda: model_catalog.get_models(self.client),
+        }
+        
+        async def run(name, step):
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(step(), timeout)
+                logger.info(f"Warmed up {name} in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                logger.warning(f"Warm-up of {name} failed: {e!r}")
+        
+        await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+    
+    async def shutdown(self, timeout: float = 30.0, poll_interval: float = 0.1) -> None:
+        """
+        Let in-flight work finish, then release the client's connections.
+        
+        Waits for running generations and background streams (which outlive
+        their requests), flushes pending token usage writes and closes the
+        RotatingClient.
+        
+        Args:
+            timeout: Seconds to wait for in-flight work before closing anyway
+            poll_interval: Seconds between checks for in-flight work
+        """
+        deadline = time.monotonic() + timeout
+        while adventure_locks.stats()['held'] or stream_buffer.stats()['running']:
+            if time.monotonic() >= deadline:
+                logger.warning("Shutting down with generations still running")
+                break
+            await asyncio.sleep(poll_interval)
+        
+        await sync_to_async(usage_recorder.drain, thread_sensitive=False)(
+            timeout=max(deadline - time.monotonic(), 0)
+        )
+        
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Failed to close the RotatingClient: {e!r}")
     
     # ==================== LAYER 1: Generic Wrappers ====================
     
@@ -42,26 +180,54 @@ class AIService:
         self,
         model: str,
         messages: list[dict],
+        allow_cached: bool = False,
+        bypass_cache: bool = False,
         **kwargs
     ) -> dict:
         """
         Generic completion wrapper.
         
-        Thin pass-through to rotator_library's acompletion().
+        Thin pass-through to rotator_library's acompletion(). When the
+        completion cache is enabled (COMPLETION_CACHE_ENABLED), deterministic
+        requests (temperature 0) and requests with allow_cached=True are
+        answered from it if the same request was completed before.
         
         Args:
             model: Model identifier (e.g., 'gemini/gemini-1.5-flash')
             messages: List of message dicts with 'role' and 'content'
+            allow_cached: Accept a cached response for an identical request
+            bypass_cache: Always call the provider (and do not store the response)
             **kwargs: Additional arguments passed to acompletion()
         
         Returns:
             LLM completion response dict
         """
-        return await self.client.acompletion(
-            model=model,
-            messages=messages,
-            **kwargs
-        )
+        cache_key = None
+        if completion_cache.applies(kwargs, allow_reuse=allow_cached, bypass=bypass_cache):
+            cache_key = completion_cache.make_key(model, messages, kwargs)
+            cached = await completion_cache.aget(cache_key)
+            if cached is not None:
+                return cached
+        
+        generations_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            with span('llm'):
+                response = await self.client.acompletion(
+                    model=model,
+                    messages=messages,
+                    **kwargs
+                )
+        except Exception as e:
+            record_completion(model, stream=False, seconds=time.perf_counter() - started, error=e)
+            raise
+        finally:
+            generations_in_flight.dec()
+        record_completion(model, stream=False, seconds=time.perf_counter() - started, response=response)
+        
+        if cache_key is not None:
+            await completion_cache.aset(cache_key, response)
+        return response
     
     async def complete_stream(
         self,
@@ -80,12 +246,37 @@ class AIService:
         Returns:
             Async generator yielding completion chunks
         """
-        return await self.client.acompletion(
-            model=model,
-            messages=messages,
-            stream=True,
-            **kwargs
-        )
+        generations_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            stream = await self.client.acompletion(
+                model=model,
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+        except Exception as e:
+            generations_in_flight.dec()
+            record_completion(model, stream=True, seconds=time.perf_counter() - started, error=e)
+            raise
+        return self._observe_stream(model, stream, started)
+    
+    @staticmethod
+    async def _observe_stream(model: str, stream: AsyncIterator, started: float) -> AsyncGenerator:
+        """Pass the chunks of a stream through, recording its metrics when it ends."""
+        usage = None
+        error = None
+        try:
+            async for chunk in stream:
+                # Providers report usage on the final chunk
+                usage = getattr(chunk, 'usage', None) or usage
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            generations_in_flight.dec()
+            record_completion(model, stream=True, seconds=time.perf_counter() - started, usage=usage, error=error)
     
     async def count_tokens(
         self,
@@ -121,12 +312,52 @@ class AIService:
     
     # ==================== LAYER 2: Project-Specific Helpers ====================
     
+    async def coalesce(self, key: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a generation unless an identical one is in flight (PROJECT-SPECIFIC).
+        
+        Concurrent callers with the same key (see coalescing_key) share the
+        leader's result, so a double click costs one upstream call and
+        writes one turn.
+        
+        Args:
+            key: Adventure id plus request hash
+            generate: Coroutine function running the whole turn
+        
+        Returns:
+            Result of generate() (the leader's, for followers)
+        """
+        return await self.flights.do(key, generate)
+    
+    async def coalesce_stream(
+        self,
+        key: str,
+        produce: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Streaming variant of coalesce().
+        
+        Followers first receive the chunks the leader has already produced,
+        then its live output.
+        
+        Args:
+            key: Adventure id plus request hash
+            produce: Async generator function of the leader's stream
+        
+        Yields:
+            Stream chunks
+        """
+        async for chunk in self.stream_coalescer.stream(key, produce):
+            yield chunk
+    
     async def generate_adventure_turn(
         self,
         adventure: Adventure,
         user_text: Optional[str],
         model: str,
-        max_tokens: int = 200
+        max_tokens: int = 200,
+        prompt: Optional[AdventurePrompt] = None,
+        **completion_kwargs
     ) -> dict:
         """
         Generate AI response for adventure turn (PROJECT-SPECIFIC).
@@ -142,87 +373,211 @@ class AIService:
             user_text: User's action text (None for "Continue")
             model: Model identifier
             max_tokens: Maximum output tokens
+            prompt: Prompt from build_adventure_prompt() (built if omitted)
+            **completion_kwargs: Passed to complete() (temperature,
+                allow_cached, bypass_cache, ...)
         
         Returns:
             LLM completion response
         """
         # Build messages with ImaginAI-specific logic
-        messages = await self._build_adventure_messages(
-            adventure=adventure,
-            user_text=user_text
-        )
+        if prompt is None:
+            prompt = await self.build_adventure_prompt(
+                adventure=adventure,
+                user_text=user_text,
+                model=model,
+                max_tokens=max_tokens
+            )
         
         # Call generic completion wrapper
         return await self.complete(
             model=model,
-            messages=messages,
-            max_tokens=max_tokens
+            messages=prompt.messages_for(model),
+            max_tokens=max_tokens,
+            **completion_kwargs
         )
     
     async def _build_adventure_messages(
         self,
         adventure: Adventure,
-        user_text: Optional[str]
+        user_text: Optional[str],
+        model: str,
+        max_tokens: int = 200
     ) -> list[dict]:
         """
         Build LLM messages from adventure state (PROJECT-SPECIFIC).
         
+        Args:
+            adventure: Adventure instance
+            user_text: Optional user input text
+            model: Model identifier (selects context window and tokenizer)
+            max_tokens: Output tokens reserved in the context window
+        
+        Returns:
+            List of message dicts ready for LLM
+        """
+        prompt = await self.build_adventure_prompt(
+            adventure=adventure,
+            user_text=user_text,
+            model=model,
+            max_tokens=max_tokens
+        )
+        return prompt.messages
+    
+    @timed('prompt')
+    async def build_adventure_prompt(
+        self,
+        adventure: Adventure,
+        user_text: Optional[str],
+        model: str,
+        max_tokens: int = 200,
+        history_before: Optional[AdventureTurn] = None
+    ) -> AdventurePrompt:
+        """
+        Assemble the adventure prompt and its context window report (PROJECT-SPECIFIC).
+        
         ImaginAI-specific logic:
         - Format scenario instructions as system message
-        - Select context window turns (token-aware in future)
         - Detect trigger words in recent context
         - Inject triggered story cards
+        - Count system, card and user tokens first, then fill the rest of
+          the model's context window (minus max_tokens) with history,
+          newest turn first
+        
+        Messages are ordered for provider prefix caching: the system
+        instruction and history form a prefix that repeats from turn to
+        turn, and the triggered cards (which change with the context) follow
+        in their own system message, just before the user message.
         
         Args:
             adventure: Adventure instance
             user_text: Optional user input text
+            model: Model identifier
+            max_tokens: Output tokens reserved in the context window
+            history_before: Only use history older than this turn (retry)
         
         Returns:
-            List of message dicts ready for LLM
+            AdventurePrompt with messages and the selected context window
         """
         scenario_snapshot = adventure.scenarioSnapshot
         
         # System instruction from scenario
         system_content = self._format_system_instruction(scenario_snapshot)
-        system_msg = {"role": "system", "content": system_content}
         
-        # TODO: Implement token-aware context window management
-        # Current limitation: Hardcoded 20-turn limit without token counting
-        # Future improvement needed:
-        #   1. Count tokens for system instruction + cards first
-        #   2. Calculate remaining tokens from model's context window
-        #   3. Select history turns bottom-up (newest first) until token budget exhausted
-        #   4. This ensures we always fit within context while maximizing relevant history
-        # See code_review.md "Limited Context Window Management" section for implementation
-        history_turns = adventure.adventureHistory.order_by('timestamp')[:20]
-        history_msgs = [
-            {"role": turn.role, "content": turn.text}
-            for turn in history_turns
-        ]
+        # Per-turn counts are memoized on AdventureTurn.tokenCounts
+        token_counter = TurnTokenCounter(self.client, model)
+        selector = ContextWindowSelector(
+            adventure, count_turn_tokens=token_counter, history_before=history_before
+        )
         
         # Build context for trigger detection (recent history + user text)
-        context_text = " ".join([msg["content"] for msg in history_msgs[-5:]])
+        with span('history'):
+            recent_turns = await selector.recent_turns(TRIGGER_CONTEXT_TURNS)
+        context_text = " ".join(turn.text for turn in recent_turns)
         if user_text:
             context_text += " " + user_text
         
-        # Inject triggered cards
-        triggered_cards = self._inject_triggered_cards(
-            context_text=context_text,
-            available_cards=scenario_snapshot.get('cards', [])
-        )
-        
-        # Add triggered cards to system message
-        if triggered_cards:
+        # Inject triggered cards (compiled index is cached per adventure).
+        # With table card storage only ids and trigger words are loaded here,
+        # and full content is fetched for the triggered cards alone.
+        with span('cards'):
+            available_cards = await aload_trigger_cards(adventure)
+            trigger_index = await trigger_index_cache.aget(adventure.pk, available_cards)
+            triggered_cards = self._inject_triggered_cards(
+                context_text=context_text,
+                available_cards=available_cards,
+                index=trigger_index
+            )
+            triggered_cards = await aload_card_contents(adventure, triggered_cards)
+            
+            # Triggered cards go after the history, keeping the prefix stable
             cards_formatted = self._format_cards_for_prompt(triggered_cards)
-            system_content += f"\n\n{cards_formatted}"
-            system_msg["content"] = system_content
+        card_msgs = [{"role": "system", "content": cards_formatted}] if cards_formatted else []
+        system_msg = {"role": "system", "content": system_content}
         
         # User message if provided
-        messages = [system_msg] + history_msgs
-        if user_text:
-            messages.append({"role": "user", "content": user_text})
+        user_msgs = [{"role": "user", "content": user_text}] if user_text else []
+        
+        # Fixed parts first, remaining budget goes to history
+        with span('tokens'):
+            fixed_tokens = self._count_message_tokens(model, [system_msg] + card_msgs + user_msgs)
+        budget = get_model_context_window(model) - int(max_tokens) - fixed_tokens
+        with span('history'):
+            context_window = await selector.select(budget)
+        with span('tokens'):
+            await token_counter.flush()
         
-        return messages
+        history_msgs = [
+            {"role": turn.role, "content": turn.text}
+            for turn in context_window.turns
+        ]
+        
+        messages = [system_msg] + history_msgs + card_msgs + user_msgs
+        return AdventurePrompt(
+            messages=messages,
+            context_window=context_window,
+            prefix_length=1 + len(history_msgs),
+            prefix_hit_ratio=prefix_cache_tracker.observe(adventure.pk, messages),
+            sections={
+                'system_instruction_block': system_content,
+                'scenario_instructions': scenario_snapshot.get('instructions', ''),
+                'plot_essentials': scenario_snapshot.get('plotEssentials', ''),
+                'authors_notes': scenario_snapshot.get('authorsNotes', ''),
+                'cards': cards_formatted,
+                'current_user_message': user_text or '',
+            }
+        )
+    
+    def _count_message_tokens(self, model: str, messages: list[dict]) -> int:
+        """Count prompt tokens for messages with the model's tokenizer."""
+        return self.client.token_count(model=model, messages=messages)
+    
+    def turn_token_counts(self, model: str, role: str, text: str) -> dict:
+        """
+        Build the tokenCounts value for a new AdventureTurn.
+        
+        Counting eagerly at creation time means the turn never needs
+        tokenizing again for this tokenizer family.
+        
+        Args:
+            model: Model the turn is generated for
+            role: Turn role ('user' or 'model')
+            text: Turn text
+        
+        Returns:
+            Dict mapping tokenizer family to token count
+        """
+        return {get_tokenizer_family(model): count_turn_tokens(self.client, model, role, text)}
+    
+    def record_turn_usage(
+        self,
+        turn_id: int,
+        model: str,
+        prompt: AdventurePrompt,
+        response: Any = None,
+        usage: Any = None
+    ) -> None:
+        """
+        Schedule TokenUsageStats accounting for a generated turn.
+        
+        Returns immediately; section counting and the DB write run in a
+        background task (subject to TOKEN_USAGE_SAMPLE_RATE).
+        
+        Args:
+            turn_id: AdventureTurn the stats are linked to
+            model: Model used for the completion
+            prompt: Prompt the completion was generated from
+            response: Completion response (usage is read from it)
+            usage: API-reported usage, for streams where there is no response
+        """
+        usage_recorder.record(
+            self.client,
+            turn_id=turn_id,
+            model=model,
+            prompt=prompt,
+            response=response,
+            usage=usage
+        )
     
     def _format_system_instruction(self, scenario_snapshot: dict) -> str:
         """
@@ -251,7 +606,8 @@ class AIService:
     def _inject_triggered_cards(
         self,
         context_text: str,
-        available_cards: list[dict]
+        available_cards: list[dict],
+        index: Optional[TriggerIndex] = None
     ) -> list[dict]:
         """
         Detect trigger words and return matching cards (PROJECT-SPECIFIC).
@@ -261,30 +617,20 @@ class AIService:
         - Word boundary matching (avoid partial matches)
         - Return each card only once
         
+        All trigger words are compiled into a single TriggerIndex automaton,
+        so the context is scanned once regardless of card count.
+        
         Args:
             context_text: Recent conversation context
             available_cards: Cards from scenario snapshot
+            index: Pre-compiled index for available_cards (built if omitted)
         
         Returns:
             List of triggered card dicts
         """
-        triggered_cards = []
-        context_lower = context_text.lower()
-        
-        for card in available_cards:
-            # Parse trigger words (comma-separated)
-            trigger_words_str = card.get('trigger_words', '')
-            trigger_words = [w.strip() for w in trigger_words_str.split(',') if w.strip()]
-            
-            # Check each trigger word
-            for trigger in trigger_words:
-                # Word boundary matching
-                pattern = r'\b' + re.escape(trigger.lower()) + r'\b'
-                if re.search(pattern, context_lower):
-                    triggered_cards.append(card)
-                    break  # Card found, no need to check other triggers
-        
-        return triggered_cards
+        if index is None:
+            index = TriggerIndex.from_cards(available_cards)
+        return index.match(context_text, available_cards)
     
     def _format_cards_for_prompt(self, cards: list[dict]) -> str:
         """
@@ -0,0 +1,152 @@
+"""
+Opt-in cache of completion responses.
+
+Identical requests (same model, messages and sampling parameters) are answered
+from CACHES['default'] (Redis) instead of the provider, which saves a full LLM
+call when retry/continue or a duplicated adventure resends the same prompt.
+
+A response is only reused when the completion is deterministic (temperature 0)
+or the caller explicitly allows reuse, and never for streams. Keys are the
+sha256 of the canonical JSON of the request; entries expire after the TTL and
+responses larger than the size limit are not stored.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# acompletion() arguments that do not influence the response
+_NON_SAMPLING_PARAMS = {'stream', 'stream_options', 'timeout', 'metadata'}
+
+
+def _to_dict(response: Any) -> Optional[dict]:
+    """Plain dict of a completion response (dict or litellm ModelResponse)."""
+    if isinstance(response, dict):
+        return response
+    model_dump = getattr(response, 'model_dump', None)
+    if callable(model_dump):
+        return model_dump()
+    return None
+
+
+class CompletionCache:
+    """Completion responses cached by a canonical hash of the request."""
+
+    KEY_PREFIX = 'completion:'
+
+    def __init__(self, enabled: bool = False, timeout: int = 3600, max_bytes: int = 262144):
+        """
+        Args:
+            enabled: Master switch; when False every request goes upstream
+            timeout: TTL in seconds of a cached response
+            max_bytes: Largest serialized response that is stored
+        """
+        self.enabled = enabled
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.too_large = 0
+        self.errors = 0
+
+    def applies(self, params: dict, allow_reuse: bool = False, bypass: bool = False) -> bool:
+        """
+        Whether a request may be answered from (and stored in) the cache.
+
+        Args:
+            params: acompletion() keyword arguments besides model and messages
+            allow_reuse: The caller accepts a previous response for the same request
+            bypass: Always go upstream for this request
+        """
+        if not self.enabled or params.get('stream'):
+            return False
+        if bypass:
+            self._count('bypassed')
+            return False
+        return allow_reuse or params.get('temperature') == 0
+
+    def make_key(self, model: str, messages: list[dict], params: dict) -> str:
+        """Canonical hash of model, messages and sampling parameters."""
+        sampling = {
+            name: value for name, value in params.items()
+            if name not in _NON_SAMPLING_PARAMS
+        }
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'params': sampling},
+            sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+        )
+        return self.KEY_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """Cached response for a key, or None."""
+        try:
+            payload = await cache.aget(key)
+        except Exception as e:
+            logger.warning(f"Completion cache lookup failed: {e}")
+            self._count('errors')
+            payload = None
+
+        if payload is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(payload)
+
+    async def aset(self, key: str, response: Any) -> None:
+        """Store a response unless it cannot be serialized or exceeds max_bytes."""
+        data = _to_dict(response)
+        if data is None:
+            return
+        try:
+            payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Completion response is not cacheable: {e}")
+            return
+        if len(payload.encode('utf-8')) > self.max_bytes:
+            self._count('too_large')
+            return
+
+        try:
+            await cache.aset(key, payload, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Completion cache store failed: {e}")
+            self._count('errors')
+            return
+        self._count('stores')
+
+    def stats(self) -> dict:
+        """Cache counters and hit rate over cacheable lookups."""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'bypassed': self.bypassed,
+            'stores': self.stores,
+            'too_large': self.too_large,
+            'errors': self.errors,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+# Process-wide instance shared by all AIService instances
+completion_cache = CompletionCache(
+    enabled=getattr(settings, 'COMPLETION_CACHE_ENABLED', False),
+    timeout=getattr(settings, 'COMPLETION_CACHE_TIMEOUT', 3600),
+    max_bytes=getattr(settings, 'COMPLETION_CACHE_MAX_BYTES', 262144),
+)
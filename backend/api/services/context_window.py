@@ -0,0 +1,167 @@
+"""
+Token-budgeted context window selection for adventure prompts.
+
+History is loaded newest-first in keyset pages and added until the model's
+context window (minus output tokens and the fixed prompt parts) is used up.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.db.models import Q
+
+from api.models import Adventure, AdventureTurn
+from imaginai_backend.config import MODEL_CONTEXT_WINDOWS, DEFAULT_MAX_CONTEXT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Number of history turns fetched per reverse page
+HISTORY_PAGE_SIZE = 50
+
+
+def get_model_context_window(model: Optional[str]) -> int:
+    """
+    Look up a model's context window in MODEL_CONTEXT_WINDOWS.
+
+    Accepts both bare ('gemma-3-27b-it') and provider-prefixed
+    ('gemini/gemma-3-27b-it') identifiers.
+
+    Args:
+        model: Model identifier
+
+    Returns:
+        Context window size in tokens (DEFAULT_MAX_CONTEXT_TOKENS if unknown)
+    """
+    if not model:
+        return DEFAULT_MAX_CONTEXT_TOKENS
+    if model in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model]
+    bare_model = model.split('/', 1)[-1]
+    return MODEL_CONTEXT_WINDOWS.get(bare_model, DEFAULT_MAX_CONTEXT_TOKENS)
+
+
+@dataclass
+class ContextWindow:
+    """Result of history selection for one prompt."""
+
+    # Selected turns, oldest first
+    turns: list = field(default_factory=list)
+    # Tokens used by the selected turns
+    history_tokens: int = 0
+    # Tokens that were available for history
+    budget: int = 0
+    # Newest turn that did not fit; it and every older turn were dropped
+    newest_dropped_turn_id: Optional[int] = None
+    # Number of turns left out of the prompt
+    dropped_turn_count: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped_turn_count > 0
+
+
+class ContextWindowSelector:
+    """
+    Select adventure history newest-first under a token budget.
+
+    Usage:
+        selector = ContextWindowSelector(adventure, count_turn_tokens)
+        recent = await selector.recent_turns(5)    # e.g. for trigger detection
+        window = await selector.select(budget)
+    """
+
+    def __init__(
+        self,
+        adventure: Adventure,
+        count_turn_tokens: Callable[[AdventureTurn], int],
+        page_size: int = HISTORY_PAGE_SIZE,
+        history_before: Optional[AdventureTurn] = None
+    ):
+        """
+        Args:
+            adventure: Adventure whose history is selected
+            count_turn_tokens: Returns the prompt token cost of one turn
+            page_size: Turns fetched per reverse page
+            history_before: Only select turns older than this one (retry
+                regenerates from an earlier point of the history)
+        """
+        self.adventure = adventure
+        self.count_turn_tokens = count_turn_tokens
+        self.page_size = page_size
+        self.history_before = history_before
+        self._first_page: Optional[list] = None
+
+    def _history(self):
+        return AdventureTurn.objects.filter(
+            adventure_id=self.adventure.pk
+        ).order_by('-sequence', '-id')
+
+    async def _fetch_page(self, before: Optional[AdventureTurn]) -> list:
+        queryset = self._history()
+        if before is not None:
+            queryset = queryset.filter(
+                Q(sequence__lt=before.sequence) |
+                Q(sequence=before.sequence, id__lt=before.id)
+            )
+        return [turn async for turn in queryset[:self.page_size]]
+
+    async def _count_dropped(self, stopped_at: AdventureTurn) -> int:
+        """Number of turns from stopped_at back to the start of the history."""
+        return await self._history().filter(
+            Q(sequence__lt=stopped_at.sequence) |
+            Q(sequence=stopped_at.sequence, id__lte=stopped_at.id)
+        ).acount()
+
+    async def recent_turns(self, count: int) -> list:
+        """Return up to `count` newest turns, oldest first (served from the first page)."""
+        if self._first_page is None:
+            self._first_page = await self._fetch_page(self.history_before)
+        return list(reversed(self._first_page[:count]))
+
+    async def select(self, budget: int) -> ContextWindow:
+        """
+        Fill the budget with history, newest turn first.
+
+        Selection stops at the first turn that does not fit, so the prompt
+        always contains a contiguous tail of the history.
+
+        Args:
+            budget: Tokens available for history
+
+        Returns:
+            ContextWindow with the selected turns in chronological order
+        """
+        window = ContextWindow(budget=max(budget, 0))
+        remaining = window.budget
+        selected = []
+
+        page = self._first_page if self._first_page is not None else await self._fetch_page(self.history_before)
+        stopped_at = None
+
+        while page:
+            for turn in page:
+                cost = self.count_turn_tokens(turn)
+                if cost > remaining:
+                    stopped_at = turn
+                    break
+                selected.append(turn)
+                remaining -= cost
+                window.history_tokens += cost
+
+            if stopped_at is not None or len(page) < self.page_size:
+                break
+            page = await self._fetch_page(page[-1])
+
+        if stopped_at is not None:
+            window.newest_dropped_turn_id = stopped_at.id
+            window.dropped_turn_count = await self._count_dropped(stopped_at)
+            logger.debug(
+                f"Adventure {self.adventure.pk}: dropped {window.dropped_turn_count} "
+                f"history turns (newest dropped: {stopped_at.id}), "
+                f"used {window.history_tokens}/{window.budget} tokens"
+            )
+
+        selected.reverse()
+        window.turns = selected
+        return window
@@ -0,0 +1,237 @@
+"""
+Backend metrics, served at /metrics in the Prometheus text format.
+
+Recorded as they happen (sharded, see api.utils.metrics):
+- imaginai_llm_tokens_total: prompt (in) and completion (out) tokens per
+  model, as reported in completion responses
+- imaginai_llm_requests_total / imaginai_upstream_errors_total: completion
+  calls by outcome, and failures by provider and error type
+- imaginai_generation_duration_seconds: completion calls (streams: until
+  the last chunk), imaginai_generations_in_flight: calls in progress
+- imaginai_stream_duration_seconds: background SSE streams, start to end
+- imaginai_sse_connections: clients currently reading an SSE stream
+
+Read from the services' own counters at scrape time: active adventures
+(running a generation) and queued generations, running streams, cache hits
+and misses, coalesced requests and the API keys per provider. Per-request
+stage timings (REQUEST_TIMING_ENABLED) are added by the HistogramSink.
+
+Model and provider labels come from clients, so they are bounded before
+recording (model_label, provider_label): a model is reported by name only if
+it is in the model catalog or METRICS_MODEL_LABELS, otherwise by its
+provider if that has API keys configured, otherwise as "other".
+
+All values are per worker process.
+"""
+
+from typing import Any
+
+from django.conf import settings
+
+from api.services.usage_recorder import _get_field
+from api.utils.metrics import MetricsRegistry
+
+# Process-wide registry rendered by the /metrics view
+registry = MetricsRegistry()
+
+llm_tokens = registry.counter(
+    'imaginai_llm_tokens_total', 'Tokens reported by providers, per model and direction (in, out).',
+    ('model', 'direction')
+)
+llm_requests = registry.counter(
+    'imaginai_llm_requests_total', 'Completion calls per model, mode and outcome (ok, error).',
+    ('model', 'stream', 'outcome')
+)
+upstream_errors = registry.counter(
+    'imaginai_upstream_errors_total', 'Failed completion calls per provider and error type.',
+    ('provider', 'error')
+)
+generation_duration = registry.histogram(
+    'imaginai_generation_duration_seconds', 'Duration of completion calls; streams until their last chunk.',
+    ('model', 'stream')
+)
+generations_in_flight = registry.gauge(
+    'imaginai_generations_in_flight', 'Completion calls in progress.'
+)
+stream_duration = registry.histogram(
+    'imaginai_stream_duration_seconds', 'Duration of background SSE streams.'
+)
+sse_connections = registry.gauge(
+    'imaginai_sse_connections', 'Clients currently reading an SSE stream.'
+)
+
+
+# Label of models and providers that are not reported by name
+OTHER_LABEL = 'other'
+
+
+def provider_of(model: str) -> str:
+    """Provider prefix of a model identifier ('gemini/gemini-1.5-flash' -> 'gemini')."""
+    return model.split('/', 1)[0] if '/' in model else 'unknown'
+
+
+def _known_providers() -> set:
+    from api.dependencies import get_rotating_client
+    providers = {provider_of(model) for model in getattr(settings, 'METRICS_MODEL_LABELS', ())}
+    try:
+        providers.update(getattr(get_rotating_client(), 'api_keys', None) or ())
+    except RuntimeError:
+        pass
+    return providers
+
+
+def provider_label(model: str) -> str:
+    """Metric label of a model's provider: the provider if it is configured, else "other"."""
+    provider = provider_of(model or '')
+    return provider if provider in _known_providers() else OTHER_LABEL
+
+
+def model_label(model: str) -> str:
+    """Metric label of a client-supplied model identifier (bounded, see the module docstring)."""
+    from api.services.model_catalog import model_catalog
+    if model and (model in getattr(settings, 'METRICS_MODEL_LABELS', ()) or model in model_catalog.known_models()):
+        return model
+    return provider_label(model)
+
+
+def record_completion(
+    model: str,
+    stream: bool,
+    seconds: float,
+    response: Any = None,
+    usage: Any = None,
+    error: BaseException = None
+) -> None:
+    """
+    Record a finished completion call.
+
+    Args:
+        model: Model identifier (recorded as model_label(model))
+        stream: Whether it was a streaming call
+        seconds: Duration of the call (streams: until the last chunk)
+        response: Completion response carrying API-reported usage
+        usage: API-reported usage (overrides response.usage)
+        error: Exception the call failed with
+    """
+    if usage is None:
+        usage = _get_field(response, 'usage')
+    mode = 'true' if stream else 'false'
+    model = model_label(model)
+    llm_requests.inc(model=model, stream=mode, outcome='error' if error is not None else 'ok')
+    generation_duration.observe(seconds, model=model, stream=mode)
+    if error is not None:
+        upstream_errors.inc(provider=provider_label(model), error=type(error).__name__)
+    prompt_tokens = _get_field(usage, 'prompt_tokens')
+    completion_tokens = _get_field(usage, 'completion_tokens')
+    if prompt_tokens:
+        llm_tokens.inc(prompt_tokens, model=model, direction='in')
+    if completion_tokens:
+        llm_tokens.inc(completion_tokens, model=model, direction='out')
+
+
+# Collected from the services at scrape time; imported lazily, since those
+# services record into the metrics above
+
+def _adventure_locks(field: str):
+    def collect():
+        from api.services.turn_ordering import adventure_locks
+        return adventure_locks.stats()[field]
+    return collect
+
+
+def _stream_buffer(field: str):
+    def collect():
+        from api.services.stream_buffer import stream_buffer
+        return stream_buffer.stats()[field]
+    return collect
+
+
+def _cache_stats() -> dict:
+    from api.services.completion_cache import completion_cache
+    from api.services.model_catalog import model_catalog
+    from api.services.snapshot_blobs import blob_card_cache
+    from api.services.trigger_cache import trigger_index_cache
+
+    trigger = trigger_index_cache.stats()
+    catalog = model_catalog.stats()
+    completion = completion_cache.stats()
+    blobs = blob_card_cache.stats()
+    return {
+        'trigger_index': (trigger['hits'] + trigger['shared_hits'], trigger['misses']),
+        'completion': (completion['hits'], completion['misses']),
+        'model_catalog': (catalog['hits'] + catalog['stale_hits'], catalog['misses']),
+        'snapshot_blob': (blobs['hits'], blobs['misses']),
+    }
+
+
+def _cache_hits() -> dict:
+    return {(cache,): hits for cache, (hits, _) in _cache_stats().items()}
+
+
+def _cache_misses() -> dict:
+    return {(cache,): misses for cache, (_, misses) in _cache_stats().items()}
+
+
+def _prefix_hit_ratio():
+    from api.services.prompt_cache import prefix_cache_tracker
+    return prefix_cache_tracker.stats()['prefix_hit_ratio']
+
+
+def _coalesced_requests() -> dict:
+    from api.dependencies import get_ai_service
+    try:
+        ai_service = get_ai_service()
+    except RuntimeError:
+        return {}
+    values = {}
+    for kind, stats in (('generate', ai_service.flights.stats()), ('stream', ai_service.stream_coalescer.stats())):
+        values[(kind, 'leader')] = stats['leaders']
+        values[(kind, 'follower')] = stats['followers']
+    return values
+
+
+def _provider_api_keys() -> dict:
+    from api.dependencies import get_rotating_client
+    try:
+        client = get_rotating_client()
+    except RuntimeError:
+        return {}
+    return {(provider,): len(keys) for provider, keys in (getattr(client, 'api_keys', None) or {}).items()}
+
+
+registry.function(
+    'imaginai_active_adventures', 'Adventures with a generation running.', _adventure_locks('held')
+)
+registry.function(
+    'imaginai_queued_generations', 'Generations waiting for their adventure\'s lock.', _adventure_locks('waiting')
+)
+registry.function('imaginai_streams_running', 'Background SSE streams running.', _stream_buffer('running'))
+registry.function(
+    'imaginai_streams_started_total', 'Background SSE streams started.', _stream_buffer('started'), type='counter'
+)
+registry.function(
+    'imaginai_streams_resumed_total', 'SSE streams resumed with Last-Event-ID.', _stream_buffer('resumed'),
+    type='counter'
+)
+registry.function(
+    'imaginai_streams_expired_total', 'SSE resumptions whose events were no longer buffered.',
+    _stream_buffer('expired'), type='counter'
+)
+registry.function(
+    'imaginai_cache_hits_total', 'Cache hits per cache.', _cache_hits, labels=('cache',), type='counter'
+)
+registry.function(
+    'imaginai_cache_misses_total', 'Cache misses per cache.', _cache_misses, labels=('cache',), type='counter'
+)
+registry.function(
+    'imaginai_prompt_prefix_hit_ratio', 'Share of prompt text repeated from the adventure\'s previous prompt.',
+    _prefix_hit_ratio
+)
+registry.function(
+    'imaginai_coalesced_requests_total', 'Generation requests that ran (leader) or joined an identical one (follower).',
+    _coalesced_requests, labels=('kind', 'role'), type='counter'
+)
+registry.function(
+    'imaginai_provider_api_keys', 'API keys configured per provider in the RotatingClient.',
+    _provider_api_keys, labels=('provider',)
+)
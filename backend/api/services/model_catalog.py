@@ -0,0 +1,173 @@
+"""
+Cached catalog of available models per provider.
+
+Provider model lists change rarely but are slow to fetch, so they are kept in a
+process-wide TTL cache with stale-while-revalidate semantics:
+
+1. Fresh entry: returned immediately
+2. Stale entry: returned immediately, and a background refresh is started
+3. No entry yet: callers wait for the first fetch
+
+Refreshes are single-flight (concurrent callers share one upstream fetch) and
+run on a dedicated event loop thread, so they survive the end of the request
+that triggered them even when async views run on per-request loops (WSGI).
+Each provider is fetched with its own timeout; a slow or failing provider keeps
+its previous list (if any) and is reported instead of failing the whole catalog.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from django.conf import settings
+from rotator_library import RotatingClient
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCatalog:
+    """TTL cache of RotatingClient model lists with background refresh."""
+
+    def __init__(self, ttl: float = 300.0, provider_timeout: float = 10.0):
+        """
+        Args:
+            ttl: Seconds a fetched catalog is served without revalidation
+            provider_timeout: Seconds to wait for a single provider's model list
+        """
+        self.ttl = ttl
+        self.provider_timeout = provider_timeout
+
+        self._models: dict = {}
+        # All model ids of _models, for membership checks
+        self._known_models: frozenset = frozenset()
+        self._failed_providers: dict = {}
+        self._fetched_at: Optional[float] = None
+        self._refresh_future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def get_models(self, client: RotatingClient) -> dict:
+        """
+        Get the model catalog, fetching or revalidating it as needed.
+
+        Args:
+            client: RotatingClient used for upstream fetches
+
+        Returns:
+            dict with 'models' (provider -> model list), 'stale' (True while a
+            refresh of an expired catalog is pending) and 'failed_providers'
+            (provider -> error of its last fetch)
+        """
+        with self._lock:
+            has_data = self._fetched_at is not None
+            fresh = has_data and time.monotonic() - self._fetched_at < self.ttl
+            if fresh:
+                self.hits += 1
+            elif has_data:
+                self.stale_hits += 1
+                self._start_refresh(client)
+            else:
+                self.misses += 1
+                future = self._start_refresh(client)
+
+        if not has_data:
+            await asyncio.wrap_future(future)
+
+        return self._snapshot(stale=has_data and not fresh)
+
+    def invalidate(self) -> None:
+        """Expire the catalog; the next request serves it stale and refreshes."""
+        with self._lock:
+            if self._fetched_at is not None:
+                self._fetched_at = time.monotonic() - self.ttl
+
+    def stats(self) -> dict:
+        """Cache counters."""
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'providers': len(self._models),
+            'failed_providers': len(self._failed_providers),
+        }
+
+    def known_models(self) -> frozenset:
+        """Model ids in the last fetched catalog (never fetches)."""
+        return self._known_models
+
+    def _snapshot(self, stale: bool) -> dict:
+        return {
+            'models': dict(self._models),
+            'stale': stale,
+            'failed_providers': dict(self._failed_providers),
+        }
+
+    def _start_refresh(self, client: RotatingClient) -> Future:
+        """Start a refresh unless one is in flight (caller holds self._lock)."""
+        if self._refresh_future is None or self._refresh_future.done():
+            self._refresh_future = asyncio.run_coroutine_threadsafe(
+                self._refresh(client), self._get_loop()
+            )
+        return self._refresh_future
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop of the refresh thread, started on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name='model-catalog', daemon=True
+                )
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _fetch_provider(self, client: RotatingClient, provider: str) -> list:
+        return await asyncio.wait_for(
+            client.get_available_models(provider), timeout=self.provider_timeout
+        )
+
+    async def _refresh(self, client: RotatingClient) -> None:
+        providers = list(client.api_keys.keys())
+        results = await asyncio.gather(
+            *(self._fetch_provider(client, provider) for provider in providers),
+            return_exceptions=True
+        )
+
+        models = {}
+        failed = {}
+        for provider, result in zip(providers, results):
+            if isinstance(result, BaseException):
+                error = 'timeout' if isinstance(result, asyncio.TimeoutError) else str(result)
+                logger.warning(f"Failed to fetch models for provider {provider}: {error}")
+                failed[provider] = error
+                # Keep serving the last known list for this provider
+                if provider in self._models:
+                    models[provider] = self._models[provider]
+            else:
+                models[provider] = result
+
+        with self._lock:
+            self._models = models
+            self._known_models = frozenset(model for names in models.values() for model in names)
+            self._failed_providers = failed
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+
+
+# Process-wide instance shared by all requests
+model_catalog = ModelCatalog(
+    ttl=getattr(settings, 'MODEL_CATALOG_TTL', 300),
+    provider_timeout=getattr(settings, 'MODEL_CATALOG_PROVIDER_TIMEOUT', 10.0),
+)
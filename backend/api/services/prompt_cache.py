@@ -0,0 +1,139 @@
+"""
+Prompt prefix caching support.
+
+Adventure prompts are laid out as a stable prefix (system instruction, then the
+selected history) followed by a volatile suffix (triggered story cards and the
+user message), so consecutive turns of an adventure share their leading
+messages byte for byte. Providers with automatic prefix caching (OpenAI,
+Gemini, DeepSeek, ...) benefit from the layout alone; providers that need
+explicit breakpoints (PROMPT_CACHE_HINT_PROVIDERS, Anthropic by default) get
+cache_control hints on the last prefix message.
+
+PrefixCacheTracker measures how much of each turn's prompt repeats the previous
+turn's prompt of the same adventure (the best case for any provider cache).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+
+def _provider(model: str) -> str:
+    return model.split('/', 1)[0] if '/' in model else ''
+
+
+def supports_cache_hints(model: str) -> bool:
+    """Whether cache_control breakpoints are sent for the model's provider."""
+    return _provider(model) in getattr(settings, 'PROMPT_CACHE_HINT_PROVIDERS', ('anthropic',))
+
+
+def with_cache_hints(model: str, messages: list[dict], prefix_length: int) -> list[dict]:
+    """
+    Mark the end of the stable prefix with a cache breakpoint.
+
+    Args:
+        model: Model identifier ("provider/model")
+        messages: Prompt messages
+        prefix_length: Number of leading messages forming the stable prefix
+
+    Returns:
+        messages unchanged if the provider takes no hints, otherwise a copy
+        whose system message and last prefix message carry
+        cache_control={'type': 'ephemeral'}
+    """
+    if prefix_length <= 0 or not supports_cache_hints(model):
+        return messages
+
+    hinted = list(messages)
+    for index in {0, prefix_length - 1}:
+        message = hinted[index]
+        content = message.get('content')
+        if not isinstance(content, str) or not content:
+            continue
+        hinted[index] = {
+            **message,
+            'content': [{'type': 'text', 'text': content, 'cache_control': {'type': 'ephemeral'}}],
+        }
+    return hinted
+
+
+class PrefixCacheTracker:
+    """
+    Per-process record of each adventure's previous prompt, for prefix hit ratios.
+
+    Only message digests and lengths are kept, in an LRU bounded by max_entries.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Maximum number of adventures remembered
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.turns = 0
+        self.prompt_chars = 0
+        self.prefix_hit_chars = 0
+
+    @staticmethod
+    def _digest(message: dict) -> str:
+        payload = f"{message.get('role')}\0{message.get('content')}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def observe(self, adventure_id, messages: list[dict]) -> Optional[float]:
+        """
+        Record a prompt and compare it with the adventure's previous one.
+
+        Args:
+            adventure_id: Adventure primary key
+            messages: Prompt messages of this turn
+
+        Returns:
+            Fraction of this prompt's characters in leading messages identical
+            to the previous prompt's, or None for the first prompt seen
+        """
+        digests = [self._digest(message) for message in messages]
+        lengths = [len(str(message.get('content') or '')) for message in messages]
+        total = sum(lengths)
+
+        with self._lock:
+            previous = self._entries.get(adventure_id)
+            self._entries[adventure_id] = digests
+            self._entries.move_to_end(adventure_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if previous is None:
+                return None
+
+            shared = 0
+            for length, digest, previous_digest in zip(lengths, digests, previous):
+                if digest != previous_digest:
+                    break
+                shared += length
+
+            self.turns += 1
+            self.prompt_chars += total
+            self.prefix_hit_chars += shared
+        return shared / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Aggregate prefix hit ratio over all compared turns."""
+        return {
+            'turns': self.turns,
+            'prompt_chars': self.prompt_chars,
+            'prefix_hit_chars': self.prefix_hit_chars,
+            'prefix_hit_ratio': self.prefix_hit_chars / self.prompt_chars if self.prompt_chars else None,
+            'adventures': len(self._entries),
+        }
+
+
+# Process-wide instance shared by all requests
+prefix_cache_tracker = PrefixCacheTracker(
+    max_entries=getattr(settings, 'PROMPT_PREFIX_TRACKER_SIZE', 1024),
+)
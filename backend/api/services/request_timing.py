@@ -0,0 +1,154 @@
+"""
+Per-request timing of the generation pipeline.
+
+With REQUEST_TIMING_ENABLED, api.middleware.ServerTimingMiddleware times every
+request and background streams time their own generation. Stages:
+
+- lock: waiting for the adventure's generation lock
+- prompt: build_adventure_prompt, containing history (turn selection),
+  cards (trigger detection and card loading) and tokens (token counting)
+- llm: completion call; streams record llm_ttft (time to first token)
+  and llm_stream (the rest of the stream) instead
+- persist: saving the turns of the generation
+- db: all SQL statements of the request, summed
+
+Finished timings are sent as Server-Timing response headers
+(REQUEST_TIMING_HEADER) and passed to the sinks in REQUEST_TIMING_SINKS
+(dotted paths): LogSink writes a log line per request, HistogramSink keeps
+per-endpoint and per-model histograms that are served at /metrics with the
+other backend metrics (api.services.metrics).
+"""
+
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import import_string
+
+from api.services.metrics import model_label, registry
+from api.utils.timing import Timing, current_timing
+
+logger = logging.getLogger(__name__)
+
+
+class LogSink:
+    """Writes one log line per timed request."""
+
+    def record(self, timing: Timing) -> None:
+        labels = ' '.join(f"{name}={value}" for name, value in timing.labels.items())
+        stages = ' '.join(f"{name}={seconds * 1000:.1f}ms" for name, (seconds, _) in timing.spans.items())
+        logger.info(f"timing {labels} total={timing.duration * 1000:.1f}ms {stages}")
+
+
+class HistogramSink:
+    """Histograms of request and stage durations per endpoint and model, served at /metrics."""
+
+    def __init__(self):
+        self.requests = registry.histogram(
+            'imaginai_request_duration_seconds', 'Duration of timed requests.', ('endpoint', 'model')
+        )
+        self.stages = registry.histogram(
+            'imaginai_request_stage_seconds', 'Duration of request stages.', ('endpoint', 'model', 'stage')
+        )
+
+    def record(self, timing: Timing) -> None:
+        endpoint = timing.labels.get('endpoint', '')
+        model = timing.labels.get('model')
+        # Client-supplied, so bounded like the other model labels
+        model = model_label(model) if model else ''
+        self.requests.observe(timing.duration, endpoint=endpoint, model=model)
+        for name, (seconds, _) in timing.spans.items():
+            self.stages.observe(seconds, endpoint=endpoint, model=model, stage=name)
+
+    def stats(self) -> dict:
+        """Count and mean duration (ms) per endpoint and model, with their stages (this worker)."""
+        stats = {}
+        for (endpoint, model), (counts, total) in self.requests.values().items():
+            stats.setdefault(endpoint, {})[model or '-'] = {**_summary(counts, total), 'stages': {}}
+        for (endpoint, model, stage), (counts, total) in self.stages.values().items():
+            entry = stats.setdefault(endpoint, {}).setdefault(model or '-', {'stages': {}})
+            entry['stages'][stage] = _summary(counts, total)
+        return stats
+
+
+def _summary(counts: list, total: float) -> dict:
+    count = sum(counts)
+    return {'count': count, 'mean_ms': round(total / count * 1000, 2) if count else None}
+
+
+def _time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding every statement to the request's db stage."""
+    timing = current_timing()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add('db', time.perf_counter() - start)
+
+
+class RequestTiming:
+    """Timing switch, sinks and database query timer of this process."""
+
+    def __init__(self, enabled: bool = False, header: bool = True, sinks: tuple = ()):
+        """
+        Args:
+            enabled: Time requests; when off, span() and the middleware are no-ops
+            header: Send Server-Timing response headers
+            sinks: Dotted paths of sink classes (each has record(timing))
+        """
+        self.enabled = enabled
+        self.header = enabled and header
+        self.sinks = [import_string(path)() for path in sinks] if enabled else []
+        if enabled:
+            self._install_db_timer()
+
+    def start(self, **labels) -> Optional[Timing]:
+        """New Timing with the given labels, or None when timing is off."""
+        if not self.enabled:
+            return None
+        return Timing(**labels)
+
+    def finish(self, timing: Optional[Timing]) -> None:
+        """Stop timing and hand it to the sinks."""
+        if timing is None:
+            return
+        timing.finish()
+        for sink in self.sinks:
+            try:
+                sink.record(timing)
+            except Exception as e:
+                logger.warning(f"Timing sink {type(sink).__name__} failed: {e}")
+
+    def _install_db_timer(self) -> None:
+        """Time SQL statements on every connection (opened now or later, in any thread)."""
+        connection_created.connect(self._on_connection_created, weak=False)
+        for connection in connections.all(initialized_only=True):
+            self._add_wrapper(connection)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        self._add_wrapper(connection)
+
+    @staticmethod
+    def _add_wrapper(connection) -> None:
+        if _time_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_time_query)
+
+    def histograms(self) -> Optional[HistogramSink]:
+        """The HistogramSink among the sinks, if configured."""
+        for sink in self.sinks:
+            if isinstance(sink, HistogramSink):
+                return sink
+        return None
+
+
+# Process-wide instance shared by all requests
+request_timing = RequestTiming(
+    enabled=getattr(settings, 'REQUEST_TIMING_ENABLED', False),
+    header=getattr(settings, 'REQUEST_TIMING_HEADER', True),
+    sinks=getattr(settings, 'REQUEST_TIMING_SINKS', ()),
+)
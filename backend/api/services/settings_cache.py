@@ -0,0 +1,164 @@
+"""
+In-process cache of the GlobalSettings singleton.
+
+Every worker keeps its own copy of the settings row. Changes are announced by
+writing a new version token to CACHES['default'] (Redis); workers compare their
+copy's token with the shared one at most once per check interval and reload
+from the database only when it changed. Reads between checks cost nothing, and
+an update reaches every worker within one check interval.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.models import GlobalSettings
+from imaginai_backend.config import DEFAULT_GENERATION_MODEL, DEFAULT_MAX_OUTPUT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for "shared version could not be read"
+_UNKNOWN = object()
+
+
+@dataclass(frozen=True)
+class GenerationDefaults:
+    """Generation parameters used when a request does not specify them."""
+    model: str
+    max_tokens: int
+
+
+class GlobalSettingsCache:
+    """Per-process copy of GlobalSettings, revalidated through a shared version key."""
+
+    VERSION_KEY = 'global_settings:version'
+
+    def __init__(self, check_interval: float = 2.0):
+        """
+        Args:
+            check_interval: Seconds between checks of the shared version key
+                (the maximum delay before another worker's update is seen)
+        """
+        self.check_interval = check_interval
+        self._settings: Optional[GlobalSettings] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        self.reloads = 0
+
+    def get(self) -> GlobalSettings:
+        """Get the settings, reloading them if another worker changed them."""
+        if self._is_current():
+            return self._settings
+
+        version = self._read_version()
+        if self._settings is not None and version is not _UNKNOWN and version == self._version:
+            self._checked_at = time.monotonic()
+            return self._settings
+
+        instance, _ = GlobalSettings.objects.get_or_create(pk=1)
+        return self._store(instance, version)
+
+    async def aget(self) -> GlobalSettings:
+        """Async variant of get()."""
+        if self._is_current():
+            return self._settings
+
+        version = await self._aread_version()
+        if self._settings is not None and version is not _UNKNOWN and version == self._version:
+            self._checked_at = time.monotonic()
+            return self._settings
+
+        instance, _ = await GlobalSettings.objects.aget_or_create(pk=1)
+        return self._store(instance, version)
+
+    async def generation_defaults(self) -> GenerationDefaults:
+        """
+        Defaults for the generation endpoints.
+
+        selected_model is only used when it is provider-qualified
+        ("provider/model"), as required by RotatingClient.
+        """
+        return self._defaults_from(await self.aget())
+
+    def loaded_generation_defaults(self) -> GenerationDefaults:
+        """
+        Defaults from the copy this worker already holds, without reading the
+        database or the version key (the built-in defaults if none is loaded).
+        """
+        return self._defaults_from(self._settings)
+
+    @staticmethod
+    def _defaults_from(instance: Optional[GlobalSettings]) -> GenerationDefaults:
+        model = instance.selected_model if instance is not None else None
+        if not model or '/' not in model:
+            model = DEFAULT_GENERATION_MODEL
+        return GenerationDefaults(
+            model=model,
+            max_tokens=(instance.global_max_output_tokens if instance is not None else None)
+            or DEFAULT_MAX_OUTPUT_TOKENS,
+        )
+
+    def notify_changed(self, instance: GlobalSettings) -> None:
+        """
+        Announce an update to all workers and refresh this worker's copy.
+
+        Args:
+            instance: The saved settings row
+        """
+        version = uuid.uuid4().hex
+        try:
+            cache.set(self.VERSION_KEY, version, timeout=None)
+        except Exception as e:
+            # Other workers pick the change up on their next fallback reload
+            logger.warning(f"Failed to publish settings version: {e}")
+            version = _UNKNOWN
+        self._store(instance, version)
+
+    def invalidate(self) -> None:
+        """Drop this worker's copy."""
+        with self._lock:
+            self._settings = None
+            self._checked_at = 0.0
+
+    def _is_current(self) -> bool:
+        return (
+            self._settings is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def _store(self, instance: GlobalSettings, version) -> GlobalSettings:
+        with self._lock:
+            self._settings = instance
+            # An unknown version never matches, so the next check reloads from the DB
+            self._version = None if version is _UNKNOWN else version
+            self._checked_at = time.monotonic()
+            self.reloads += 1
+        return instance
+
+    def _read_version(self):
+        try:
+            return cache.get(self.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read settings version: {e}")
+            return _UNKNOWN
+
+    async def _aread_version(self):
+        try:
+            return await cache.aget(self.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read settings version: {e}")
+            return _UNKNOWN
+
+
+# Process-wide instance shared by all requests
+global_settings = GlobalSettingsCache(
+    check_interval=getattr(settings, 'GLOBAL_SETTINGS_CHECK_INTERVAL', 2.0),
+)
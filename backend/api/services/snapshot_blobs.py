@@ -0,0 +1,307 @@
+"""
+Shared, content-addressed story card sets (card storage mode 'shared').
+
+Adventures started from the same scenario state reference one SnapshotBlob by
+the sha256 of its cards instead of each storing a copy. Card edits made in an
+adventure go to its Adventure.snapshotOverlay, which only grows with the number
+of edits:
+
+    {
+        "cards":    {card_id: card},            # edited and added cards
+        "deleted":  [card_id, ...],             # removed cards
+        "inserted": {anchor_id: [card_id, ...]} # added cards, placed right after
+                                                # anchor_id ("" = end of list)
+    }
+
+Card ids are compared as strings, as in SnapshotCardEditor.
+
+The blob of a scenario is remembered in CACHES['default'] under a fingerprint
+of its cards (count and latest updated_at), so starting an adventure from an
+unchanged scenario neither reads nor hashes its cards. Blobs never change once
+written, so their parsed cards are also kept in a small per-process LRU.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from api.models import Adventure, Scenario, SnapshotBlob
+from api.services.snapshot_cards import SnapshotCardNotFound, SnapshotConflict
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_KEY_PREFIX = 'snapshot_blob:scenario:'
+
+# Scenario card columns frozen into a blob (same as the 'snapshot' layout)
+SCENARIO_CARD_FIELDS = ('id', 'title', 'card_type', 'trigger_words', 'short_description', 'full_content')
+
+
+def content_hash(cards: list) -> str:
+    """sha256 of the canonical JSON of a card list."""
+    payload = json.dumps(cards, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def blob_for_cards(cards: list) -> SnapshotBlob:
+    """
+    Get the blob holding exactly these cards, creating it if needed.
+
+    Args:
+        cards: Card dicts in snapshot order
+
+    Returns:
+        SnapshotBlob (only its hash is guaranteed to be loaded)
+    """
+    blob_hash = content_hash(cards)
+    blob, _ = SnapshotBlob.objects.only('hash').get_or_create(
+        hash=blob_hash,
+        defaults={'cards': cards, 'cardCount': len(cards)}
+    )
+    return blob
+
+
+def _scenario_fingerprint(scenario: Scenario) -> str:
+    """Changes whenever a card of the scenario is added, edited or removed."""
+    stats = scenario.cards.aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = stats['updated'].isoformat() if stats['updated'] else ''
+    return f"{stats['count']}:{updated}"
+
+
+def scenario_blob(scenario: Scenario) -> SnapshotBlob:
+    """
+    The blob of a scenario's current cards.
+
+    Reuses the blob recorded for the scenario's card fingerprint when it still
+    exists; otherwise reads the cards once and stores (or finds) their blob.
+    """
+    key = f"{SCENARIO_KEY_PREFIX}{scenario.pk}:{_scenario_fingerprint(scenario)}"
+    try:
+        blob_hash = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Snapshot blob lookup failed: {e}")
+        blob_hash = None
+
+    if blob_hash:
+        blob = SnapshotBlob.objects.only('hash').filter(pk=blob_hash).first()
+        if blob is not None:
+            return blob
+
+    cards = list(scenario.cards.values(*SCENARIO_CARD_FIELDS))
+    blob = blob_for_cards(cards)
+    try:
+        cache.set(key, blob.hash, timeout=getattr(settings, 'SNAPSHOT_BLOB_SCENARIO_TIMEOUT', 86400))
+    except Exception as e:
+        logger.warning(f"Failed to record snapshot blob of scenario {scenario.pk}: {e}")
+    return blob
+
+
+class BlobCardCache:
+    """Per-process LRU of blob cards and their id -> card lookup, keyed by hash."""
+
+    def __init__(self, max_entries: int = 32):
+        """
+        Args:
+            max_entries: Maximum number of blobs kept in process memory
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, blob_hash: str) -> Tuple[list, dict]:
+        """
+        Cards of a blob and a card id (str) -> card dict lookup.
+
+        The returned objects are shared and must not be modified.
+        """
+        entry = self._get_local(blob_hash)
+        if entry is None:
+            cards = SnapshotBlob.objects.values_list('cards', flat=True).get(pk=blob_hash)
+            entry = self._put_local(blob_hash, cards)
+        return entry
+
+    async def aget(self, blob_hash: str) -> Tuple[list, dict]:
+        """Async variant of get()."""
+        entry = self._get_local(blob_hash)
+        if entry is None:
+            cards = await SnapshotBlob.objects.values_list('cards', flat=True).aget(pk=blob_hash)
+            entry = self._put_local(blob_hash, cards)
+        return entry
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    def _get_local(self, blob_hash: str):
+        with self._lock:
+            entry = self._entries.get(blob_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(blob_hash)
+            self.hits += 1
+            return entry
+
+    def _put_local(self, blob_hash: str, cards: list):
+        entry = (cards, {str(card.get('id')): card for card in cards})
+        with self._lock:
+            self._entries[blob_hash] = entry
+            self._entries.move_to_end(blob_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+# Process-wide instance shared by all requests
+blob_card_cache = BlobCardCache(
+    max_entries=getattr(settings, 'SNAPSHOT_BLOB_CACHE_SIZE', 32),
+)
+
+
+def apply_overlay(cards: Iterable[dict], overlay: Optional[dict]) -> list:
+    """
+    Resolve base cards and an adventure's overlay into its card list.
+
+    Args:
+        cards: Base cards of the blob, in order
+        overlay: Adventure.snapshotOverlay
+
+    Returns:
+        Card dicts in snapshot order (unchanged base cards are shared, not copied)
+    """
+    if not overlay:
+        return list(cards)
+    changed = overlay.get('cards', {})
+    deleted = set(overlay.get('deleted', ()))
+    inserted = overlay.get('inserted', {})
+
+    result = []
+
+    def emit(card_id: str, card: Optional[dict]):
+        # Iterative, since copies of copies chain insertions arbitrarily deep
+        stack = [(card_id, card)]
+        while stack:
+            card_id, card = stack.pop()
+            if card_id not in deleted:
+                result.append(changed.get(card_id, card))
+            stack.extend((new_id, None) for new_id in reversed(inserted.get(card_id, ())))
+
+    for card in cards:
+        emit(str(card.get('id')), card)
+    for new_id in inserted.get('', ()):
+        emit(new_id, None)
+    return result
+
+
+def list_shared_cards(adventure: Adventure) -> list:
+    if adventure.snapshotBlob_id is None:
+        return []
+    cards, _ = blob_card_cache.get(adventure.snapshotBlob_id)
+    return apply_overlay(cards, adventure.snapshotOverlay)
+
+
+async def alist_shared_cards(adventure: Adventure) -> list:
+    if adventure.snapshotBlob_id is None:
+        return []
+    cards, _ = await blob_card_cache.aget(adventure.snapshotBlob_id)
+    return apply_overlay(cards, adventure.snapshotOverlay)
+
+
+class SharedCardEditor:
+    """
+    Card mutations on an adventure using the 'shared' card storage.
+
+    Same interface and exceptions as SnapshotCardEditor. Mutations only write
+    the adventure's overlay; the shared blob is never modified.
+    """
+
+    def __init__(self, adventure_id: int):
+        """
+        Args:
+            adventure_id: Primary key of the adventure to modify
+        """
+        self.adventure_id = adventure_id
+
+    def add(self, card: dict, expected_version: Optional[int] = None) -> int:
+        def apply(overlay, base):
+            card_id = str(card['id'])
+            known = card_id in base or card_id in overlay['cards']
+            overlay['cards'][card_id] = card
+            if card_id in overlay['deleted']:
+                overlay['deleted'].remove(card_id)
+            if not known:
+                overlay['inserted'].setdefault('', []).append(card_id)
+        return self._locked_update(apply, expected_version)
+
+    def edit(self, card_id, card: dict, expected_version: Optional[int] = None) -> int:
+        def apply(overlay, base):
+            self._find(overlay, base, card_id)
+            overlay['cards'][str(card_id)] = {**card, 'id': card_id}
+        return self._locked_update(apply, expected_version)
+
+    def delete(self, card_id, expected_version: Optional[int] = None) -> int:
+        def apply(overlay, base):
+            self._find(overlay, base, card_id)
+            card_id_str = str(card_id)
+            overlay['deleted'].append(card_id_str)
+            # Added cards keep their place in 'inserted' (anchors of later copies)
+            overlay['cards'].pop(card_id_str, None)
+        return self._locked_update(apply, expected_version)
+
+    def duplicate(self, card_id, expected_version: Optional[int] = None) -> Tuple[str, int]:
+        new_id = str(uuid.uuid4())
+
+        def apply(overlay, base):
+            original = self._find(overlay, base, card_id)
+            overlay['cards'][new_id] = {
+                **original,
+                'id': new_id,
+                'title': f"{original.get('title', '')} (Copy)",
+            }
+            # Right after the original, before earlier copies of it
+            overlay['inserted'].setdefault(str(card_id), []).insert(0, new_id)
+        return new_id, self._locked_update(apply, expected_version)
+
+    @staticmethod
+    def _find(overlay: dict, base: dict, card_id) -> dict:
+        card_id = str(card_id)
+        if card_id not in overlay['deleted']:
+            card = overlay['cards'].get(card_id) or base.get(card_id)
+            if card is not None:
+                return card
+        raise SnapshotCardNotFound(card_id)
+
+    def _locked_update(self, apply, expected_version: Optional[int]) -> int:
+        """Read-modify-write of the overlay under a row lock, saving only the touched columns."""
+        with transaction.atomic():
+            adventure = (
+                Adventure.objects.select_for_update()
+                .only('id', 'snapshotBlob', 'snapshotOverlay', 'snapshotVersion', 'lastPlayedAt')
+                .get(pk=self.adventure_id)
+            )
+            if expected_version is not None and adventure.snapshotVersion != expected_version:
+                raise SnapshotConflict(adventure.snapshotVersion)
+
+            base = {}
+            if adventure.snapshotBlob_id is not None:
+                _, base = blob_card_cache.get(adventure.snapshotBlob_id)
+            overlay = adventure.snapshotOverlay or {}
+            overlay.setdefault('cards', {})
+            overlay.setdefault('deleted', [])
+            overlay.setdefault('inserted', {})
+            apply(overlay, base)
+
+            adventure.snapshotOverlay = overlay
+            adventure.snapshotVersion += 1
+            adventure.save(update_fields=['snapshotOverlay', 'snapshotVersion', 'lastPlayedAt'])
+            return adventure.snapshotVersion
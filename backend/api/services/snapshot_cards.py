@@ -0,0 +1,243 @@
+"""
+Targeted story card mutations on an adventure's scenario snapshot.
+
+Each mutation updates only the snapshot, its version and lastPlayedAt. On
+PostgreSQL the card is located and changed inside the database with jsonb_set /
+jsonb_insert under a row lock, so the document never travels to Python and no
+other column is rewritten. Other databases fall back to a locked
+read-modify-write limited to the same columns.
+
+Adventure.snapshotVersion is incremented by every mutation. Callers may pass
+the version they last saw for an optimistic check; concurrent mutations are
+never lost either way, since each one applies to the latest document.
+"""
+
+import json
+import uuid
+from typing import Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Adventure
+
+
+class SnapshotConflict(Exception):
+    """The snapshot changed since the version the caller expected."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Snapshot was modified (current version {current_version})")
+        self.current_version = current_version
+
+
+class SnapshotCardNotFound(Exception):
+    """No card with the given id exists in the snapshot."""
+
+
+class SnapshotCardEditor:
+    """Card mutations on one adventure's scenarioSnapshot."""
+
+    def __init__(self, adventure_id: int):
+        """
+        Args:
+            adventure_id: Primary key of the adventure to modify
+        """
+        self.adventure_id = adventure_id
+
+    def add(self, card: dict, expected_version: Optional[int] = None) -> int:
+        """
+        Append a card to the snapshot.
+
+        Returns:
+            The new snapshot version
+        """
+        if connection.vendor == 'postgresql':
+            snapshot = self._column('scenarioSnapshot')
+            return self._pg_update(
+                f"jsonb_set(COALESCE(t.{snapshot}, '{{}}'::jsonb), '{{cards}}', "
+                f"COALESCE(t.{snapshot}->'cards', '[]'::jsonb) || jsonb_build_array(%s::jsonb))",
+                [json.dumps(card)],
+                expected_version
+            )
+
+        def apply(cards):
+            cards.append(card)
+        return self._locked_update(apply, expected_version)
+
+    def edit(self, card_id, card: dict, expected_version: Optional[int] = None) -> int:
+        """
+        Replace a card, keeping its id.
+
+        Returns:
+            The new snapshot version
+        """
+        card = {**card, 'id': card_id}
+        if connection.vendor == 'postgresql':
+            snapshot = self._column('scenarioSnapshot')
+            return self._pg_update_card(
+                card_id,
+                f"jsonb_set(t.{snapshot}, ARRAY['cards', pos.idx::text], %s::jsonb)",
+                [json.dumps(card)],
+                expected_version
+            )
+
+        def apply(cards):
+            cards[self._find(cards, card_id)] = card
+        return self._locked_update(apply, expected_version)
+
+    def delete(self, card_id, expected_version: Optional[int] = None) -> int:
+        """
+        Remove a card.
+
+        Returns:
+            The new snapshot version
+        """
+        if connection.vendor == 'postgresql':
+            snapshot = self._column('scenarioSnapshot')
+            return self._pg_update_card(
+                card_id,
+                f"jsonb_set(t.{snapshot}, '{{cards}}', (t.{snapshot}->'cards') - pos.idx::int)",
+                [],
+                expected_version
+            )
+
+        def apply(cards):
+            del cards[self._find(cards, card_id)]
+        return self._locked_update(apply, expected_version)
+
+    def duplicate(self, card_id, expected_version: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Insert a copy of a card (new id, title suffixed with "(Copy)") right after it.
+
+        Returns:
+            (id of the copy, new snapshot version)
+        """
+        new_id = str(uuid.uuid4())
+        if connection.vendor == 'postgresql':
+            snapshot = self._column('scenarioSnapshot')
+            version = self._pg_update_card(
+                card_id,
+                f"jsonb_insert(t.{snapshot}, ARRAY['cards', pos.idx::text], "
+                f"pos.card || jsonb_build_object('id', %s::text, "
+                f"'title', COALESCE(pos.card->>'title', '') || ' (Copy)'), true)",
+                [new_id],
+                expected_version
+            )
+            return new_id, version
+
+        def apply(cards):
+            index = self._find(cards, card_id)
+            copy = cards[index].copy()
+            copy['id'] = new_id
+            copy['title'] = f"{cards[index].get('title', '')} (Copy)"
+            cards.insert(index + 1, copy)
+        return new_id, self._locked_update(apply, expected_version)
+
+    # ==================== PostgreSQL ====================
+
+    @staticmethod
+    def _column(name: str) -> str:
+        return connection.ops.quote_name(Adventure._meta.get_field(name).column)
+
+    def _pg_update(self, snapshot_sql: str, params: list, expected_version: Optional[int]) -> int:
+        """Run an UPDATE that does not need to locate a card first."""
+        table = connection.ops.quote_name(Adventure._meta.db_table)
+        version = self._column('snapshotVersion')
+        played = self._column('lastPlayedAt')
+
+        sql = (
+            f"UPDATE {table} AS t SET {self._column('scenarioSnapshot')} = {snapshot_sql}, "
+            f"{version} = t.{version} + 1, {played} = %s "
+            f"WHERE t.id = %s"
+        )
+        params = params + [timezone.now(), self.adventure_id]
+        if expected_version is not None:
+            sql += f" AND t.{version} = %s"
+            params.append(expected_version)
+        sql += f" RETURNING t.{version}"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            raise SnapshotConflict(self._current_version())
+        return row[0]
+
+    def _pg_update_card(
+        self,
+        card_id,
+        snapshot_sql: str,
+        params: list,
+        expected_version: Optional[int]
+    ) -> int:
+        """
+        Run an UPDATE on the card with the given id.
+
+        snapshot_sql may reference pos.idx (array index of the card) and
+        pos.card (the card itself). The row is locked before the card is
+        located, so a concurrent mutation cannot shift the index in between.
+        """
+        table = connection.ops.quote_name(Adventure._meta.db_table)
+        snapshot = self._column('scenarioSnapshot')
+        version = self._column('snapshotVersion')
+        played = self._column('lastPlayedAt')
+
+        sql = (
+            f"WITH pos AS ("
+            f"SELECT e.ord - 1 AS idx, e.card AS card "
+            f"FROM {table} AS a, jsonb_array_elements(a.{snapshot}->'cards') WITH ORDINALITY AS e(card, ord) "
+            f"WHERE a.id = %s AND e.card->>'id' = %s LIMIT 1"
+            f") "
+            f"UPDATE {table} AS t SET {snapshot} = {snapshot_sql}, "
+            f"{version} = t.{version} + 1, {played} = %s "
+            f"FROM pos WHERE t.id = %s "
+            f"RETURNING t.{version}"
+        )
+        params = [self.adventure_id, str(card_id)] + params + [timezone.now(), self.adventure_id]
+
+        with transaction.atomic():
+            current = self._current_version(lock=True)
+            if expected_version is not None and current != expected_version:
+                raise SnapshotConflict(current)
+
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            if row is None:
+                raise SnapshotCardNotFound(card_id)
+            return row[0]
+
+    def _current_version(self, lock: bool = False) -> int:
+        queryset = Adventure.objects.filter(pk=self.adventure_id)
+        if lock:
+            queryset = queryset.select_for_update()
+        return queryset.values_list('snapshotVersion', flat=True).get()
+
+    # ==================== Other databases ====================
+
+    @staticmethod
+    def _find(cards: list, card_id) -> int:
+        for i, card in enumerate(cards):
+            if str(card.get('id')) == str(card_id):
+                return i
+        raise SnapshotCardNotFound(card_id)
+
+    def _locked_update(self, apply, expected_version: Optional[int]) -> int:
+        """Read-modify-write of the snapshot under a row lock, saving only the touched columns."""
+        with transaction.atomic():
+            adventure = (
+                Adventure.objects.select_for_update()
+                .only('id', 'scenarioSnapshot', 'snapshotVersion', 'lastPlayedAt')
+                .get(pk=self.adventure_id)
+            )
+            if expected_version is not None and adventure.snapshotVersion != expected_version:
+                raise SnapshotConflict(adventure.snapshotVersion)
+
+            snapshot = adventure.scenarioSnapshot or {}
+            cards = snapshot.setdefault('cards', [])
+            apply(cards)
+
+            adventure.scenarioSnapshot = snapshot
+            adventure.snapshotVersion += 1
+            adventure.save(update_fields=['scenarioSnapshot', 'snapshotVersion', 'lastPlayedAt'])
+            return adventure.snapshotVersion
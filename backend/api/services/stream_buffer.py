@@ -0,0 +1,241 @@
+"""
+Resumable SSE streams.
+
+A stream generation runs as a task on a background event loop, so it keeps
+going (and saves its turn) when the client disconnects. Every event gets an
+SSE id, "<stream id>:<n>", and is written to a buffer in CACHES['default']
+(Redis): a ring of the last max_events events that expires ttl seconds after
+the last write. A client reconnecting with Last-Event-ID is sent the events it
+missed, then follows the live output: from the in-process stream when it runs
+on this worker, otherwise by polling the buffer.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.services.metrics import sse_connections, stream_duration
+from api.utils.coalescing import StreamFanout
+
+logger = logging.getLogger(__name__)
+
+
+class StreamExpired(Exception):
+    """The requested events of a stream are no longer buffered."""
+
+
+def parse_event_id(event_id: str) -> Optional[tuple]:
+    """
+    Split an SSE event id into stream id and event number.
+
+    Returns:
+        (stream_id, number), or None if event_id is malformed
+    """
+    stream_id, _, number = (event_id or '').strip().rpartition(':')
+    if not stream_id or not number.isdigit():
+        return None
+    return stream_id, int(number)
+
+
+class StreamBuffer:
+    """Runs streams in the background and buffers their events for resumption."""
+
+    KEY_PREFIX = 'sse:'
+
+    def __init__(self, max_events: int = 2000, ttl: int = 600, poll_interval: float = 0.1):
+        """
+        Args:
+            max_events: Events kept per stream; older ones cannot be replayed
+            ttl: Seconds a stream's buffer is kept after its last event
+            poll_interval: Seconds between buffer reads when following a
+                stream that runs on another worker
+        """
+        self.max_events = max_events
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        # stream id -> (StreamFanout, owner) of streams running in this process
+        self._local: dict = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.started = 0
+        self.resumed = 0
+        self.expired = 0
+
+    def _state_key(self, stream_id: str) -> str:
+        return f"{self.KEY_PREFIX}{stream_id}"
+
+    def _event_key(self, stream_id: str, number: int) -> str:
+        return f"{self.KEY_PREFIX}{stream_id}:{number % self.max_events}"
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop of the runner thread (started on first use)."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name='stream-buffer', daemon=True
+                ).start()
+            return self._loop
+
+    def start(self, produce: Callable[[], AsyncIterator[str]], owner: Optional[str] = None) -> str:
+        """
+        Run a stream to completion in the background.
+
+        Args:
+            produce: Async generator function yielding SSE messages ("data: ...\\n\\n")
+            owner: What the stream belongs to (e.g. the adventure id); resuming
+                requests are checked against it with owner()
+
+        Returns:
+            The new stream id
+        """
+        stream_id = uuid.uuid4().hex
+        fanout = StreamFanout()
+        with self._lock:
+            self._local[stream_id] = (fanout, owner)
+            self.started += 1
+        # Scheduled from an empty context: the task must not inherit the
+        # request's asgiref executors, which stop with the request
+        contextvars.Context().run(
+            asyncio.run_coroutine_threadsafe,
+            self._pump(stream_id, produce, fanout, owner),
+            self._background_loop()
+        )
+        return stream_id
+
+    async def _pump(
+        self,
+        stream_id: str,
+        produce: Callable[[], AsyncIterator[str]],
+        fanout: StreamFanout,
+        owner: Optional[str]
+    ) -> None:
+        number = 0
+        started = time.perf_counter()
+        # Known to other workers before the first event id is handed out
+        await self._store(stream_id, {self._state_key(stream_id): {'last': 0, 'done': False, 'owner': owner}})
+        try:
+            async for message in produce():
+                number += 1
+                # Local followers first, so the buffer write adds no latency for them
+                fanout.publish((number, message))
+                await self._store(stream_id, {
+                    self._event_key(stream_id, number): (number, message),
+                    self._state_key(stream_id): {'last': number, 'done': False, 'owner': owner},
+                })
+        except Exception as e:
+            logger.warning(f"Stream {stream_id} failed: {e}")
+        finally:
+            await self._store(stream_id, {self._state_key(stream_id): {'last': number, 'done': True, 'owner': owner}})
+            with self._lock:
+                self._local.pop(stream_id, None)
+            fanout.finish()
+            stream_duration.observe(time.perf_counter() - started)
+
+    async def _store(self, stream_id: str, entries: dict) -> None:
+        try:
+            await cache.aset_many(entries, timeout=self.ttl)
+        except Exception as e:
+            # Live followers are unaffected; only resumption is lost
+            logger.warning(f"Failed to buffer events of stream {stream_id}: {e}")
+
+    async def owner(self, stream_id: str) -> Optional[str]:
+        """
+        Owner a stream was started with (see start).
+
+        Returns:
+            The owner, or None if the stream is unknown or has expired
+        """
+        with self._lock:
+            running = self._local.get(stream_id)
+        if running is not None:
+            return running[1]
+        try:
+            state = await cache.aget(self._state_key(stream_id))
+        except Exception as e:
+            logger.warning(f"Failed to read state of stream {stream_id}: {e}")
+            return None
+        return state.get('owner') if state else None
+
+    async def events(self, stream_id: str, after: int = 0) -> AsyncIterator[tuple]:
+        """
+        Yield (number, message) for the events of a stream after `after`, live until it ends.
+
+        Raises:
+            StreamExpired: The stream is unknown or the events were dropped from the buffer
+        """
+        with self._lock:
+            running = self._local.get(stream_id)
+        if running is not None:
+            async for number, message in running[0].subscribe():
+                if number > after:
+                    yield number, message
+            return
+
+        # Finished, or running on another worker: follow the buffer
+        position = after
+        while True:
+            state = await cache.aget(self._state_key(stream_id))
+            if state is None:
+                raise StreamExpired(f"Stream {stream_id} is unknown or has expired")
+            last = state['last']
+
+            if position < last:
+                if last - position > self.max_events:
+                    raise StreamExpired(f"Events after {position} of stream {stream_id} were dropped")
+                numbers = range(position + 1, last + 1)
+                stored = await cache.aget_many([self._event_key(stream_id, number) for number in numbers])
+                for number in numbers:
+                    entry = stored.get(self._event_key(stream_id, number))
+                    if entry is None or entry[0] != number:
+                        raise StreamExpired(f"Event {number} of stream {stream_id} has expired")
+                    yield number, entry[1]
+                position = last
+            elif state['done']:
+                return
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    async def sse(self, stream_id: str, after: int = 0) -> AsyncIterator[str]:
+        """
+        SSE messages of a stream, each with an `id: <stream id>:<n>` field.
+
+        A stream that cannot be resumed ends with an error event.
+        """
+        if after:
+            with self._lock:
+                self.resumed += 1
+        sse_connections.inc()
+        try:
+            async for number, message in self.events(stream_id, after):
+                yield f"id: {stream_id}:{number}\n{message}"
+        except StreamExpired as e:
+            with self._lock:
+                self.expired += 1
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            sse_connections.dec()
+
+    def stats(self) -> dict:
+        return {
+            'running': len(self._local),
+            'started': self.started,
+            'resumed': self.resumed,
+            'expired': self.expired,
+        }
+
+
+# Process-wide instance shared by all requests
+stream_buffer = StreamBuffer(
+    max_events=getattr(settings, 'STREAM_BUFFER_MAX_EVENTS', 2000),
+    ttl=getattr(settings, 'STREAM_BUFFER_TTL', 600),
+)
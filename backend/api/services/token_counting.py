@@ -0,0 +1,79 @@
+"""
+Memoized per-turn token counting.
+
+Token counts of adventure turns are stored on AdventureTurn.tokenCounts, keyed
+by tokenizer family, so budget calculations only run the tokenizer once per
+turn and family.
+"""
+
+from typing import Optional
+
+from rotator_library import RotatingClient
+
+from api.models import AdventureTurn
+from imaginai_backend.config import TOKENIZER_FAMILY_PREFIXES
+
+
+def get_tokenizer_family(model: str) -> str:
+    """
+    Map a model identifier to its tokenizer family.
+
+    Args:
+        model: Model identifier, with or without provider prefix
+
+    Returns:
+        Family name from TOKENIZER_FAMILY_PREFIXES, or the bare model name
+    """
+    bare_model = model.split('/', 1)[-1].lower()
+    for prefix, family in TOKENIZER_FAMILY_PREFIXES:
+        if bare_model.startswith(prefix):
+            return family
+    return bare_model
+
+
+def count_turn_tokens(client: RotatingClient, model: str, role: str, text: str) -> int:
+    """Count the prompt tokens of a single turn as it appears in the message list."""
+    return client.token_count(model=model, messages=[{"role": role, "content": text}])
+
+
+class TurnTokenCounter:
+    """
+    Counts turn tokens for one model, reading and filling AdventureTurn.tokenCounts.
+
+    Counts computed on a miss are written back in a single bulk update by
+    flush(), so the next prompt for the same tokenizer family is a plain sum.
+    """
+
+    def __init__(self, client: RotatingClient, model: str):
+        """
+        Args:
+            client: RotatingClient used for tokenization on a miss
+            model: Model whose tokenizer family keys the memoized counts
+        """
+        self.client = client
+        self.model = model
+        self.family = get_tokenizer_family(model)
+        self.hits = 0
+        self.misses = 0
+        self._dirty: list = []
+
+    def __call__(self, turn: AdventureTurn) -> int:
+        """Return the token count of a turn, computing and memoizing it if needed."""
+        counts = turn.tokenCounts or {}
+        cached: Optional[int] = counts.get(self.family)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        count = count_turn_tokens(self.client, self.model, turn.role, turn.text)
+        turn.tokenCounts = {**counts, self.family: count}
+        self._dirty.append(turn)
+        return count
+
+    async def flush(self) -> None:
+        """Persist counts computed since the last flush."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, []
+        await AdventureTurn.objects.abulk_update(dirty, ['tokenCounts'])
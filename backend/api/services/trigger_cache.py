@@ -0,0 +1,175 @@
+"""
+Cache for compiled trigger indexes.
+
+Two tiers:
+1. Process-local LRU keyed by adventure id (always on)
+2. Optional shared tier in CACHES['default'] (Redis), keyed by a content hash of
+   the snapshot's trigger words so adventures started from the same scenario
+   share a single compiled index
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.utils.trigger_index import TriggerIndex
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerIndexCache:
+    """
+    LRU cache of TriggerIndex instances per adventure.
+
+    Entries are validated against a fingerprint of the cards' ids and trigger
+    words, so a stale index is never served even if an invalidation is missed.
+    Content-only edits (title, full_content, ...) keep the same fingerprint and
+    therefore keep hitting the cache.
+    """
+
+    SHARED_KEY_PREFIX = 'trigger_index:'
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        shared: bool = False,
+        shared_timeout: int = 3600
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of adventures kept in process memory
+            shared: Also store compiled indexes in the default Django cache
+            shared_timeout: TTL in seconds for shared entries
+        """
+        self.max_entries = max_entries
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.invalidations = 0
+
+    @staticmethod
+    def fingerprint(cards: list[dict]) -> str:
+        """Hash the trigger-relevant parts of a card list (ids, triggers, order)."""
+        payload = json.dumps(
+            [(card.get('id'), card.get('trigger_words', '')) for card in cards],
+            separators=(',', ':'),
+            default=str
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _get_local(self, adventure_id, fingerprint: str) -> Optional[TriggerIndex]:
+        with self._lock:
+            entry = self._entries.get(adventure_id)
+            if entry is None or entry[0] != fingerprint:
+                return None
+            self._entries.move_to_end(adventure_id)
+            self.hits += 1
+            return entry[1]
+
+    def _put_local(self, adventure_id, fingerprint: str, index: TriggerIndex) -> None:
+        with self._lock:
+            self._entries[adventure_id] = (fingerprint, index)
+            self._entries.move_to_end(adventure_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _build(self, cards: list[dict]) -> TriggerIndex:
+        start = time.perf_counter()
+        index = TriggerIndex.from_cards(cards)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.misses += 1
+            self.builds += 1
+            self.build_seconds += elapsed
+        return index
+
+    async def aget(self, adventure_id, cards: list[dict]) -> TriggerIndex:
+        """
+        Get the compiled index for an adventure's cards, building it on a miss.
+
+        Args:
+            adventure_id: Adventure primary key
+            cards: Cards from the adventure's scenario snapshot
+
+        Returns:
+            TriggerIndex matching the given cards
+        """
+        fingerprint = self.fingerprint(cards)
+        index = self._get_local(adventure_id, fingerprint)
+        if index is not None:
+            return index
+
+        if self.shared:
+            try:
+                index = await cache.aget(self.SHARED_KEY_PREFIX + fingerprint)
+            except Exception as e:
+                logger.warning(f"Shared trigger index lookup failed: {e}")
+            if index is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._put_local(adventure_id, fingerprint, index)
+                return index
+
+        index = self._build(cards)
+        self._put_local(adventure_id, fingerprint, index)
+
+        if self.shared:
+            try:
+                await cache.aset(self.SHARED_KEY_PREFIX + fingerprint, index, self.shared_timeout)
+            except Exception as e:
+                logger.warning(f"Shared trigger index store failed: {e}")
+
+        return index
+
+    def invalidate(self, adventure_id) -> None:
+        """Drop the local entry for an adventure (after snapshot card edits)."""
+        with self._lock:
+            if self._entries.pop(adventure_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all local entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss/build-time counters."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'shared': self.shared,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'builds': self.builds,
+                'build_seconds_total': self.build_seconds,
+                'build_seconds_avg': self.build_seconds / self.builds if self.builds else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+# Process-wide instance shared by all AIService instances
+trigger_index_cache = TriggerIndexCache(
+    max_entries=getattr(settings, 'TRIGGER_INDEX_CACHE_SIZE', 256),
+    shared=getattr(settings, 'TRIGGER_INDEX_CACHE_SHARED', False),
+    shared_timeout=getattr(settings, 'TRIGGER_INDEX_CACHE_TIMEOUT', 3600),
+)
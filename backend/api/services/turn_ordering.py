@@ -0,0 +1,181 @@
+"""
+Turn ordering guarantees for concurrent play.
+
+1. Per-adventure generation lock: generations on one adventure run one at a
+   time (each reads the history and appends turns), while different
+   adventures never wait for each other. The lock is held in-process
+   (KeyedLock) and, with ADVENTURE_LOCK_DISTRIBUTED, also in CACHES['default']
+   (Redis) so that workers of a multi-process deployment exclude each other.
+2. Turn sequence numbers: every AdventureTurn gets the next value of its
+   adventure's Adventure.turnSequence counter, allocated by an atomic UPDATE.
+   History is ordered by (sequence, id) rather than by wall-clock timestamps.
+3. Turn persistence: the turns of one generation are saved by append_turns()
+   in a single transaction after the completion succeeded, so a failed
+   generation leaves no orphaned user turn behind.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import Adventure, AdventureTurn, TokenUsageStats
+from api.utils.keyed_lock import KeyedLock
+from api.utils.timing import span
+
+logger = logging.getLogger(__name__)
+
+
+class AdventureBusy(Exception):
+    """Another generation holds the adventure's lock."""
+
+    def __init__(self, adventure_id):
+        super().__init__(f"Another generation is in progress for adventure {adventure_id}")
+        self.adventure_id = adventure_id
+
+
+class AdventureLocks:
+    """Per-adventure generation lock, local and optionally shared between workers."""
+
+    KEY_PREFIX = 'adventure_lock:'
+
+    def __init__(self, distributed: bool = False, wait_timeout: float = 30.0, ttl: int = 300):
+        """
+        Args:
+            distributed: Also hold the lock in CACHES['default'] (multi-worker deployments)
+            wait_timeout: Seconds to wait for the lock before AdventureBusy is raised
+            ttl: Seconds after which a shared lock expires (covers crashed workers;
+                must exceed the longest generation)
+        """
+        self.distributed = distributed
+        self.wait_timeout = wait_timeout
+        self.ttl = ttl
+        self._local = KeyedLock()
+
+    @asynccontextmanager
+    async def hold(self, adventure_id):
+        """
+        Hold the adventure's lock for the duration of the block.
+
+        Raises:
+            AdventureBusy: The lock could not be acquired within wait_timeout
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        with span('lock'):
+            acquired = await self._local.acquire(adventure_id, timeout=self.wait_timeout)
+        if not acquired:
+            raise AdventureBusy(adventure_id)
+        try:
+            token = None
+            if self.distributed:
+                token = uuid.uuid4().hex
+                with span('lock'):
+                    acquired = await self._acquire_shared(adventure_id, token, deadline)
+                if not acquired:
+                    raise AdventureBusy(adventure_id)
+            try:
+                yield
+            finally:
+                if token is not None:
+                    await self._release_shared(adventure_id, token)
+        finally:
+            self._local.release(adventure_id)
+
+    async def _acquire_shared(self, adventure_id, token: str, deadline: float) -> bool:
+        key = f"{self.KEY_PREFIX}{adventure_id}"
+        delay = 0.05
+        while True:
+            # add() is SET NX in Redis: only one worker can create the key
+            if await cache.aadd(key, token, timeout=self.ttl):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    async def _release_shared(self, adventure_id, token: str) -> None:
+        key = f"{self.KEY_PREFIX}{adventure_id}"
+        try:
+            # Only delete our own lock (it may have expired and been taken over)
+            if await cache.aget(key) == token:
+                await cache.adelete(key)
+        except Exception as e:
+            logger.warning(f"Failed to release lock of adventure {adventure_id}: {e}")
+
+    def stats(self) -> dict:
+        """Adventures whose lock is held, and generations waiting (this worker)."""
+        return self._local.stats()
+
+
+def _reserve_sequences(adventure_id, count: int, **changes) -> int:
+    """Advance the turn counter (and apply changes) in one UPDATE; call inside a transaction."""
+    # The UPDATE locks the row until commit, so the value read back is ours
+    Adventure.objects.filter(pk=adventure_id).update(turnSequence=F('turnSequence') + count, **changes)
+    last = Adventure.objects.filter(pk=adventure_id).values_list('turnSequence', flat=True).get()
+    return last - count + 1
+
+
+def allocate_turn_sequence(adventure_id, count: int = 1) -> int:
+    """
+    Reserve the next `count` turn sequence numbers of an adventure.
+
+    Args:
+        adventure_id: Adventure primary key
+        count: Number of consecutive sequence numbers needed
+
+    Returns:
+        The first reserved sequence number
+    """
+    with transaction.atomic():
+        return _reserve_sequences(adventure_id, count)
+
+
+def append_turns(adventure_id, turns: list, replace: Optional[AdventureTurn] = None) -> list:
+    """
+    Save the turns of one generation at the end of an adventure's history.
+
+    Everything happens in one transaction: a single UPDATE allocates the
+    sequence numbers and sets lastPlayedAt, and one bulk INSERT saves the
+    turns (a retry also deletes the turn it replaces).
+
+    Args:
+        adventure_id: Adventure primary key
+        turns: Unsaved AdventureTurn instances, oldest first
+        replace: Saved turn deleted in the same transaction, with its token stats
+
+    Returns:
+        The saved turns, with primary keys and sequence numbers
+    """
+    with span('persist'), transaction.atomic():
+        if replace is not None:
+            AdventureTurn.objects.filter(pk=replace.pk).delete()
+            if replace.token_usage_id:
+                TokenUsageStats.objects.filter(pk=replace.token_usage_id).delete()
+
+        first = _reserve_sequences(adventure_id, len(turns), lastPlayedAt=timezone.now())
+        for sequence, turn in enumerate(turns, start=first):
+            turn.adventure_id = adventure_id
+            turn.sequence = sequence
+        return AdventureTurn.objects.bulk_create(turns)
+
+
+aallocate_turn_sequence = sync_to_async(allocate_turn_sequence)
+aappend_turns = sync_to_async(append_turns)
+
+
+# Process-wide instance shared by all requests
+adventure_locks = AdventureLocks(
+    distributed=getattr(settings, 'ADVENTURE_LOCK_DISTRIBUTED', False),
+    wait_timeout=getattr(settings, 'ADVENTURE_LOCK_WAIT', 30.0),
+    ttl=getattr(settings, 'ADVENTURE_LOCK_TTL', 300),
+)
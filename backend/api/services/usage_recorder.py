@@ -0,0 +1,144 @@
+"""
+Background TokenUsageStats accounting for generated turns.
+
+Recording is handed to a small worker thread pool, so section counting and the
+DB write happen after the view has returned its response (or final SSE event),
+adding no latency to the generation endpoints. A thread pool rather than an
+asyncio task is used because async views run under a per-request event loop
+when served through WSGI, which would cancel pending tasks.
+"""
+
+import logging
+import random
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from rotator_library import RotatingClient
+
+from api.models import AdventureTurn, TokenUsageStats
+
+logger = logging.getLogger(__name__)
+
+
+def _get_field(obj: Any, name: str) -> Any:
+    """Read a field from a litellm response object or a plain dict."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class UsageRecorder:
+    """Writes TokenUsageStats rows in background threads, with optional sampling."""
+
+    # AdventurePrompt.sections key -> TokenUsageStats field
+    SECTION_FIELDS = {
+        'system_instruction_block': 'precise_system_instruction_block_tokens',
+        'scenario_instructions': 'precise_scenario_instructions_tokens',
+        'plot_essentials': 'precise_plot_essentials_tokens',
+        'authors_notes': 'precise_authors_notes_tokens',
+        'cards': 'precise_cards_tokens',
+        'current_user_message': 'precise_current_user_message_tokens',
+    }
+
+    def __init__(self, sample_rate: float = 1.0, store_prompt: bool = False, max_workers: int = 2):
+        """
+        Args:
+            sample_rate: Fraction of turns that get a TokenUsageStats row (0.0-1.0)
+            store_prompt: Also store the full message list in prompt_payload
+            max_workers: Worker threads writing stats rows
+        """
+        self.sample_rate = sample_rate
+        self.store_prompt = store_prompt
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='usage-recorder')
+        self._pending: set = set()
+
+    def record(
+        self,
+        client: RotatingClient,
+        turn_id: int,
+        model: str,
+        prompt,
+        response: Any = None,
+        usage: Any = None
+    ) -> Optional[Future]:
+        """
+        Schedule accounting for one turn.
+
+        Args:
+            client: RotatingClient used for section token counts
+            turn_id: AdventureTurn to link the stats row to
+            model: Model used for the completion
+            prompt: AdventurePrompt the completion was generated from
+            response: Completion response carrying API-reported usage
+            usage: API-reported usage (overrides response.usage)
+
+        Returns:
+            The scheduled future, or None if the turn was not sampled
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+
+        if usage is None:
+            usage = _get_field(response, 'usage')
+
+        future = self._executor.submit(self._write, client, turn_id, model, prompt, usage)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def _count_sections(self, client: RotatingClient, model: str, prompt) -> dict:
+        counts = {}
+        for section, field_name in self.SECTION_FIELDS.items():
+            text = prompt.sections.get(section)
+            counts[field_name] = client.token_count(model=model, text=text) if text else 0
+
+        # History counts were already summed (from memoized per-turn counts)
+        counts['precise_adventure_history_tokens'] = prompt.context_window.history_tokens
+        # Cards are a message of their own, after the history
+        counts['total_input_tokens_from_precise_sum'] = (
+            counts['precise_system_instruction_block_tokens']
+            + counts['precise_cards_tokens']
+            + counts['precise_adventure_history_tokens']
+            + counts['precise_current_user_message_tokens']
+        )
+        return counts
+
+    def _write(self, client: RotatingClient, turn_id: int, model: str, prompt, usage: Any) -> None:
+        try:
+            counts = self._count_sections(client, model, prompt)
+
+            completion_details = _get_field(usage, 'completion_tokens_details')
+            cached_tokens = _get_field(_get_field(usage, 'prompt_tokens_details'), 'cached_tokens')
+            if cached_tokens is None:
+                # Anthropic reports prompt cache reads separately
+                cached_tokens = _get_field(usage, 'cache_read_input_tokens')
+            stats = TokenUsageStats.objects.create(
+                api_reported_prompt_tokens=_get_field(usage, 'prompt_tokens'),
+                api_reported_output_tokens=_get_field(usage, 'completion_tokens'),
+                api_reported_thinking_tokens=_get_field(completion_details, 'reasoning_tokens'),
+                api_reported_cached_prompt_tokens=cached_tokens,
+                prefix_hit_ratio=prompt.prefix_hit_ratio,
+                model_used=model,
+                prompt_payload=prompt.messages if self.store_prompt else None,
+                **counts
+            )
+            AdventureTurn.objects.filter(pk=turn_id).update(token_usage=stats)
+        except Exception as e:
+            logger.warning(f"Failed to record token usage for turn {turn_id}: {e}")
+        finally:
+            close_old_connections()
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait for pending accounting writes (e.g. on shutdown or in tests)."""
+        wait(list(self._pending), timeout=timeout)
+
+
+# Process-wide instance shared by all AIService instances
+usage_recorder = UsageRecorder(
+    sample_rate=getattr(settings, 'TOKEN_USAGE_SAMPLE_RATE', 1.0),
+    store_prompt=getattr(settings, 'TOKEN_USAGE_STORE_PROMPT', False),
+)
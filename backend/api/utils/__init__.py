@@ -3,7 +3,9 @@ Utility modules for ImaginAI backend.
 """
 
 from .aid_translator import AIDTranslator
+from .trigger_index import TriggerIndex
 
 __all__ = [
     'AIDTranslator',
+    'TriggerIndex',
 ]
@@ -5,13 +5,22 @@ Provides bidirectional translation between ImaginAI's internal format
 and AI Dungeon's export format for story cards.
 """
 
-from typing import Dict, List
+import json
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from django.utils import timezone
 
 
 class AIDTranslator:
     """Bidirectional translation for AI Dungeon story cards."""
     
+    REQUIRED_FIELDS = ("keys", "value", "type", "title")
+    
+    # AID field -> max length of the Card column it is stored in
+    MAX_LENGTHS = {"title": 255, "type": 50}
+    
+    # Card columns read when exporting
+    EXPORT_FIELDS = ("title", "card_type", "trigger_words", "short_description", "full_content")
+    
     @staticmethod
     def export_to_aid(scenario) -> Dict:
         """
@@ -23,25 +32,97 @@ class AIDTranslator:
         Returns:
             dict with 'cards' (AID format) and 'metadata'
         """
-        aid_cards = []
-        
-        for card in scenario.cards.all():
-            aid_cards.append({
-                "keys": card.trigger_words,
-                "value": card.full_content,
-                "type": card.card_type,
-                "title": card.title,
-                "description": card.short_description,
-                "useForCharacterCreation": False  # Not used in ImaginAI
-            })
+        return {
+            "cards": [
+                AIDTranslator.aid_card_from_values(values)
+                for values in scenario.cards.values(*AIDTranslator.EXPORT_FIELDS)
+            ],
+            "metadata": AIDTranslator.export_metadata(scenario)
+        }
+    
+    @staticmethod
+    def iter_export_json(scenario, chunk_size: int = 500) -> Iterator[str]:
+        """
+        Export story cards as AID JSON text, produced incrementally.
+        
+        Cards are read with values().iterator(), so no model instances are
+        built and at most chunk_size cards are held in memory at a time.
+        
+        Args:
+            scenario: Scenario model instance
+            chunk_size: Cards fetched and encoded per yielded piece
+        
+        Yields:
+            Consecutive pieces of the same document export_to_aid returns
+        """
+        yield '{"cards": ['
         
+        encoded = []
+        first = True
+        cards = scenario.cards.values(*AIDTranslator.EXPORT_FIELDS)
+        for values in cards.iterator(chunk_size=chunk_size):
+            encoded.append(json.dumps(AIDTranslator.aid_card_from_values(values)))
+            if len(encoded) >= chunk_size:
+                yield ('' if first else ', ') + ', '.join(encoded)
+                encoded = []
+                first = False
+        if encoded:
+            yield ('' if first else ', ') + ', '.join(encoded)
+        
+        yield '], "metadata": ' + json.dumps(AIDTranslator.export_metadata(scenario)) + '}'
+    
+    @staticmethod
+    async def aiter_export_json(scenario, chunk_size: int = 500) -> AsyncIterator[str]:
+        """
+        Export story cards as AID JSON text, for streaming responses under ASGI.
+        
+        Django's ASGI handler reads a sync streaming body to the end before
+        sending any of it, so iter_export_json would buffer the whole export
+        there. Here each piece is one keyset page of cards, fetched with the
+        async ORM right before it is yielded.
+        
+        Args:
+            scenario: Scenario model instance
+            chunk_size: Cards fetched and encoded per yielded piece
+        
+        Yields:
+            Consecutive pieces of the same document export_to_aid returns
+        """
+        yield '{"cards": ['
+        
+        cards = scenario.cards.order_by('id').values('id', *AIDTranslator.EXPORT_FIELDS)
+        last_id = None
+        while True:
+            page = cards if last_id is None else cards.filter(id__gt=last_id)
+            rows = [values async for values in page[:chunk_size]]
+            if rows:
+                encoded = ', '.join(json.dumps(AIDTranslator.aid_card_from_values(values)) for values in rows)
+                yield encoded if last_id is None else ', ' + encoded
+                last_id = rows[-1]['id']
+            if len(rows) < chunk_size:
+                break
+        
+        yield '], "metadata": ' + json.dumps(AIDTranslator.export_metadata(scenario)) + '}'
+    
+    @staticmethod
+    def aid_card_from_values(values: Dict) -> Dict:
+        """Map a Card values() row to an AID story card."""
         return {
-            "cards": aid_cards,
-            "metadata": {
-                "exported_from": "ImaginAI",
-                "scenario_name": scenario.name,
-                "export_timestamp": timezone.now().isoformat()
-            }
+            "keys": values["trigger_words"],
+            "value": values["full_content"],
+            "type": values["card_type"],
+            "title": values["title"],
+            "description": values["short_description"],
+            "useForCharacterCreation": False  # Not used in ImaginAI
+        }
+    
+    @staticmethod
+    def export_metadata(scenario) -> Dict:
+        """Metadata block of an AID export."""
+        return {
+            "exported_from": "ImaginAI",
+            "scenario_name": scenario.name,
+            "export_timestamp": timezone.now().isoformat()
         }
     
     @staticmethod
@@ -55,19 +136,63 @@ class AIDTranslator:
         Returns:
             List of dicts ready for Card.objects.create()
         """
-        cards = []
-        
-        for aid_card in aid_cards:
-            cards.append({
-                "title": aid_card.get("title", ""),
-                "card_type": aid_card.get("type", "Concept"),
-                "trigger_words": aid_card.get("keys", ""),
-                "short_description": aid_card.get("description", ""),
-                "full_content": aid_card.get("value", "")
-                # Note: useForCharacterCreation is ignored (not used in ImaginAI)
-            })
-        
-        return cards
+        return [AIDTranslator.map_aid_card(aid_card) for aid_card in aid_cards]
+    
+    @staticmethod
+    def map_aid_card(aid_card: Dict) -> Dict:
+        """
+        Map a single AID story card to ImaginAI card fields.
+        
+        Args:
+            aid_card: AID story card object
+        
+        Returns:
+            dict ready for Card(**fields)
+        """
+        keys = aid_card.get("keys", "")
+        if isinstance(keys, list):
+            keys = ", ".join(str(key) for key in keys)
+        
+        return {
+            "title": aid_card.get("title", ""),
+            "card_type": aid_card.get("type", "Concept"),
+            "trigger_words": keys,
+            "short_description": aid_card.get("description") or "",
+            "full_content": aid_card.get("value", "")
+            # Note: useForCharacterCreation is ignored (not used in ImaginAI)
+        }
+    
+    @staticmethod
+    def validate_aid_card(card) -> Optional[str]:
+        """
+        Validate a single AID story card.
+        
+        Args:
+            card: Parsed JSON value of one card
+        
+        Returns:
+            None if valid, otherwise a description of the problem
+        """
+        if not isinstance(card, dict):
+            return "Card is not an object"
+        
+        missing = [field for field in AIDTranslator.REQUIRED_FIELDS if field not in card]
+        if missing:
+            return f"Missing required fields: {', '.join(missing)}"
+        
+        for field in ("value", "type", "title"):
+            if not isinstance(card[field], str):
+                return f"Field '{field}' must be a string"
+        if not isinstance(card["keys"], (str, list)):
+            return "Field 'keys' must be a string or a list of strings"
+        if card.get("description") is not None and not isinstance(card["description"], str):
+            return "Field 'description' must be a string"
+        
+        for field, max_length in AIDTranslator.MAX_LENGTHS.items():
+            if len(card[field]) > max_length:
+                return f"Field '{field}' is longer than {max_length} characters"
+        
+        return None
     
     @staticmethod
     def validate_aid_format(data: dict) -> bool:
@@ -83,13 +208,4 @@ class AIDTranslator:
         if not isinstance(data, list):
             return False
         
-        for card in data:
-            if not isinstance(card, dict):
-                return False
-            
-            # Check required fields
-            required_fields = ["keys", "value", "type", "title"]
-            if not all(field in card for field in required_fields):
-                return False
-        
-        return True
+        return all(AIDTranslator.validate_aid_card(card) is None for card in data)
@@ -0,0 +1,215 @@
+"""
+Request coalescing for concurrent identical generations.
+
+Double clicks and client retries often send the same generation request twice
+while the first one is still running. Requests are keyed by adventure id plus
+a hash of the request; while a key is in flight, later callers attach to it
+instead of starting another upstream call (and writing another turn):
+
+- SingleFlight: followers await the leader's result
+- StreamCoalescer: followers replay the chunks the leader already produced,
+  then follow its live output
+
+Async views may run on a separate event loop per request (WSGI), so results
+are handed over through thread-safe futures and loop.call_soon_threadsafe
+rather than asyncio primitives bound to one loop. Coalescing is per process
+(see the instances in api.services.ai_service).
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+
+def coalescing_key(adventure_id, *parts: Any) -> str:
+    """Key of a generation request: adventure id plus a hash of its parameters."""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return f"{adventure_id}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class _LeaderCancelled(Exception):
+    """The leading call was cancelled; a follower runs it again."""
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn, or wait for the in-flight call with the same key.
+
+        If the leading call is cancelled (its client went away), the waiting
+        callers are not: one of them runs fn again and the others follow it.
+
+        Args:
+            key: Request key (see coalescing_key)
+            fn: Coroutine function producing the result
+
+        Returns:
+            The result of this call or of the in-flight one (exceptions are shared too)
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._calls[key] = future
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+
+            if leader:
+                return await self._lead(key, future, fn)
+            try:
+                # Shielded, so a follower going away cannot cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                continue
+
+    async def _lead(self, key: str, future: Future, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Released before the followers wake, so one of them can lead
+            self._release(key, future)
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._release(key, future)
+
+    def _release(self, key: str, future: Future) -> None:
+        with self._lock:
+            # A follower may already lead a new call under this key
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._calls), 'leaders': self.leaders, 'followers': self.followers}
+
+
+class StreamFanout:
+    """Buffered chunks of one stream, readable from any thread or event loop."""
+
+    def __init__(self):
+        self._chunks: list = []
+        self._done = False
+        self._error = None
+        self._waiters: set = set()
+        self._lock = threading.Lock()
+
+    def publish(self, chunk: Any) -> None:
+        with self._lock:
+            self._chunks.append(chunk)
+            waiters = list(self._waiters)
+        self._wake(waiters)
+
+    def finish(self, error: BaseException = None) -> None:
+        with self._lock:
+            self._done = True
+            self._error = error
+            waiters = list(self._waiters)
+        self._wake(waiters)
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """Yield every chunk from the start, then live chunks until the stream ends."""
+        loop = asyncio.get_running_loop()
+        position = 0
+        while True:
+            event = asyncio.Event()
+            waiter = (loop, event)
+            with self._lock:
+                pending = self._chunks[position:]
+                done, error = self._done, self._error
+                if not pending and not done:
+                    self._waiters.add(waiter)
+
+            if pending:
+                position += len(pending)
+                for chunk in pending:
+                    yield chunk
+                continue
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+            try:
+                await event.wait()
+            finally:
+                with self._lock:
+                    self._waiters.discard(waiter)
+
+    @staticmethod
+    def _wake(waiters: list) -> None:
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop has closed (its request is gone)
+                pass
+
+
+class StreamCoalescer:
+    """Runs one stream per key at a time; concurrent callers follow its output."""
+
+    def __init__(self):
+        self._streams: dict = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.followers = 0
+
+    async def stream(self, key: str, produce: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Yield the chunks of produce(), or of the in-flight stream with the same key.
+
+        If the leading caller goes away before its stream ends, followers'
+        streams end at that point as well.
+        """
+        with self._lock:
+            fanout = self._streams.get(key)
+            leader = fanout is None
+            if leader:
+                fanout = StreamFanout()
+                self._streams[key] = fanout
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            async for chunk in fanout.subscribe():
+                yield chunk
+            return
+
+        error = None
+        try:
+            async for chunk in produce():
+                fanout.publish(chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                self._streams.pop(key, None)
+            fanout.finish(error)
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._streams), 'leaders': self.leaders, 'followers': self.followers}
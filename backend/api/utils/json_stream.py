@@ -0,0 +1,198 @@
+"""
+Incremental JSON streaming helpers.
+
+iter_json_array_items yields the items of a JSON array (either the top-level
+value or the value of a key in a top-level object) while reading the source in
+fixed-size chunks, so memory stays bounded by the largest single item rather
+than the document size. iter_gzip and aiter_gzip compress a stream of text
+pieces for streaming responses (WSGI and ASGI).
+"""
+
+import codecs
+import json
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JSONStreamError(ValueError):
+    """Raised when the stream is not valid JSON of the expected shape."""
+
+
+class _StreamReader:
+    """Character buffer over a binary file-like object."""
+
+    def __init__(self, stream, read_size: int):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.consumed = 0  # Characters dropped from the front of the buffer
+
+    def fill(self) -> bool:
+        """Read one more chunk. Returns False at end of stream."""
+        if self.eof:
+            return False
+        if self.pos > self.read_size:
+            self.consumed += self.pos
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        data = self.stream.read(self.read_size)
+        if not data:
+            self.eof = True
+            self.buffer += self.decoder.decode(b'', final=True)
+            return False
+        if isinstance(data, str):
+            self.buffer += data
+        else:
+            self.buffer += self.decoder.decode(data)
+        return True
+
+    def skip_whitespace(self) -> None:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def peek(self) -> Optional[str]:
+        """Next non-whitespace character (not consumed), or None at end of stream."""
+        self.skip_whitespace()
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else None
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise JSONStreamError(
+                f"Expected '{char}' at character {self.consumed + self.pos}, found {found!r}"
+            )
+        self.pos += 1
+
+    def error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(f"{message} at character {self.consumed + self.pos}")
+
+
+def _read_value(reader: _StreamReader, decoder: json.JSONDecoder, max_item_size: int) -> Any:
+    """Decode one complete JSON value starting at the reader position."""
+    reader.skip_whitespace()
+    while True:
+        try:
+            value, end = decoder.raw_decode(reader.buffer, reader.pos)
+        except json.JSONDecodeError as e:
+            if len(reader.buffer) - reader.pos > max_item_size:
+                raise reader.error(f"JSON value larger than {max_item_size} characters")
+            if not reader.fill():
+                raise reader.error(f"Invalid JSON ({e.msg})")
+            continue
+
+        # A number at the end of the buffer may continue in the next chunk
+        if end == len(reader.buffer) and reader.fill():
+            continue
+
+        reader.pos = end
+        return value
+
+
+def iter_json_array_items(
+    stream,
+    key: Optional[str] = None,
+    read_size: int = 64 * 1024,
+    max_item_size: int = 4 * 1024 * 1024
+) -> Iterator[Any]:
+    """
+    Iterate over the items of a JSON array without loading the whole document.
+
+    Args:
+        stream: Binary (or text) file-like object with a read(size) method
+        key: If set, the document may also be an object and the array is
+            taken from this key; a top-level array is always accepted
+        read_size: Bytes read per chunk
+        max_item_size: Largest accepted single item, in characters
+
+    Yields:
+        Decoded array items, in order
+
+    Raises:
+        JSONStreamError: On malformed JSON or a missing array
+    """
+    reader = _StreamReader(stream, read_size)
+    decoder = json.JSONDecoder()
+
+    first = reader.peek()
+    if first == '{' and key is not None:
+        reader.pos += 1
+        while True:
+            if reader.peek() == '}':
+                raise reader.error(f"No '{key}' array found")
+            name = _read_value(reader, decoder, max_item_size)
+            if not isinstance(name, str):
+                raise reader.error("Expected object key")
+            reader.expect(':')
+            if name == key:
+                break
+            # Skip values of other keys
+            _read_value(reader, decoder, max_item_size)
+            if reader.peek() == ',':
+                reader.pos += 1
+            elif reader.peek() != '}':
+                raise reader.error("Expected ',' or '}'")
+    elif first is None:
+        raise reader.error("Empty document")
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+
+    while True:
+        yield _read_value(reader, decoder, max_item_size)
+        separator = reader.peek()
+        if separator == ',':
+            reader.pos += 1
+        elif separator == ']':
+            reader.pos += 1
+            return
+        else:
+            raise reader.error("Expected ',' or ']'")
+
+
+def iter_gzip(pieces: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compress a stream of text pieces, yielding compressed bytes as they fill.
+    
+    Args:
+        pieces: UTF-8 text pieces of the uncompressed document
+        level: zlib compression level (1-9)
+    
+    Yields:
+        Consecutive pieces of a single gzip member
+    """
+    # wbits=31 selects the gzip container (header + CRC trailer)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiter_gzip(pieces: AsyncIterable[str], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Gzip-compress an async stream of text pieces (see iter_gzip).
+    
+    Args:
+        pieces: UTF-8 text pieces of the uncompressed document
+        level: zlib compression level (1-9)
+    
+    Yields:
+        Consecutive pieces of a single gzip member
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for piece in pieces:
+        data = compressor.compress(piece.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
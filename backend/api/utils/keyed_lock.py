@@ -0,0 +1,96 @@
+"""
+Per-key mutual exclusion for coroutines running on different event loops.
+
+Async views may run on a separate event loop per request (WSGI), so an
+asyncio.Lock cannot be shared between requests. KeyedLock keeps one FIFO of
+waiters per key behind a short threading.Lock and hands the lock to the next
+waiter with loop.call_soon_threadsafe. Keys without holders take no memory,
+and unrelated keys never wait for each other.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Hashable, Optional
+
+
+class KeyedLock:
+    """FIFO lock per key, usable from any thread and event loop."""
+
+    def __init__(self):
+        # key -> deque of waiters; the key is held while it is present
+        self._queues: dict = {}
+        self._mutex = threading.Lock()
+
+    def locked(self, key: Hashable) -> bool:
+        with self._mutex:
+            return key in self._queues
+
+    def stats(self) -> dict:
+        """Number of held keys and of callers waiting for one."""
+        with self._mutex:
+            return {
+                'held': len(self._queues),
+                'waiting': sum(len(queue) for queue in self._queues.values()),
+            }
+
+    async def acquire(self, key: Hashable, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the lock of a key.
+
+        Args:
+            key: Lock key
+            timeout: Seconds to wait (None waits indefinitely)
+
+        Returns:
+            True once held, False if the timeout expired first
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._mutex:
+            queue = self._queues.get(key)
+            if queue is None:
+                self._queues[key] = deque()
+                return True
+            queue.append(waiter)
+
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._abandon(key, waiter)
+            return False
+        except asyncio.CancelledError:
+            self._abandon(key, waiter)
+            raise
+
+    def _abandon(self, key: Hashable, waiter: tuple) -> None:
+        """Leave the queue after an ended wait, passing the lock on if it was already handed over."""
+        with self._mutex:
+            queue = self._queues.get(key)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                return
+        self.release(key)
+
+    def release(self, key: Hashable) -> None:
+        """Release the lock of a key, handing it to the longest waiting caller."""
+        while True:
+            with self._mutex:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    return
+                loop, future = queue.popleft()
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+                return
+            except RuntimeError:
+                # The waiter's loop has closed; try the next one
+                continue
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
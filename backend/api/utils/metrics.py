@@ -0,0 +1,273 @@
+"""
+Sharded metrics in the Prometheus data model.
+
+Recording must not contend under concurrency, so every thread records into
+its own shard: a dict that only that thread writes, updated without locks.
+All coroutines of an event loop run on one thread and share its shard, and
+never interleave inside an update. A scrape sums the shards; copying a shard
+dict is atomic under the GIL, so it sees each shard between two updates.
+When a thread exits, its shard is folded into a retired total, so short-lived
+threads (e.g. sync_to_async workers) do not accumulate shards.
+"""
+
+import bisect
+import logging
+import threading
+import weakref
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the default histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Holder:
+    """Per-thread reference to a shard; finalized when its thread exits."""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard: dict):
+        self.shard = shard
+
+
+class _Shards:
+    """One dict per live recording thread, plus the retired total of exited threads."""
+
+    def __init__(self, merge: Callable[[dict, dict], None]):
+        """
+        Args:
+            merge: merge(total, shard) adds a shard's values into total. It
+                must replace changed values rather than mutate them, since
+                snapshots share them.
+        """
+        self._merge = merge
+        self._local = threading.local()
+        # id(shard) -> shard of live threads
+        self._shards: dict = {}
+        self._retired: dict = {}
+        # Only taken when a thread records for the first time or exits, and by readers
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            shard = {}
+            holder = self._local.holder = _Holder(shard)
+            with self._lock:
+                self._shards[id(shard)] = shard
+            # The thread's locals are released when it exits
+            weakref.finalize(holder, self._retire, shard)
+            return shard
+
+    def _retire(self, shard: dict) -> None:
+        with self._lock:
+            self._shards.pop(id(shard), None)
+            self._merge(self._retired, shard)
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def snapshots(self) -> list:
+        with self._lock:
+            shards = list(self._shards.values())
+            retired = self._retired.copy()
+        return [retired] + [shard.copy() for shard in shards]
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Named metric with a fixed set of label names."""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self) -> Iterable[tuple]:
+        """(name suffix, label values, extra label, value) tuples of the current values."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.type}\n"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.label_names, values, extra)} {format_value(value)}\n")
+        return ''.join(lines)
+
+
+class Counter(Metric):
+    """Monotonic counter per label set."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self._shards = _Shards(self._merge)
+
+    @staticmethod
+    def _merge(total: dict, shard: dict) -> None:
+        for key, value in shard.items():
+            total[key] = total.get(key, 0) + value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        shard = self._shards.mine()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> dict:
+        """Label values -> total over all shards."""
+        totals: dict = {}
+        for shard in self._shards.snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self):
+        for key, value in self.values().items():
+            yield '', key, '', value
+
+
+class Gauge(Counter):
+    """Value per label set that goes up and down (a sum of per-thread deltas)."""
+
+    type = 'gauge'
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Bucketed distribution per label set."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._shards = _Shards(self._merge)
+
+    @staticmethod
+    def _merge(total: dict, shard: dict) -> None:
+        for key, entry in shard.items():
+            current = total.get(key)
+            total[key] = list(entry) if current is None else [a + b for a, b in zip(current, entry)]
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shards.mine()
+        key = self._key(labels)
+        # Bucket counts (the last one above the largest bound), then the sum
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [0] * (len(self.buckets) + 2)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def values(self) -> dict:
+        """Label values -> (bucket counts, sum) over all shards."""
+        totals: dict = {}
+        for shard in self._shards.snapshots():
+            for key, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = entry
+                else:
+                    for i, value in enumerate(entry):
+                        total[i] += value
+        return {key: (entry[:-1], entry[-1]) for key, entry in totals.items()}
+
+    def samples(self):
+        bounds = self.buckets + (float('inf'),)
+        for key, (counts, total) in self.values().items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield '_bucket', key, f'le="{format_value(bound)}"', cumulative
+            yield '_sum', key, '', total
+            yield '_count', key, '', cumulative
+
+
+class FunctionMetric(Metric):
+    """Metric read from a callback at scrape time (e.g. from a service's stats())."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), type: str = 'gauge',
+                 collect: Optional[Callable[[], dict]] = None):
+        """
+        Args:
+            type: 'gauge' or 'counter'
+            collect: Returns {label values tuple: value}, or a number without labels
+        """
+        super().__init__(name, help_text, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            if value is not None:
+                yield '', key, '', value
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered together."""
+
+    def __init__(self):
+        self._metrics: dict = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def function(self, name: str, help_text: str, collect: Callable[[], dict],
+                 labels: tuple = (), type: str = 'gauge') -> FunctionMetric:
+        return self.register(FunctionMetric(name, help_text, labels, type, collect))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        parts = []
+        for metric in metrics:
+            try:
+                parts.append(metric.render())
+            except Exception as e:
+                # One failing collector must not hide the other metrics
+                logger.warning(f"Failed to collect metric {metric.name}: {e}")
+        return ''.join(parts)
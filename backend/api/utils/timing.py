@@ -0,0 +1,132 @@
+"""
+Timing spans for request instrumentation.
+
+A Timing collects the durations of named stages of one request (or one
+background stream). Once it is made current, code anywhere below it records
+stages with span(name), including across sync_to_async / async_to_sync hops,
+which carry the context along. Without a current Timing, span() returns a
+shared no-op context manager, so instrumented code costs one context variable
+lookup when timing is off.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+_current_timing: contextvars.ContextVar = contextvars.ContextVar('current_timing', default=None)
+_NO_SPAN = nullcontext()
+
+
+class Timing:
+    """Durations of the named stages of one request."""
+
+    def __init__(self, **labels):
+        """
+        Args:
+            **labels: Dimensions the timing is reported under (endpoint, model, ...)
+        """
+        self.labels = labels
+        # name -> [seconds, count], in order of first occurrence
+        self.spans: dict = {}
+        self.duration: Optional[float] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add a duration to a stage (stages may be entered several times)."""
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def finish(self) -> float:
+        """Stop the clock; returns the total duration in seconds."""
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+        return self.duration
+
+    def server_timing(self) -> str:
+        """Value of a Server-Timing header: the stages, then the total."""
+        with self._lock:
+            spans = list(self.spans.items())
+        parts = []
+        for name, (seconds, count) in spans:
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        if self.duration is not None:
+            parts.append(f"total;dur={self.duration * 1000:.1f}")
+        return ', '.join(parts)
+
+
+def current_timing() -> Optional[Timing]:
+    """The Timing of the current request, or None when timing is off."""
+    return _current_timing.get()
+
+
+@contextmanager
+def activate(timing: Optional[Timing]):
+    """Make timing current for the duration of the block."""
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+def set_current_timing(timing: Optional[Timing]) -> None:
+    """
+    Make timing current for the rest of the current context.
+
+    For background tasks, which run in their own copy of the context; an
+    async generator cannot use activate() across its yields.
+    """
+    _current_timing.set(timing)
+
+
+def span(name: str):
+    """Context manager timing a stage of the current request (no-op without one)."""
+    timing = _current_timing.get()
+    if timing is None:
+        return _NO_SPAN
+    return timing.span(name)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Record a stage measured by the caller (no-op without a current Timing)."""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+def set_label(name: str, value) -> None:
+    """Set a reporting dimension of the current request (no-op without one)."""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.labels[name] = value
+
+
+def timed(name: str):
+    """Decorator timing every call of a coroutine function as a stage."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,159 @@
+"""
+Trigger word index for story card injection.
+
+Compiles the trigger words of every card in a scenario snapshot into a single
+Aho-Corasick automaton, so triggered cards can be found in one linear pass over
+the context text instead of one regex search per trigger word.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List
+
+
+def _is_word_char(char: str) -> bool:
+    """Match the definition of ``\\w`` used by Python's ``re`` for str patterns."""
+    return char.isalnum() or char == '_'
+
+
+def parse_trigger_words(trigger_words: str) -> List[str]:
+    """Parse a comma-separated trigger word string into a list."""
+    return [w.strip() for w in (trigger_words or '').split(',') if w.strip()]
+
+
+class TriggerIndex:
+    """
+    Multi-pattern matcher over the trigger words of a list of cards.
+
+    Matching semantics mirror ``re.search(r'\\b' + re.escape(trigger) + r'\\b')``
+    on lowercased text: a trigger matches when both of its ends sit on a word
+    boundary, i.e. the characters on either side of the boundary differ in
+    "word-ness".
+
+    The index stores card positions rather than card dicts, so it can be reused
+    for any card list with the same triggers in the same order.
+    """
+
+    __slots__ = ('card_count', 'pattern_count', '_goto', '_fail', '_output')
+
+    def __init__(self, trigger_lists: Iterable[List[str]]):
+        """
+        Build the automaton.
+
+        Args:
+            trigger_lists: One list of trigger words per card, in card order
+        """
+        # State 0 is the root; each state maps a character to the next state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (pattern length, card positions) tuples ending here
+        self._output: List[list] = [[]]
+
+        patterns: Dict[str, List[int]] = {}
+        card_count = 0
+        for position, triggers in enumerate(trigger_lists):
+            card_count = position + 1
+            for trigger in triggers:
+                key = trigger.lower()
+                if not key:
+                    continue
+                cards = patterns.setdefault(key, [])
+                if not cards or cards[-1] != position:
+                    cards.append(position)
+
+        self.card_count = card_count
+        self.pattern_count = len(patterns)
+
+        for pattern, positions in patterns.items():
+            self._insert(pattern, positions)
+        self._build_failure_links()
+
+    @classmethod
+    def from_cards(cls, cards: List[dict]) -> 'TriggerIndex':
+        """Build an index from snapshot card dicts (``trigger_words`` key)."""
+        return cls(parse_trigger_words(card.get('trigger_words', '')) for card in cards)
+
+    def _insert(self, pattern: str, positions: List[int]) -> None:
+        goto = self._goto
+        state = 0
+        for char in pattern:
+            transitions = goto[state]
+            next_state = transitions.get(char)
+            if next_state is None:
+                next_state = len(goto)
+                goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                transitions[char] = next_state
+            state = next_state
+        self._output[state].append((len(pattern), tuple(positions)))
+
+    def _build_failure_links(self) -> None:
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                if target == next_state:
+                    target = 0
+                fail[next_state] = target
+                # Inherit matches of the longest proper suffix
+                if output[target]:
+                    output[next_state] = output[next_state] + output[target]
+
+    def match_positions(self, context_text: str) -> List[int]:
+        """
+        Find the positions of all cards triggered by the context text.
+
+        Args:
+            context_text: Recent conversation context
+
+        Returns:
+            Sorted list of triggered card positions
+        """
+        text = context_text.lower()
+        text_length = len(text)
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        matched = set()
+
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+
+            after_is_word = end + 1 < text_length and _is_word_char(text[end + 1])
+            last_is_word = _is_word_char(char)
+            if after_is_word == last_is_word:
+                continue
+
+            for length, positions in output[state]:
+                start = end - length + 1
+                before_is_word = start > 0 and _is_word_char(text[start - 1])
+                if before_is_word != _is_word_char(text[start]):
+                    matched.update(positions)
+
+        return sorted(matched)
+
+    def match(self, context_text: str, cards: List[dict]) -> List[dict]:
+        """
+        Return the triggered cards, in their original order.
+
+        Args:
+            context_text: Recent conversation context
+            cards: The card list this index was built from
+
+        Returns:
+            List of triggered card dicts
+        """
+        return [cards[position] for position in self.match_positions(context_text)]
@@ -4,36 +4,131 @@ Adventure views for ImaginAI backend.
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
 from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 import uuid
 import json
+import time
 
-from api.models import Adventure, AdventureTurn, Scenario
-from api.serializers import AdventureSerializer, AdventureTurnSerializer
+from api.models import Adventure, AdventureTurn, Scenario, TokenUsageStats
+from api.serializers import (
+    AdventureSerializer,
+    AdventureListSerializer,
+    AdventureTurnSerializer
+)
+from api.pagination import AdventureTurnCursorPagination
 from api.dependencies import get_ai_service
+from api.services.settings_cache import global_settings
+from api.services.adventure_cards import (
+    CARD_STORAGE_MODES,
+    card_editor_for,
+    copy_adventure_cards,
+    create_adventure_cards,
+    uses_card_table,
+)
+from api.services.completion_cache import completion_cache
+from api.services.prompt_cache import prefix_cache_tracker
+from api.services.request_timing import request_timing
+from api.services.snapshot_blobs import scenario_blob
+from api.services.snapshot_cards import SnapshotCardNotFound, SnapshotConflict
+from api.services.stream_buffer import parse_event_id, stream_buffer
+from api.services.turn_ordering import AdventureBusy, aappend_turns, adventure_locks, allocate_turn_sequence
+from api.services.trigger_cache import trigger_index_cache
+from api.utils.coalescing import coalescing_key
+from api.utils.timing import add_span, set_current_timing, set_label
+from api.views.mixins import AsyncHandlerMixin
 
+# Rows per bulk_create round trip when copying turns
+BULK_BATCH_SIZE = 500
 
-class AdventureViewSet(viewsets.ModelViewSet):
+# Actions that modify snapshot cards through a card editor (see card_editor_for)
+SNAPSHOT_CARD_ACTIONS = {
+    'add_card_to_snapshot',
+    'edit_card_in_snapshot',
+    'delete_card_from_snapshot',
+    'duplicate_card_in_snapshot',
+}
+
+
+class AdventureViewSet(AsyncHandlerMixin, viewsets.ModelViewSet):
     """ViewSet for adventure CRUD and AI generation operations."""
     
     queryset = Adventure.objects.all()
     serializer_class = AdventureSerializer
     
+    @staticmethod
+    def _history_prefetch():
+        """Prefetch full history in one query, joined with token stats."""
+        return Prefetch(
+            'adventureHistory',
+            queryset=AdventureTurn.objects.select_related('token_usage')
+        )
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(self._history_prefetch(), 'snapshotCards')
+        elif self.action in SNAPSHOT_CARD_ACTIONS:
+            # Card edits run as targeted updates; only the id and storage mode are needed here
+            queryset = queryset.only('id', 'cardStorage')
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AdventureListSerializer
+        return super().get_serializer_class()
+    
+    def update(self, request, *args, **kwargs):
+        """Update an adventure; 409 if snapshotVersion no longer matches (see AdventureSerializer.update)."""
+        try:
+            return super().update(request, *args, **kwargs)
+        except SnapshotConflict as conflict:
+            return self._snapshot_conflict_response(conflict)
+    
+    @action(detail=True, methods=['get'], url_path='turns')
+    def turns(self, request, pk=None):
+        """Get adventure turns, cursor-paginated (use ?order=newest to page backwards)."""
+        adventure = self.get_object()
+        queryset = AdventureTurn.objects.filter(
+            adventure=adventure
+        ).select_related('token_usage')
+        
+        paginator = AdventureTurnCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = AdventureTurnSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
     @action(detail=False, methods=['post'], url_path='start')
     def start_adventure(self, request):
-        """Start a new adventure from a scenario."""
+        """
+        Start a new adventure from a scenario.
+        
+        card_storage ('snapshot', 'table' or 'shared', default
+        ADVENTURE_CARD_STORAGE) selects where the frozen story cards are kept.
+        With 'shared', the adventure references the scenario's content-addressed
+        card blob, so no cards are copied.
+        """
         scenario_id = request.data.get('scenario_id')
         adventure_name = request.data.get('adventure_name', 'New Adventure')
+        card_storage = request.data.get('card_storage') or settings.ADVENTURE_CARD_STORAGE
         
         if not scenario_id:
             return Response(
                 {'error': 'scenario_id is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if card_storage not in CARD_STORAGE_MODES:
+            return Response(
+                {'error': f"card_storage must be one of: {', '.join(sorted(CARD_STORAGE_MODES))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
             scenario = Scenario.objects.get(id=scenario_id)
@@ -43,6 +138,15 @@ class AdventureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        card_values = scenario.cards.values(
+            'id',
+            'title',
+            'card_type',
+            'trigger_words',
+            'short_description',
+            'full_content'
+        )
+        
         # Create scenario snapshot with updated Card field names
         scenario_snapshot = {
             'name': scenario.name,
@@ -53,48 +157,58 @@ class AdventureViewSet(viewsets.ModelViewSet):
             'playerDescription': scenario.playerDescription,
             'tags': scenario.tags,
             'visibility': scenario.visibility,
-            'cards': list(scenario.cards.values(
-                'id',
-                'title',
-                'card_type',
-                'trigger_words',
-                'short_description',
-                'full_content'
-            ))
         }
-        
-        # Create adventure
-        adventure = Adventure.objects.create(
-            sourceScenario=scenario,
-            sourceScenarioName=scenario.name,
-            adventureName=adventure_name,
-            scenarioSnapshot=scenario_snapshot,
-            createdAt=timezone.now(),
-            lastPlayedAt=timezone.now()
-        )
-        
-        # Create initial turn with opening scene
-        AdventureTurn.objects.create(
-            adventure=adventure,
-            role='model',
-            text=scenario.openingScene or "(No opening scene provided.)",
-            timestamp=timezone.now(),
-            actionType='story'
-        )
+        if card_storage == 'snapshot':
+            scenario_snapshot['cards'] = list(card_values)
+        
+        with transaction.atomic():
+            blob = scenario_blob(scenario) if card_storage == 'shared' else None
+            # Create adventure
+            adventure = Adventure.objects.create(
+                sourceScenario=scenario,
+                sourceScenarioName=scenario.name,
+                adventureName=adventure_name,
+                scenarioSnapshot=scenario_snapshot,
+                cardStorage=card_storage,
+                snapshotBlob=blob,
+                turnSequence=1,
+                createdAt=timezone.now(),
+                lastPlayedAt=timezone.now()
+            )
+            if card_storage == 'table':
+                create_adventure_cards(adventure, card_values.iterator(chunk_size=BULK_BATCH_SIZE))
+            
+            # Create initial turn with opening scene
+            AdventureTurn.objects.create(
+                adventure=adventure,
+                role='model',
+                text=scenario.openingScene or "(No opening scene provided.)",
+                sequence=1,
+                timestamp=timezone.now(),
+                actionType='story'
+            )
         
         serializer = self.get_serializer(adventure)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'], url_path='generate-ai-response')
     async def generate_ai_response(self, request, pk=None):
-        """Generate AI response to user action (async native)."""
+        """
+        Generate AI response to user action (async native).
+        
+        A request identical to one still in flight for the same adventure
+        returns that request's turn instead of generating another.
+        """
         # Use async ORM methods
         adventure = await Adventure.objects.aget(pk=pk)
         
         user_text = request.data.get('text')
         action_type = request.data.get('actionType', 'do')
-        selected_model = request.data.get('selected_model', 'gemini/gemini-1.5-flash')
-        max_tokens = request.data.get('global_max_output_tokens', 200)
+        defaults = await global_settings.generation_defaults()
+        selected_model = request.data.get('selected_model') or defaults.model
+        max_tokens = request.data.get('global_max_output_tokens') or defaults.max_tokens
+        set_label('model', selected_model)
+        completion_params = self._completion_params(request)
         
         if not user_text:
             return Response(
@@ -103,45 +217,66 @@ class AdventureViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Create user turn (async)
-            await AdventureTurn.objects.acreate(
-                adventure=adventure,
-                role='user',
-                text=user_text,
-                timestamp=timezone.now(),
-                actionType=action_type
-            )
-            
-            # Get AIService and generate response
+            # Get AIService
             ai_service = get_ai_service(request)
             
-            # No asyncio.run() needed - already in async context
-            response = await ai_service.generate_adventure_turn(
-                adventure=adventure,
-                user_text=user_text,
-                model=selected_model,
-                max_tokens=max_tokens
-            )
-            
-            # Extract AI response text
-            ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
+            async def run_turn():
+                async with adventure_locks.hold(adventure.pk):
+                    submitted_at = timezone.now()
+                    
+                    # Generate response
+                    # No asyncio.run() needed - already in async context
+                    prompt = await ai_service.build_adventure_prompt(
+                        adventure=adventure,
+                        user_text=user_text,
+                        model=selected_model,
+                        max_tokens=max_tokens
+                    )
+                    response = await ai_service.generate_adventure_turn(
+                        adventure=adventure,
+                        user_text=user_text,
+                        model=selected_model,
+                        max_tokens=max_tokens,
+                        prompt=prompt,
+                        **completion_params
+                    )
+                    
+                    # Extract AI response text
+                    ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
+                    
+                    # Save user and AI turns in one transaction (async); a
+                    # failed generation leaves no orphaned user turn
+                    user_turn, ai_turn = await aappend_turns(adventure.pk, [
+                        AdventureTurn(
+                            role='user',
+                            text=user_text,
+                            timestamp=submitted_at,
+                            actionType=action_type,
+                            tokenCounts=ai_service.turn_token_counts(selected_model, 'user', user_text)
+                        ),
+                        AdventureTurn(
+                            role='model',
+                            text=ai_text,
+                            timestamp=timezone.now(),
+                            actionType='story',
+                            tokenCounts=ai_service.turn_token_counts(selected_model, 'model', ai_text)
+                        ),
+                    ])
+                    
+                    # Token usage accounting runs in the background
+                    ai_service.record_turn_usage(ai_turn.pk, selected_model, prompt, response=response)
+                    
+                    return AdventureTurnSerializer(ai_turn).data
             
-            # Create AI turn (async)
-            ai_turn = await AdventureTurn.objects.acreate(
-                adventure=adventure,
-                role='model',
-                text=ai_text,
-                timestamp=timezone.now(),
-                actionType='story'
+            # Identical concurrent requests (double clicks, client retries) share one turn
+            key = coalescing_key(
+                adventure.pk, 'generate', user_text, action_type, selected_model, max_tokens, completion_params
             )
+            data = await ai_service.coalesce(key, run_turn)
+            return Response(data, status=status.HTTP_201_CREATED)
             
-            # Update adventure last played time (async)
-            adventure.lastPlayedAt = timezone.now()
-            await adventure.asave()
-            
-            serializer = AdventureTurnSerializer(ai_turn)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
+        except AdventureBusy as busy:
+            return self._adventure_busy_response(busy)
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -153,40 +288,55 @@ class AdventureViewSet(viewsets.ModelViewSet):
         """Continue AI narration without user input (async native)."""
         adventure = await Adventure.objects.aget(pk=pk)
         
-        selected_model = request.data.get('selected_model', 'gemini/gemini-1.5-flash')
-        max_tokens = request.data.get('global_max_output_tokens', 200)
+        defaults = await global_settings.generation_defaults()
+        selected_model = request.data.get('selected_model') or defaults.model
+        max_tokens = request.data.get('global_max_output_tokens') or defaults.max_tokens
+        set_label('model', selected_model)
+        completion_params = self._completion_params(request)
         
         try:
             # Get AIService and generate response
             ai_service = get_ai_service(request)
             
-            # No asyncio.run() needed - already in async context
-            response = await ai_service.generate_adventure_turn(
-                adventure=adventure,
-                user_text=None,
-                model=selected_model,
-                max_tokens=max_tokens
-            )
-            
-            # Extract AI response text
-            ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
-            
-            # Create AI turn (async)
-            ai_turn = await AdventureTurn.objects.acreate(
-                adventure=adventure,
-                role='model',
-                text=ai_text,
-                timestamp=timezone.now(),
-                actionType='story'
-            )
-            
-            # Update adventure last played time (async)
-            adventure.lastPlayedAt = timezone.now()
-            await adventure.asave()
-            
-            serializer = AdventureTurnSerializer(ai_turn)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            async with adventure_locks.hold(adventure.pk):
+                # No asyncio.run() needed - already in async context
+                prompt = await ai_service.build_adventure_prompt(
+                    adventure=adventure,
+                    user_text=None,
+                    model=selected_model,
+                    max_tokens=max_tokens
+                )
+                response = await ai_service.generate_adventure_turn(
+                    adventure=adventure,
+                    user_text=None,
+                    model=selected_model,
+                    max_tokens=max_tokens,
+                    prompt=prompt,
+                    **completion_params
+                )
+                
+                # Extract AI response text
+                ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
+                
+                # Save AI turn and last played time in one transaction (async)
+                ai_turn, = await aappend_turns(adventure.pk, [
+                    AdventureTurn(
+                        role='model',
+                        text=ai_text,
+                        timestamp=timezone.now(),
+                        actionType='story',
+                        tokenCounts=ai_service.turn_token_counts(selected_model, 'model', ai_text)
+                    ),
+                ])
+                
+                # Token usage accounting runs in the background
+                ai_service.record_turn_usage(ai_turn.pk, selected_model, prompt, response=response)
+                
+                serializer = AdventureTurnSerializer(ai_turn)
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
             
+        except AdventureBusy as busy:
+            return self._adventure_busy_response(busy)
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -195,69 +345,87 @@ class AdventureViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'], url_path='retry-ai')
     async def retry_ai(self, request, pk=None):
-        """Retry the last AI response (async native)."""
-        adventure = await Adventure.objects.aget(pk=pk)
-        
-        # Find last AI turn (async)
-        last_turn = await adventure.adventureHistory.order_by('-timestamp').afirst()
-        
-        if not last_turn or last_turn.role != 'model':
-            return Response(
-                {'error': 'Last turn was not a model turn. Cannot retry.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Find preceding user turn (async)
-        user_turn = await adventure.adventureHistory.filter(
-            timestamp__lt=last_turn.timestamp
-        ).order_by('-timestamp').afirst()
-        
-        if not user_turn or user_turn.role != 'user':
-            return Response(
-                {'error': 'Could not find the preceding user turn to retry from'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        """
+        Retry the last AI response (async native).
         
-        # Delete last AI turn (async)
-        if last_turn.token_usage:
-            await last_turn.token_usage.adelete()
-        await last_turn.adelete()
+        The last two turns (by sequence) must be the user turn and the model
+        turn being replaced; they are read under the adventure's generation
+        lock, so a concurrent generation cannot interleave with the retry.
+        The old model turn is only deleted once its replacement is generated.
+        """
+        adventure = await Adventure.objects.aget(pk=pk)
+        completion_params = self._completion_params(request)
         
-        # Regenerate with user turn text
-        selected_model = request.data.get('selected_model', 'gemini/gemini-1.5-flash')
-        max_tokens = request.data.get('global_max_output_tokens', 200)
+        defaults = await global_settings.generation_defaults()
+        selected_model = request.data.get('selected_model') or defaults.model
+        max_tokens = request.data.get('global_max_output_tokens') or defaults.max_tokens
+        set_label('model', selected_model)
         
         try:
-            # Get AIService and generate response
-            ai_service = get_ai_service(request)
-            
-            # No asyncio.run() needed - already in async context
-            response = await ai_service.generate_adventure_turn(
-                adventure=adventure,
-                user_text=user_turn.text,
-                model=selected_model,
-                max_tokens=max_tokens
-            )
-            
-            # Extract AI response text
-            ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
-            
-            # Create new AI turn (async)
-            ai_turn = await AdventureTurn.objects.acreate(
-                adventure=adventure,
-                role='model',
-                text=ai_text,
-                timestamp=timezone.now(),
-                actionType='story'
-            )
-            
-            # Update adventure last played time (async)
-            adventure.lastPlayedAt = timezone.now()
-            await adventure.asave()
-            
-            serializer = AdventureTurnSerializer(ai_turn)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            async with adventure_locks.hold(adventure.pk):
+                # Last AI turn and preceding user turn (async)
+                last_turns = [
+                    turn async for turn in adventure.adventureHistory.order_by('-sequence', '-id')[:2]
+                ]
+                last_turn = last_turns[0] if last_turns else None
+                
+                if not last_turn or last_turn.role != 'model':
+                    return Response(
+                        {'error': 'Last turn was not a model turn. Cannot retry.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                user_turn = last_turns[1] if len(last_turns) > 1 else None
+                
+                if not user_turn or user_turn.role != 'user':
+                    return Response(
+                        {'error': 'Could not find the preceding user turn to retry from'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                # Get AIService and regenerate from the history before the user turn
+                ai_service = get_ai_service(request)
+                
+                # No asyncio.run() needed - already in async context
+                prompt = await ai_service.build_adventure_prompt(
+                    adventure=adventure,
+                    user_text=user_turn.text,
+                    model=selected_model,
+                    max_tokens=max_tokens,
+                    history_before=user_turn
+                )
+                response = await ai_service.generate_adventure_turn(
+                    adventure=adventure,
+                    user_text=user_turn.text,
+                    model=selected_model,
+                    max_tokens=max_tokens,
+                    prompt=prompt,
+                    **completion_params
+                )
+                
+                # Extract AI response text
+                ai_text = response.get('choices', [{}])[0].get('message', {}).get('content', '')
+                
+                # Replace the last AI turn in one transaction (async); the
+                # old turn is kept if generation fails
+                ai_turn, = await aappend_turns(adventure.pk, [
+                    AdventureTurn(
+                        role='model',
+                        text=ai_text,
+                        timestamp=timezone.now(),
+                        actionType='story',
+                        tokenCounts=ai_service.turn_token_counts(selected_model, 'model', ai_text)
+                    ),
+                ], replace=last_turn)
+                
+                # Token usage accounting runs in the background
+                ai_service.record_turn_usage(ai_turn.pk, selected_model, prompt, response=response)
+                
+                serializer = AdventureTurnSerializer(ai_turn)
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
             
+        except AdventureBusy as busy:
+            return self._adventure_busy_response(busy)
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -279,76 +447,145 @@ class AdventureViewSet(viewsets.ModelViewSet):
             "action_type": "do|say|story"
         }
         
+        selected_model and max_tokens default to the GlobalSettings values.
+        An identical request made while a stream is in flight follows that
+        stream (from its first event) instead of generating another.
+        
+        Generation runs in the background until it completes, even if the
+        client disconnects. Every event has an SSE id; repeating the request
+        with a Last-Event-ID header resumes the stream after that event.
+        
         Response: text/event-stream with JSON chunks
         """
         adventure = await Adventure.objects.aget(pk=pk)
         
+        last_event_id = request.headers.get('Last-Event-ID')
+        if last_event_id:
+            resume_from = parse_event_id(last_event_id)
+            if resume_from is None:
+                return Response(
+                    {'error': f'Invalid Last-Event-ID: {last_event_id}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            stream_id, after = resume_from
+            # Stream ids are only valid on the adventure that started them
+            if await stream_buffer.owner(stream_id) != str(adventure.pk):
+                return Response(
+                    {'error': f'Unknown or expired stream for this adventure: {stream_id}'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return self._event_stream_response(stream_buffer.sse(stream_id, after))
+        
         user_text = request.data.get('text')
         action_type = request.data.get('action_type', request.data.get('actionType', 'do'))
-        selected_model = request.data.get('selected_model', 'gemini/gemini-1.5-flash')
-        max_tokens = request.data.get('max_tokens', request.data.get('global_max_output_tokens', 200))
+        defaults = await global_settings.generation_defaults()
+        selected_model = request.data.get('selected_model') or defaults.model
+        max_tokens = (
+            request.data.get('max_tokens')
+            or request.data.get('global_max_output_tokens')
+            or defaults.max_tokens
+        )
+        set_label('model', selected_model)
         
-        async def event_stream():
+        async def generate_events():
             """Generate SSE events for streaming response."""
             accumulated_text = ""
             
+            # Runs in its own background task, timed apart from the request
+            timing = request_timing.start(endpoint='adventure-stream-events', model=selected_model)
+            set_current_timing(timing)
+            
             try:
-                # Create user turn if text provided
-                if user_text:
-                    await AdventureTurn.objects.acreate(
-                        adventure=adventure,
-                        role='user',
-                        text=user_text,
-                        timestamp=timezone.now(),
-                        actionType=action_type
+                async with adventure_locks.hold(adventure.pk):
+                    # Get AIService
+                    ai_service = get_ai_service(request)
+                    
+                    submitted_at = timezone.now()
+                    
+                    # Stream AI response
+                    prompt = await ai_service.build_adventure_prompt(
+                        adventure, user_text, model=selected_model, max_tokens=max_tokens
                     )
-                
-                # Get AIService and build messages
-                ai_service = get_ai_service(request)
-                
-                # Stream AI response
-                stream = await ai_service.complete_stream(
-                    model=selected_model,
-                    messages=await ai_service._build_adventure_messages(adventure, user_text),
-                    max_tokens=max_tokens
-                )
-                
-                # Process stream chunks
-                async for chunk in stream:
-                    # Extract content from chunk
-                    if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta
-                        if hasattr(delta, 'content') and delta.content:
-                            text_chunk = delta.content
-                            accumulated_text += text_chunk
-                            
-                            # Send SSE event
-                            yield f"data: {json.dumps({'chunk': text_chunk})}\n\n"
-                
-                # Save completed AI turn
-                if accumulated_text:
-                    await AdventureTurn.objects.acreate(
-                        adventure=adventure,
-                        role='model',
-                        text=accumulated_text,
-                        timestamp=timezone.now(),
-                        actionType='story'
+                    llm_started = time.perf_counter()
+                    first_chunk_at = None
+                    stream = await ai_service.complete_stream(
+                        model=selected_model,
+                        messages=prompt.messages_for(selected_model),
+                        max_tokens=max_tokens
                     )
                     
-                    # Update adventure last played time
-                    adventure.lastPlayedAt = timezone.now()
-                    await adventure.asave()
-                
-                # Send completion signal
-                yield "data: [DONE]\n\n"
-                
+                    # Process stream chunks
+                    usage = None
+                    async for chunk in stream:
+                        # Providers report usage on the final chunk
+                        usage = getattr(chunk, 'usage', None) or usage
+                        
+                        # Extract content from chunk
+                        if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
+                            delta = chunk.choices[0].delta
+                            if hasattr(delta, 'content') and delta.content:
+                                if first_chunk_at is None:
+                                    first_chunk_at = time.perf_counter()
+                                    add_span('llm_ttft', first_chunk_at - llm_started)
+                                text_chunk = delta.content
+                                accumulated_text += text_chunk
+                                
+                                # Send SSE event
+                                yield f"data: {json.dumps({'chunk': text_chunk})}\n\n"
+                    
+                    if first_chunk_at is not None:
+                        add_span('llm_stream', time.perf_counter() - first_chunk_at)
+                    
+                    # Save user turn (if text provided) and completed AI turn
+                    # in one transaction; an interrupted stream saves neither
+                    if accumulated_text:
+                        turns = []
+                        if user_text:
+                            turns.append(AdventureTurn(
+                                role='user',
+                                text=user_text,
+                                timestamp=submitted_at,
+                                actionType=action_type,
+                                tokenCounts=ai_service.turn_token_counts(selected_model, 'user', user_text)
+                            ))
+                        turns.append(AdventureTurn(
+                            role='model',
+                            text=accumulated_text,
+                            timestamp=timezone.now(),
+                            actionType='story',
+                            tokenCounts=ai_service.turn_token_counts(selected_model, 'model', accumulated_text)
+                        ))
+                        ai_turn = (await aappend_turns(adventure.pk, turns))[-1]
+                        
+                        # Token usage accounting runs in the background
+                        ai_service.record_turn_usage(ai_turn.pk, selected_model, prompt, usage=usage)
+                    
+                    # Send completion signal
+                    yield "data: [DONE]\n\n"
+            
+            except AdventureBusy as busy:
+                yield f"data: {json.dumps({'error': str(busy)})}\n\n"
             except Exception as e:
                 # Send error event
                 error_msg = json.dumps({'error': str(e)})
                 yield f"data: {error_msg}\n\n"
+            finally:
+                request_timing.finish(timing)
+        
+        # Identical concurrent requests share one generation; late joiners
+        # replay the events sent so far, then follow the live stream
+        key = coalescing_key(adventure.pk, 'stream', user_text, action_type, selected_model, max_tokens)
+        ai_service = get_ai_service(request)
+        stream_id = stream_buffer.start(
+            lambda: ai_service.coalesce_stream(key, generate_events), owner=str(adventure.pk)
+        )
         
+        return self._event_stream_response(stream_buffer.sse(stream_id))
+    
+    @staticmethod
+    def _event_stream_response(event_stream):
         return StreamingHttpResponse(
-            event_stream(),
+            event_stream,
             content_type='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
@@ -357,6 +594,49 @@ class AdventureViewSet(viewsets.ModelViewSet):
         )
     
     
+    @staticmethod
+    def _completion_params(request):
+        """
+        Optional completion parameters of the generation endpoints.
+        
+        temperature is passed to the provider; allow_cached accepts a cached
+        response for an identical request and bypass_cache forces a provider
+        call (see CompletionCache).
+        """
+        params = {
+            'allow_cached': str(request.data.get('allow_cached', '')).lower() in ('true', '1', 'yes'),
+            'bypass_cache': str(request.data.get('bypass_cache', '')).lower() in ('true', '1', 'yes'),
+        }
+        temperature = request.data.get('temperature')
+        if temperature not in (None, ''):
+            try:
+                params['temperature'] = float(temperature)
+            except (TypeError, ValueError):
+                raise ValidationError({'temperature': 'Must be a number.'})
+        return params
+    
+    @staticmethod
+    def _snapshot_version_param(request):
+        """Optional snapshot_version for an optimistic check (None if absent)."""
+        version = request.data.get('snapshot_version')
+        if version in (None, ''):
+            return None
+        try:
+            return int(version)
+        except (TypeError, ValueError):
+            raise ValidationError({'snapshot_version': 'Must be an integer.'})
+    
+    @staticmethod
+    def _adventure_busy_response(busy):
+        return Response({'error': str(busy)}, status=status.HTTP_409_CONFLICT)
+    
+    @staticmethod
+    def _snapshot_conflict_response(conflict):
+        return Response(
+            {'error': str(conflict), 'snapshot_version': conflict.current_version},
+            status=status.HTTP_409_CONFLICT
+        )
+    
     @action(detail=True, methods=['post'], url_path='add-card-to-snapshot')
     def add_card_to_snapshot(self, request, pk=None):
         """Add a new card to adventure snapshot."""
@@ -373,16 +653,16 @@ class AdventureViewSet(viewsets.ModelViewSet):
         if 'id' not in card_data or not card_data['id']:
             card_data['id'] = str(uuid.uuid4())
         
-        # Ensure cards list exists
-        if 'cards' not in adventure.scenarioSnapshot:
-            adventure.scenarioSnapshot['cards'] = []
-        
-        adventure.scenarioSnapshot['cards'].append(card_data)
-        adventure.lastPlayedAt = timezone.now()
-        adventure.save()
+        try:
+            version = card_editor_for(adventure).add(
+                card_data, self._snapshot_version_param(request)
+            )
+        except SnapshotConflict as conflict:
+            return self._snapshot_conflict_response(conflict)
+        trigger_index_cache.invalidate(adventure.pk)
         
         return Response(
-            {'status': 'Card added to snapshot', 'card_id': card_data['id']},
+            {'status': 'Card added to snapshot', 'card_id': card_data['id'], 'snapshot_version': version},
             status=status.HTTP_201_CREATED
         )
     
@@ -400,21 +680,20 @@ class AdventureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cards = adventure.scenarioSnapshot.get('cards', [])
-        
-        # Find and update card
-        for i, card in enumerate(cards):
-            if card.get('id') == card_id:
-                updated_card['id'] = card_id
-                cards[i] = updated_card
-                adventure.lastPlayedAt = timezone.now()
-                adventure.save()
-                return Response({'status': 'Card updated in snapshot'})
+        try:
+            version = card_editor_for(adventure).edit(
+                card_id, updated_card, self._snapshot_version_param(request)
+            )
+        except SnapshotConflict as conflict:
+            return self._snapshot_conflict_response(conflict)
+        except SnapshotCardNotFound:
+            return Response(
+                {'error': 'Card not found in snapshot'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        trigger_index_cache.invalidate(adventure.pk)
         
-        return Response(
-            {'error': 'Card not found in snapshot'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+        return Response({'status': 'Card updated in snapshot', 'snapshot_version': version})
     
     @action(detail=True, methods=['post'], url_path='delete-card-from-snapshot')
     def delete_card_from_snapshot(self, request, pk=None):
@@ -428,22 +707,20 @@ class AdventureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cards = adventure.scenarioSnapshot.get('cards', [])
-        initial_count = len(cards)
-        
-        adventure.scenarioSnapshot['cards'] = [
-            card for card in cards if card.get('id') != card_id
-        ]
-        
-        if len(adventure.scenarioSnapshot['cards']) < initial_count:
-            adventure.lastPlayedAt = timezone.now()
-            adventure.save()
-            return Response({'status': 'Card deleted from snapshot'})
+        try:
+            version = card_editor_for(adventure).delete(
+                card_id, self._snapshot_version_param(request)
+            )
+        except SnapshotConflict as conflict:
+            return self._snapshot_conflict_response(conflict)
+        except SnapshotCardNotFound:
+            return Response(
+                {'error': 'Card not found in snapshot'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        trigger_index_cache.invalidate(adventure.pk)
         
-        return Response(
-            {'error': 'Card not found in snapshot'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+        return Response({'status': 'Card deleted from snapshot', 'snapshot_version': version})
     
     @action(detail=True, methods=['post'], url_path='duplicate-card-in-snapshot')
     def duplicate_card_in_snapshot(self, request, pk=None):
@@ -457,57 +734,142 @@ class AdventureViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cards = adventure.scenarioSnapshot.get('cards', [])
-        
-        # Find card to duplicate
-        for i, card in enumerate(cards):
-            if card.get('id') == card_id:
-                duplicated_card = card.copy()
-                duplicated_card['id'] = str(uuid.uuid4())
-                duplicated_card['title'] = f"{card.get('title', '')} (Copy)"
-                
-                # Insert after original
-                cards.insert(i + 1, duplicated_card)
-                adventure.lastPlayedAt = timezone.now()
-                adventure.save()
-                
-                return Response({
-                    'status': 'Card duplicated in snapshot',
-                    'new_card_id': duplicated_card['id']
-                })
+        try:
+            new_card_id, version = card_editor_for(adventure).duplicate(
+                card_id, self._snapshot_version_param(request)
+            )
+        except SnapshotConflict as conflict:
+            return self._snapshot_conflict_response(conflict)
+        except SnapshotCardNotFound:
+            return Response(
+                {'error': 'Card not found in snapshot'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        trigger_index_cache.invalidate(adventure.pk)
         
-        return Response(
-            {'error': 'Card not found in snapshot'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+        return Response({
+            'status': 'Card duplicated in snapshot',
+            'new_card_id': new_card_id,
+            'snapshot_version': version
+        })
+    
+    @action(detail=False, methods=['get'], url_path='trigger-cache-stats')
+    def trigger_cache_stats(self, request):
+        """Get hit/miss/build-time counters of the trigger index cache."""
+        return Response(trigger_index_cache.stats())
+    
+    @action(detail=False, methods=['get'], url_path='prompt-cache-stats')
+    def prompt_cache_stats(self, request):
+        """Get the prompt prefix hit ratio across turns (this worker)."""
+        return Response(prefix_cache_tracker.stats())
+    
+    @action(detail=False, methods=['get'], url_path='coalescing-stats')
+    def coalescing_stats(self, request):
+        """Get counters of coalesced generation requests (this worker)."""
+        ai_service = get_ai_service(request)
+        return Response({
+            'generate': ai_service.flights.stats(),
+            'stream': ai_service.stream_coalescer.stats(),
+        })
+    
+    @action(detail=False, methods=['get'], url_path='completion-cache-stats')
+    def completion_cache_stats(self, request):
+        """Get hit/miss counters of the completion cache (this worker)."""
+        return Response(completion_cache.stats())
+    
+    @action(detail=False, methods=['get'], url_path='stream-stats')
+    def stream_stats(self, request):
+        """Get counters of background and resumed streams (this worker)."""
+        return Response(stream_buffer.stats())
+    
+    @action(detail=False, methods=['get'], url_path='timing-stats')
+    def timing_stats(self, request):
+        """Get mean request and stage durations per endpoint and model (this worker)."""
+        histograms = request_timing.histograms()
+        if histograms is None:
+            return Response({'enabled': request_timing.enabled, 'endpoints': {}})
+        return Response({'enabled': True, 'endpoints': histograms.stats()})
     
     @action(detail=True, methods=['post'], url_path='duplicate')
     def duplicate(self, request, pk=None):
-        """Duplicate entire adventure with history."""
-        adventure = self.get_object()
-        
-        # Create duplicated adventure
-        duplicated_adventure = Adventure.objects.create(
-            sourceScenario=adventure.sourceScenario,
-            sourceScenarioName=adventure.sourceScenarioName,
-            adventureName=f"{adventure.adventureName} (Copy)",
-            scenarioSnapshot=adventure.scenarioSnapshot,  # JSONField is copied by value
-            createdAt=timezone.now(),
-            lastPlayedAt=timezone.now()
-        )
+        """
+        Duplicate entire adventure with history.
         
-        # Duplicate turns
-        for turn in adventure.adventureHistory.all():
-            AdventureTurn.objects.create(
-                adventure=duplicated_adventure,
+        Turns keep their sequence numbers and timestamps and are copied with
+        chunked bulk_create inside one transaction. Pass copy_token_usage=true
+        to also copy each turn's TokenUsageStats.
+        """
+        adventure = self.get_object()
+        copy_token_usage = str(request.data.get('copy_token_usage', '')).lower() in ('true', '1', 'yes')
+        
+        with transaction.atomic():
+            # Create duplicated adventure
+            duplicated_adventure = Adventure.objects.create(
+                sourceScenario=adventure.sourceScenario,
+                sourceScenarioName=adventure.sourceScenarioName,
+                adventureName=f"{adventure.adventureName} (Copy)",
+                scenarioSnapshot=adventure.scenarioSnapshot,  # JSONField is copied by value
+                cardStorage=adventure.cardStorage,
+                snapshotBlob_id=adventure.snapshotBlob_id,  # Shared blobs are referenced, not copied
+                snapshotOverlay=adventure.snapshotOverlay,
+                turnSequence=adventure.turnSequence,
+                createdAt=timezone.now(),
+                lastPlayedAt=timezone.now()
+            )
+            if uses_card_table(adventure):
+                copy_adventure_cards(adventure, duplicated_adventure)
+            
+            # Duplicate turns chunk by chunk
+            turns = adventure.adventureHistory.order_by('sequence', 'id')
+            if copy_token_usage:
+                turns = turns.select_related('token_usage')
+            
+            chunk = []
+            for turn in turns.iterator(chunk_size=BULK_BATCH_SIZE):
+                chunk.append(turn)
+                if len(chunk) >= BULK_BATCH_SIZE:
+                    self._copy_turns(chunk, duplicated_adventure, copy_token_usage)
+                    chunk = []
+            if chunk:
+                self._copy_turns(chunk, duplicated_adventure, copy_token_usage)
+        
+        duplicated_adventure = Adventure.objects.prefetch_related(
+            self._history_prefetch(), 'snapshotCards'
+        ).get(pk=duplicated_adventure.pk)
+        serializer = self.get_serializer(duplicated_adventure)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @staticmethod
+    def _copy_turns(turns, target_adventure, copy_token_usage):
+        """Bulk-insert copies of turns (and optionally their token stats) into target_adventure."""
+        token_usage_copies = {}
+        if copy_token_usage:
+            stats_fields = [
+                field.attname for field in TokenUsageStats._meta.concrete_fields
+                if not field.primary_key
+            ]
+            for turn in turns:
+                if turn.token_usage is not None:
+                    token_usage_copies[turn.pk] = TokenUsageStats(**{
+                        name: getattr(turn.token_usage, name) for name in stats_fields
+                    })
+            # Primary keys are set on the copies so turns can link to them
+            TokenUsageStats.objects.bulk_create(list(token_usage_copies.values()))
+        
+        AdventureTurn.objects.bulk_create([
+            AdventureTurn(
+                adventure=target_adventure,
                 role=turn.role,
                 text=turn.text,
+                sequence=turn.sequence,
                 actionType=turn.actionType,
-                timestamp=timezone.now()
+                tokenUsage=turn.tokenUsage,
+                tokenCounts=turn.tokenCounts,
+                token_usage=token_usage_copies.get(turn.pk),
+                timestamp=turn.timestamp
             )
-        
-        serializer = self.get_serializer(duplicated_adventure)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+            for turn in turns
+        ])
 
 
 class AdventureTurnViewSet(viewsets.ModelViewSet):
@@ -515,3 +877,8 @@ class AdventureTurnViewSet(viewsets.ModelViewSet):
     
     queryset = AdventureTurn.objects.all()
     serializer_class = AdventureTurnSerializer
+    
+    def perform_create(self, serializer):
+        """Append the turn at the end of its adventure's history."""
+        adventure = serializer.validated_data['adventure']
+        serializer.save(sequence=allocate_turn_sequence(adventure.pk))
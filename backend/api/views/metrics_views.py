@@ -0,0 +1,17 @@
+"""
+Metrics endpoint in the Prometheus text format.
+"""
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from api.services.metrics import registry
+from api.services.request_timing import request_timing  # noqa: F401 (registers the timing histograms)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics(request):
+    """Backend metrics of this worker (see api.services.metrics)."""
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
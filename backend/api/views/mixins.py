@@ -0,0 +1,44 @@
+"""
+Shared viewset mixins.
+"""
+
+import functools
+import inspect
+
+from asgiref.sync import async_to_sync
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+class AsyncHandlerMixin:
+    """
+    Allow `async def` handlers and actions on DRF viewsets.
+    
+    Stock DRF calls handlers synchronously and expects a Response back. A
+    coroutine returned by a handler is awaited with async_to_sync before DRF
+    finalizes the response: under ASGI it runs on the server's event loop, under
+    WSGI on a per-request loop. Authentication, permissions and exception
+    handling work as for sync handlers.
+    """
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        
+        method = request.method.lower()
+        handler = getattr(self, method, None)
+        if handler is not None:
+            setattr(self, method, self._awaiting_handler(handler))
+    
+    @staticmethod
+    def _awaiting_handler(handler):
+        # Checks the result rather than the function, since decorators such as
+        # method_decorator hide that the handler is a coroutine function
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            result = handler(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                return async_to_sync(_await)(result)
+            return result
+        return wrapper
@@ -5,18 +5,24 @@ Model views for retrieving available AI models.
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from api.dependencies import get_rotating_client
+from api.services.model_catalog import model_catalog
+from api.views.mixins import AsyncHandlerMixin
 
 
-class ModelViewSet(viewsets.ViewSet):
+class ModelViewSet(AsyncHandlerMixin, viewsets.ViewSet):
     """ViewSet for retrieving available AI models."""
     
-    def list(self, request):
-        """Get list of available models from all providers."""
+    async def list(self, request):
+        """
+        Get list of available models from all providers.
+        
+        Served from the model catalog cache; an expired catalog is returned
+        as-is ('stale': true) while it is refreshed in the background.
+        """
         try:
-            import asyncio
             client = get_rotating_client(request)
-            models = asyncio.run(client.get_all_available_models(grouped=True))
-            return Response({'models': models})
+            catalog = await model_catalog.get_models(client)
+            return Response(catalog)
         except Exception as e:
             return Response(
                 {'error': f'Failed to retrieve models: {str(e)}'},
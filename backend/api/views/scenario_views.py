@@ -2,9 +2,15 @@
 Scenario views for ImaginAI backend.
 """
 
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from api.models import Scenario, Card
 from api.serializers import (
    ScenarioSerializer,
@@ -13,6 +19,28 @@ from api.serializers import (
     AIDImportSerializer
 )
 from api.utils import AIDTranslator
+from api.utils.json_stream import JSONStreamError, aiter_gzip, iter_gzip, iter_json_array_items
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk_create round trip when copying or importing cards
+BULK_BATCH_SIZE = 500
+
+# Per-card errors included in a streaming import summary
+MAX_REPORTED_IMPORT_ERRORS = 100
+
+# Progress of streaming imports in CACHES['default'] (shared by all workers),
+# kept for this many seconds after the last update
+IMPORT_PROGRESS_KEY = 'aid_import_progress:{}'
+IMPORT_PROGRESS_TIMEOUT = 3600
+
+
+def report_import_progress(scenario_id, **progress) -> None:
+    """Store the progress of a streaming AID import for import-cards-aid-progress."""
+    try:
+        cache.set(IMPORT_PROGRESS_KEY.format(scenario_id), progress, IMPORT_PROGRESS_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Failed to store AID import progress of scenario {scenario_id}: {e}")
 
 
 class ScenarioViewSet(viewsets.ModelViewSet):
@@ -38,16 +66,55 @@ class ScenarioViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], url_path='export-cards-aid')
     def export_cards_aid(self, request, pk=None):
-        """Export story cards in AI Dungeon format."""
+        """
+        Export story cards in AI Dungeon format.
+        
+        With ?stream=true the document is written incrementally through a
+        StreamingHttpResponse (optionally gzip-encoded with &gzip=true), so
+        memory stays flat and the first bytes go out before all cards are read.
+        Under ASGI the body is an async iterator: Django would read a sync one
+        completely before sending it.
+        """
         scenario = self.get_object()
+        
+        if request.query_params.get('stream', '').lower() in ('true', '1', 'yes'):
+            use_gzip = request.query_params.get('gzip', '').lower() in ('true', '1', 'yes')
+            
+            if isinstance(request._request, ASGIRequest):
+                pieces = AIDTranslator.aiter_export_json(scenario, chunk_size=BULK_BATCH_SIZE)
+                if use_gzip:
+                    content = aiter_gzip(pieces)
+                else:
+                    content = (piece.encode('utf-8') async for piece in pieces)
+            else:
+                pieces = AIDTranslator.iter_export_json(scenario, chunk_size=BULK_BATCH_SIZE)
+                if use_gzip:
+                    content = iter_gzip(pieces)
+                else:
+                    content = (piece.encode('utf-8') for piece in pieces)
+            
+            response = StreamingHttpResponse(content, content_type='application/json')
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+            return response
+        
         serializer = AIDExportSerializer(scenario)
         return Response(serializer.data)
    
     @action(detail=True, methods=['post'], url_path='import-cards-aid')
     def import_cards_aid(self, request, pk=None):
-        """Import story cards from AI Dungeon format."""
+        """
+        Import story cards from AI Dungeon format.
+        
+        With ?stream=true the raw body is parsed incrementally and cards are
+        written in chunks (see _import_cards_aid_streaming); otherwise the whole
+        body is validated up front and rejected if any card is invalid.
+        """
         scenario = self.get_object()
         
+        if request.query_params.get('stream', '').lower() in ('true', '1', 'yes'):
+            return self._import_cards_aid_streaming(request, scenario)
+        
         # Validate AID format
         serializer = AIDImportSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -65,9 +132,91 @@ class ScenarioViewSet(viewsets.ModelViewSet):
         scenario.refresh_from_db()
         return Response(ScenarioSerializer(scenario).data)
     
+    def _import_cards_aid_streaming(self, request, scenario):
+        """
+        Replace a scenario's cards from an AID export of any size.
+        
+        The body (either a JSON array of cards or an object with a 'cards'
+        array) is read in chunks and never deserialized as a whole. Each card
+        is validated and mapped as it is parsed, and valid cards are written in
+        chunked bulk_create calls, so memory is bounded by one batch. Invalid
+        cards are skipped and reported; malformed JSON rolls the whole import
+        back and leaves the existing cards untouched.
+        
+        Progress is stored after every batch and can be polled from another
+        connection with GET import-cards-aid-progress.
+        """
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        imported = 0
+        failed = 0
+        errors = []
+        
+        def flush(batch):
+            nonlocal imported
+            Card.objects.bulk_create(batch)
+            imported += len(batch)
+            report_import_progress(scenario.pk, status='running', imported=imported, failed=failed)
+            logger.info(
+                f"AID import into scenario {scenario.pk}: {imported} cards imported, {failed} skipped"
+            )
+        
+        report_import_progress(scenario.pk, status='running', imported=0, failed=0)
+        try:
+            with transaction.atomic():
+                scenario.cards.all().delete()
+                
+                batch = []
+                for index, aid_card in enumerate(iter_json_array_items(stream, key='cards')):
+                    error = AIDTranslator.validate_aid_card(aid_card)
+                    if error:
+                        failed += 1
+                        if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                            errors.append({'index': index, 'error': error})
+                        continue
+                    
+                    batch.append(Card(scenario=scenario, **AIDTranslator.map_aid_card(aid_card)))
+                    if len(batch) >= BULK_BATCH_SIZE:
+                        flush(batch)
+                        batch = []
+                if batch:
+                    flush(batch)
+        except JSONStreamError as e:
+            report_import_progress(scenario.pk, status='failed', imported=0, failed=failed, error=str(e))
+            return Response(
+                {'error': f'Invalid AI Dungeon export: {e}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception:
+            report_import_progress(scenario.pk, status='failed', imported=0, failed=failed)
+            raise
+        
+        report_import_progress(scenario.pk, status='done', imported=imported, failed=failed)
+        return Response({
+            'scenario': scenario.pk,
+            'imported': imported,
+            'failed': failed,
+            'errors': errors,
+            'errors_truncated': failed > len(errors),
+        })
+    
+    @action(detail=True, methods=['get'], url_path='import-cards-aid-progress')
+    def import_cards_aid_progress(self, request, pk=None):
+        """Get the progress of the scenario's latest streaming AID import."""
+        scenario = self.get_object()
+        progress = cache.get(IMPORT_PROGRESS_KEY.format(scenario.pk))
+        if progress is None:
+            return Response(
+                {'error': 'No recent streaming import for this scenario'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(progress)
+    
     @action(detail=True, methods=['post'], url_path='duplicate')
     def duplicate_scenario(self, request, pk=None):
-        """Duplicate an existing scenario with its cards."""
+        """Duplicate an existing scenario with its cards (chunked bulk insert in one transaction)."""
         original_scenario = self.get_object()
         
         # Create scenario copy
@@ -82,18 +231,25 @@ class ScenarioViewSet(viewsets.ModelViewSet):
             'visibility': original_scenario.visibility
         }
         
-        duplicated_scenario = Scenario.objects.create(**scenario_data)
-        
-        # Duplicate cards
-        for original_card in original_scenario.cards.all():
-            Card.objects.create(
-                scenario=duplicated_scenario,
-                title=original_card.title,
-                card_type=original_card.card_type,
-                trigger_words=original_card.trigger_words,
-                short_description=original_card.short_description,
-                full_content=original_card.full_content
+        with transaction.atomic():
+            duplicated_scenario = Scenario.objects.create(**scenario_data)
+            
+            # Duplicate cards chunk by chunk, without instantiating the originals
+            card_values = original_scenario.cards.order_by('id').values(
+                'title',
+                'card_type',
+                'trigger_words',
+                'short_description',
+                'full_content'
             )
+            chunk = []
+            for card_data in card_values.iterator(chunk_size=BULK_BATCH_SIZE):
+                chunk.append(Card(scenario=duplicated_scenario, **card_data))
+                if len(chunk) >= BULK_BATCH_SIZE:
+                    Card.objects.bulk_create(chunk)
+                    chunk = []
+            if chunk:
+                Card.objects.bulk_create(chunk)
         
         serializer = self.get_serializer(duplicated_scenario)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
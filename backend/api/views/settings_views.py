@@ -6,21 +6,22 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from api.models import GlobalSettings
 from api.serializers import GlobalSettingsSerializer
+from api.services.settings_cache import global_settings
 
 
 class GlobalSettingsViewSet(viewsets.ViewSet):
     """ViewSet for global application settings."""
     
     def list(self, request):
-        """Get global settings (singleton)."""
-        settings, created = GlobalSettings.objects.get_or_create(pk=1)
-        serializer = GlobalSettingsSerializer(settings)
+        """Get global settings (singleton, served from the per-process cache)."""
+        serializer = GlobalSettingsSerializer(global_settings.get())
         return Response(serializer.data)
     
     def update(self, request, pk=None):
-        """Update global settings."""
+        """Update global settings and notify all workers."""
         settings, created = GlobalSettings.objects.get_or_create(pk=1)
         serializer = GlobalSettingsSerializer(settings, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        global_settings.notify_changed(serializer.instance)
         return Response(serializer.data)
@@ -0,0 +1,147 @@
+"""
+Benchmark: database round trips when duplicating adventures and scenarios.
+
+Compares the original one-INSERT-per-row duplication loop against the chunked
+bulk_create implementation of the duplicate endpoints. Runs against a throwaway
+test database created from the configured DATABASES setting.
+
+Usage (from the backend/ directory):
+    python benchmarks/bench_duplicate.py
+    python benchmarks/bench_duplicate.py --rows 100 1000 3000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add backend root to path so we can import the project
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imaginai_backend.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Adventure, AdventureTurn, Card, Scenario
+
+
+def legacy_duplicate_adventure(adventure):
+    """The original AdventureViewSet.duplicate loop."""
+    duplicated_adventure = Adventure.objects.create(
+        sourceScenario=adventure.sourceScenario,
+        sourceScenarioName=adventure.sourceScenarioName,
+        adventureName=f"{adventure.adventureName} (Copy)",
+        scenarioSnapshot=adventure.scenarioSnapshot,
+        createdAt=timezone.now(),
+        lastPlayedAt=timezone.now()
+    )
+    for turn in adventure.adventureHistory.all():
+        AdventureTurn.objects.create(
+            adventure=duplicated_adventure,
+            role=turn.role,
+            text=turn.text,
+            actionType=turn.actionType,
+            timestamp=timezone.now()
+        )
+
+
+def legacy_duplicate_scenario(scenario):
+    """The original ScenarioViewSet.duplicate_scenario loop."""
+    duplicated_scenario = Scenario.objects.create(
+        name=f"{scenario.name} (Copy)",
+        instructions=scenario.instructions,
+        openingScene=scenario.openingScene,
+        playerDescription=scenario.playerDescription,
+    )
+    for card in scenario.cards.all():
+        Card.objects.create(
+            scenario=duplicated_scenario,
+            title=card.title,
+            card_type=card.card_type,
+            trigger_words=card.trigger_words,
+            short_description=card.short_description,
+            full_content=card.full_content
+        )
+
+
+def measure(fn):
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+    return len(context.captured_queries), elapsed
+
+
+def make_fixtures(row_count):
+    scenario = Scenario.objects.create(
+        name='Benchmark', instructions='i', openingScene='o', playerDescription='p'
+    )
+    Card.objects.bulk_create([
+        Card(scenario=scenario, title=f'Card {i}', card_type='Concept',
+             trigger_words=f'word{i}', short_description='s', full_content='c' * 200)
+        for i in range(row_count)
+    ])
+    adventure = Adventure.objects.create(
+        sourceScenario=scenario, sourceScenarioName='Benchmark',
+        adventureName='Benchmark', scenarioSnapshot={'cards': []}
+    )
+    AdventureTurn.objects.bulk_create([
+        AdventureTurn(adventure=adventure, role='user' if i % 2 else 'model', text='t' * 200)
+        for i in range(row_count)
+    ])
+    return scenario, adventure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 3000],
+                        help='Turns per adventure / cards per scenario')
+    args = parser.parse_args()
+
+    # The endpoints are called in-process; accept the test client's host
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    client = APIClient()
+
+    try:
+        print("ImaginAI - Duplicate Round-Trip Benchmark")
+        print("=" * 78)
+        print(f"{'what':<10} {'rows':>6} {'legacy queries':>15} {'legacy s':>9} "
+              f"{'bulk queries':>13} {'bulk s':>8}")
+
+        for row_count in args.rows:
+            scenario, adventure = make_fixtures(row_count)
+
+            legacy_q, legacy_t = measure(lambda: legacy_duplicate_adventure(adventure))
+            bulk_q, bulk_t = measure(lambda: client.post(f'/api/adventures/{adventure.pk}/duplicate/'))
+            print(f"{'adventure':<10} {row_count:>6} {legacy_q:>15} {legacy_t:>9.3f} {bulk_q:>13} {bulk_t:>8.3f}")
+
+            legacy_q, legacy_t = measure(lambda: legacy_duplicate_scenario(scenario))
+            bulk_q, bulk_t = measure(lambda: client.post(f'/api/scenarios/{scenario.pk}/duplicate/'))
+            print(f"{'scenario':<10} {row_count:>6} {legacy_q:>15} {legacy_t:>9.3f} {bulk_q:>13} {bulk_t:>8.3f}")
+
+        print("=" * 78)
+        print("Bulk query counts include serializing the duplicated object in the response.")
+    finally:
+        runner.teardown_databases(old_config)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""
+Benchmark: AIService prompt assembly.
+
+Measures how the per-turn prompt building steps scale with history length,
+card count, trigger count and card content size, on synthetic scenarios:
+
+- system_instruction: AIService._format_system_instruction
+- trigger_index: TriggerIndex build over all cards (cached per adventure)
+- trigger_match: AIService._inject_triggered_cards with a built index
+- format_cards: AIService._format_cards_for_prompt
+- history_select: ContextWindowSelector over in-memory turns (no DB)
+- build_prompt: AIService.build_adventure_prompt end to end, against a
+  throwaway test database; DB time is measured and reported separately
+
+Wall time is the median of the repeats. Allocations are measured in an extra
+run under tracemalloc (peak KiB). Both are compared with the regression
+thresholds in prompt_thresholds.json; a slower or larger case makes the run
+exit with status 1.
+
+Usage (from the backend/ directory):
+    python benchmarks/bench_prompt_assembly.py
+    python benchmarks/bench_prompt_assembly.py --quick
+    python benchmarks/bench_prompt_assembly.py --write-thresholds --headroom 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add backend root to path so we can import the project
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imaginai_backend.settings')
+
+import django
+
+django.setup()
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.runner import DiscoverRunner
+
+from api.models import Adventure, AdventureTurn, Scenario
+from api.services.ai_service import AIService
+from api.services.context_window import ContextWindowSelector
+from api.services.token_counting import get_tokenizer_family
+from api.utils.trigger_index import TriggerIndex
+from benchmarks.fake_provider import FakeRotatingClient
+
+THRESHOLDS_FILE = Path(__file__).parent / 'prompt_thresholds.json'
+# Large context window, so long histories are actually walked
+MODEL = 'gemini/gemini-2.5-flash-preview-04-17'
+FAMILY = get_tokenizer_family(MODEL)
+MIN_THRESHOLD_MS = 1.0
+MIN_THRESHOLD_KIB = 64.0
+
+FULL_SIZES = {
+    'chars': [1_000, 100_000],
+    'cards': [10, 1_000, 50_000],
+    'triggers': [1, 5],
+    'content': [200, 5_000],
+    'triggered': [10, 500],
+    'turns': [10, 1_000, 100_000],
+}
+QUICK_SIZES = {
+    'chars': [1_000],
+    'cards': [10, 1_000],
+    'triggers': [1, 5],
+    'content': [200],
+    'triggered': [10],
+    'turns': [10, 1_000],
+}
+
+
+# Synthetic scenario generators
+
+def make_word(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+
+
+def make_text(rng, chars):
+    words = []
+    length = 0
+    while length < chars:
+        word = make_word(rng)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:chars]
+
+
+def make_cards(rng, count, triggers_per_card, content_chars):
+    return [
+        {
+            'id': i,
+            'title': f'Card {i}',
+            'card_type': 'Concept',
+            'trigger_words': ', '.join(f'{make_word(rng)}{i}' for _ in range(triggers_per_card)),
+            'short_description': 'Synthetic card',
+            'full_content': make_text(rng, content_chars),
+        }
+        for i in range(count)
+    ]
+
+
+def make_context(rng, cards, hit_count=10, word_count=600):
+    """Recent-history text mentioning hit_count cards' first trigger word."""
+    words = [make_word(rng) for _ in range(word_count)]
+    for card in rng.sample(cards, min(hit_count, len(cards))):
+        words.insert(rng.randrange(len(words)), card['trigger_words'].split(',')[0])
+    return ' '.join(words)
+
+
+def make_turns(rng, count, words_per_turn=40):
+    """Unsaved turns with memoized token counts, oldest first."""
+    return [
+        AdventureTurn(
+            id=i + 1,
+            sequence=i + 1,
+            role='user' if i % 2 else 'model',
+            text=make_text(rng, words_per_turn * 6),
+            tokenCounts={FAMILY: words_per_turn + 4},
+        )
+        for i in range(count)
+    ]
+
+
+class InMemorySelector(ContextWindowSelector):
+    """ContextWindowSelector paging over a list instead of the database."""
+
+    def __init__(self, turns, **kwargs):
+        super().__init__(Adventure(pk=0), count_turn_tokens=lambda turn: turn.tokenCounts[FAMILY], **kwargs)
+        self.turns = turns
+
+    async def _fetch_page(self, before):
+        end = before.sequence - 1 if before is not None else len(self.turns)
+        return self.turns[max(end - self.page_size, 0):end][::-1]
+
+    async def _count_dropped(self, stopped_at):
+        return stopped_at.sequence
+
+
+# Measurement
+
+def measure(fn, min_time=0.2, max_repeats=50):
+    """Median wall time (ms) over repeats, plus peak allocation (KiB) of one run."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_repeats and (len(times) < 3 or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'ms': round(statistics.median(times) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'repeats': len(times),
+    }
+
+
+class DBTimer:
+    """Time spent executing SQL, on every database connection in any thread."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        connection.execute_wrappers.append(self)
+        # The async ORM queries from a worker thread, on its own connection
+        connection_created.connect(self._on_connection_created, weak=False)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def reset(self):
+        with self._lock:
+            self.seconds = 0.0
+            self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self._lock:
+                self.seconds += time.perf_counter() - start
+                self.queries += 1
+
+
+# Cases
+
+def cpu_cases(sizes, service, rng):
+    loop = asyncio.new_event_loop()
+
+    for chars in sizes['chars']:
+        snapshot = {
+            'instructions': make_text(rng, chars),
+            'plotEssentials': make_text(rng, chars // 4),
+            'authorsNotes': make_text(rng, chars // 10),
+        }
+        yield f'system_instruction/chars={chars}', measure(lambda: service._format_system_instruction(snapshot))
+
+    for card_count in sizes['cards']:
+        for triggers in sizes['triggers']:
+            cards = make_cards(rng, card_count, triggers, 200)
+            context = make_context(rng, cards)
+            yield (f'trigger_index/cards={card_count},triggers={triggers}',
+                   measure(lambda: TriggerIndex.from_cards(cards)))
+
+            index = TriggerIndex.from_cards(cards)
+            yield (f'trigger_match/cards={card_count},triggers={triggers}',
+                   measure(lambda: service._inject_triggered_cards(context, cards, index)))
+
+    for triggered in sizes['triggered']:
+        for content in sizes['content']:
+            cards = make_cards(rng, triggered, 1, content)
+            yield (f'format_cards/cards={triggered},content={content}',
+                   measure(lambda: service._format_cards_for_prompt(cards)))
+
+    for turn_count in sizes['turns']:
+        turns = make_turns(rng, turn_count)
+        # History budget of the large-context model, minus output and fixed parts
+        budget = 1_000_000 - 200 - 2_000
+        yield (f'history_select/turns={turn_count}',
+               measure(lambda: loop.run_until_complete(InMemorySelector(turns).select(budget))))
+
+    loop.close()
+
+
+def db_cases(sizes, service, rng):
+    """build_adventure_prompt end to end, with DB time reported separately."""
+    scenario = Scenario.objects.create(name='Bench', instructions='i', openingScene='o', playerDescription='p')
+    loop = asyncio.new_event_loop()
+    timer = DBTimer()
+    timer.install()
+
+    shapes = [(turns, 100) for turns in sizes['turns']]
+    shapes += [(100, cards) for cards in sizes['cards'] if cards != 100]
+    for turn_count, card_count in shapes:
+        cards = make_cards(rng, card_count, 3, 500)
+        adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName='Bench',
+            adventureName=f'Bench {turn_count}x{card_count}',
+            scenarioSnapshot={
+                'instructions': make_text(rng, 2_000),
+                'plotEssentials': make_text(rng, 500),
+                'authorsNotes': make_text(rng, 200),
+                'cards': cards,
+            },
+            turnSequence=turn_count,
+        )
+        turns = make_turns(rng, turn_count)
+        for turn in turns:
+            turn.id = None
+            turn.adventure = adventure
+        AdventureTurn.objects.bulk_create(turns, batch_size=5_000)
+        user_text = make_context(rng, cards, hit_count=5, word_count=30)
+
+        def build():
+            return loop.run_until_complete(service.build_adventure_prompt(adventure, user_text, MODEL))
+
+        build()  # Warm the trigger index cache, as in steady-state play
+        timer.reset()
+        result = measure(build)
+        runs = result['repeats'] + 1
+        result['db_ms'] = round(timer.seconds / runs * 1000, 3)
+        result['queries'] = timer.queries // runs
+        # Thresholds apply to the time spent outside the database
+        result['total_ms'] = result['ms']
+        result['ms'] = round(max(result['total_ms'] - result['db_ms'], 0.0), 3)
+        yield f'build_prompt/turns={turn_count},cards={card_count}', result
+
+    # Release the connections of the ORM's worker thread before teardown
+    loop.run_until_complete(sync_to_async(connections.close_all)())
+    loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='Skip the largest sizes')
+    parser.add_argument('--no-db', action='store_true', help='Skip the build_prompt cases')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--thresholds', type=Path, default=THRESHOLDS_FILE, help='Regression thresholds file')
+    parser.add_argument('--write-thresholds', action='store_true',
+                        help='Write the measured values times --headroom as the new thresholds')
+    parser.add_argument('--headroom', type=float, default=3.0, help='Threshold factor over measured values')
+    parser.add_argument('--output', type=Path, help='JSON file for the measurements')
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    rng = random.Random(args.seed)
+    service = AIService(FakeRotatingClient(latency=0))
+    settings.DEBUG = False
+
+    results = {}
+    print("ImaginAI - Prompt Assembly Benchmark")
+    print("=" * 92)
+    print(f"{'case':<52} {'ms':>10} {'db ms':>9} {'queries':>8} {'peak KiB':>10}")
+
+    def report(name, result):
+        results[name] = result
+        print(f"{name:<52} {result['ms']:>10.3f} {result.get('db_ms', ''):>9} "
+              f"{result.get('queries', ''):>8} {result['peak_kib']:>10.1f}", flush=True)
+
+    for name, result in cpu_cases(sizes, service, rng):
+        report(name, result)
+
+    if not args.no_db:
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            for name, result in db_cases(sizes, service, rng):
+                report(name, result)
+        finally:
+            runner.teardown_databases(old_config)
+    print("=" * 92)
+    print("build_prompt ms excludes DB time; peak KiB is the tracemalloc peak of one run.")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.write_thresholds:
+        # Floors keep sub-millisecond cases from failing on timer noise
+        thresholds = {
+            name: {
+                'max_ms': round(max(result['ms'] * args.headroom, MIN_THRESHOLD_MS), 3),
+                'max_peak_kib': round(max(result['peak_kib'] * args.headroom, MIN_THRESHOLD_KIB), 1),
+            }
+            for name, result in results.items()
+        }
+        args.thresholds.write_text(json.dumps(thresholds, indent=2, sort_keys=True) + '\n')
+        print(f"Thresholds written to {args.thresholds}")
+        return 0
+
+    if not args.thresholds.exists():
+        print(f"No thresholds file at {args.thresholds}; nothing checked.")
+        return 0
+
+    thresholds = json.loads(args.thresholds.read_text())
+    failures = []
+    for name, result in results.items():
+        limit = thresholds.get(name)
+        if limit is None:
+            continue
+        if result['ms'] > limit['max_ms']:
+            failures.append(f"{name}: {result['ms']} ms > {limit['max_ms']} ms")
+        if result['peak_kib'] > limit['max_peak_kib']:
+            failures.append(f"{name}: {result['peak_kib']} KiB > {limit['max_peak_kib']} KiB")
+
+    if failures:
+        print("Regressions over thresholds:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"All {sum(name in thresholds for name in results)} cases within thresholds.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark: trigger word detection for story card injection.
+
+Compares the legacy per-trigger regex loop against the TriggerIndex automaton
+as the number of cards grows.
+
+Usage (from the backend/ directory):
+    python benchmarks/bench_trigger_index.py
+    python benchmarks/bench_trigger_index.py --cards 100 1000 10000 --triggers 5
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add backend root to path so we can import the api package
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from api.utils.trigger_index import TriggerIndex
+
+
+def legacy_inject_triggered_cards(context_text, available_cards):
+    """The original AIService._inject_triggered_cards loop."""
+    triggered_cards = []
+    context_lower = context_text.lower()
+    for card in available_cards:
+        trigger_words_str = card.get('trigger_words', '')
+        trigger_words = [w.strip() for w in trigger_words_str.split(',') if w.strip()]
+        for trigger in trigger_words:
+            pattern = r'\b' + re.escape(trigger.lower()) + r'\b'
+            if re.search(pattern, context_lower):
+                triggered_cards.append(card)
+                break
+    return triggered_cards
+
+
+def make_word(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+
+
+def make_cards(rng, card_count, triggers_per_card):
+    return [
+        {
+            'id': i,
+            'title': f'Card {i}',
+            'card_type': 'Concept',
+            'trigger_words': ', '.join(make_word(rng) for _ in range(triggers_per_card)),
+            'full_content': 'Lorem ipsum ' * 20,
+        }
+        for i in range(card_count)
+    ]
+
+
+def make_context(rng, cards, word_count=600, hit_count=10):
+    words = [make_word(rng) for _ in range(word_count)]
+    for card in rng.sample(cards, min(hit_count, len(cards))):
+        trigger = card['trigger_words'].split(',')[0].strip()
+        words[rng.randrange(word_count)] = trigger.capitalize()
+    return ' '.join(words)
+
+
+def best_of(repeats, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[10, 100, 500, 2000, 5000, 10000])
+    parser.add_argument('--triggers', type=int, default=5, help='Trigger words per card')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print("ImaginAI - Trigger Detection Benchmark")
+    print("=" * 78)
+    print(f"{'cards':>8} {'legacy ms':>12} {'build ms':>12} {'match ms':>12} "
+          f"{'build+match':>12} {'speedup':>9}")
+
+    for card_count in args.cards:
+        cards = make_cards(rng, card_count, args.triggers)
+        context = make_context(rng, cards)
+
+        legacy_time, expected = best_of(args.repeats, lambda: legacy_inject_triggered_cards(context, cards))
+        build_time, index = best_of(args.repeats, lambda: TriggerIndex.from_cards(cards))
+        match_time, triggered = best_of(args.repeats, lambda: index.match(context, cards))
+
+        if triggered != expected:
+            print(f"   ✗ Result mismatch at {card_count} cards")
+            return 1
+
+        total = build_time + match_time
+        print(f"{card_count:>8} {legacy_time * 1000:>12.2f} {build_time * 1000:>12.2f} "
+              f"{match_time * 1000:>12.2f} {total * 1000:>12.2f} {legacy_time / total:>8.1f}x")
+
+    print("=" * 78)
+    print("build+match is the cost without index caching; match alone is the cached cost.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Local stand-in for rotator_library.RotatingClient, for load tests.
+
+Answers completions without network access or API keys, with configurable
+latency, output token rate, streaming chunk cadence and error injection, so
+the backend's own overhead can be measured under concurrency.
+
+Inject it into a running server through api.dependencies:
+    ROTATING_CLIENT_CLASS=benchmarks.fake_provider.FakeRotatingClient python manage.py runserver
+
+Options are read from FAKE_PROVIDER_* environment variables when not passed
+(e.g. FAKE_PROVIDER_LATENCY=0.5, FAKE_PROVIDER_ERROR_RATE=0.01).
+"""
+
+import asyncio
+import os
+import random
+from types import SimpleNamespace
+from typing import Optional
+
+
+class FakeProviderError(Exception):
+    """Injected upstream failure."""
+
+
+def _option(value, name: str, default: float) -> float:
+    if value is not None:
+        return value
+    return float(os.environ.get(f'FAKE_PROVIDER_{name}', default))
+
+
+class FakeRotatingClient:
+    """RotatingClient look-alike with simulated provider timing."""
+
+    def __init__(
+        self,
+        latency: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        output_tokens: Optional[int] = None,
+        chunk_tokens: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            latency: Seconds before the first output token
+            tokens_per_second: Output token rate after the first token
+            output_tokens: Tokens per response (capped by max_tokens)
+            chunk_tokens: Tokens per streamed chunk
+            error_rate: Fraction of calls failing with FakeProviderError
+            seed: Random seed for error injection
+        """
+        self.latency = _option(latency, 'LATENCY', 0.2)
+        self.tokens_per_second = _option(tokens_per_second, 'TOKENS_PER_SECOND', 100)
+        self.output_tokens = int(_option(output_tokens, 'OUTPUT_TOKENS', 120))
+        self.chunk_tokens = max(int(_option(chunk_tokens, 'CHUNK_TOKENS', 4)), 1)
+        self.error_rate = _option(error_rate, 'ERROR_RATE', 0.0)
+        self._random = random.Random(seed)
+
+        self.api_keys = {'fake': ['fake-key']}
+        self.calls = 0
+        self.errors = 0
+
+    async def acompletion(self, model: str, messages: list, stream: bool = False, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeProviderError(f"Injected failure for {model}")
+
+        token_count = min(self.output_tokens, kwargs.get('max_tokens') or self.output_tokens)
+        usage = {
+            'prompt_tokens': self.token_count(model=model, messages=messages),
+            'completion_tokens': token_count,
+        }
+        if stream:
+            return self._stream(token_count, usage)
+
+        await asyncio.sleep(token_count / self.tokens_per_second)
+        return {
+            'model': model,
+            'choices': [{'message': {'role': 'assistant', 'content': self._text(token_count)}}],
+            'usage': usage,
+        }
+
+    async def _stream(self, token_count: int, usage: dict):
+        sent = 0
+        while sent < token_count:
+            size = min(self.chunk_tokens, token_count - sent)
+            sent += size
+            delta = SimpleNamespace(content=self._text(size))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            await asyncio.sleep(size / self.tokens_per_second)
+        # Providers report usage on the final chunk
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(**usage))
+
+    @staticmethod
+    def _text(token_count: int) -> str:
+        return 'word ' * token_count
+
+    def token_count(self, model: str, text: Optional[str] = None, messages: Optional[list] = None) -> int:
+        """Rough count of 4 characters per token."""
+        if messages is not None:
+            text = ' '.join(str(message.get('content') or '') for message in messages)
+        return len(text or '') // 4
+
+    async def get_available_models(self, provider: str) -> list:
+        return [f'{provider}/fake-model']
+
+    async def get_all_available_models(self, grouped: bool = True):
+        models = {provider: await self.get_available_models(provider) for provider in self.api_keys}
+        return models if grouped else [model for group in models.values() for model in group]
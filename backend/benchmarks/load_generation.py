@@ -0,0 +1,334 @@
+"""
+Load test: concurrent adventures through the generation endpoints.
+
+Runs N adventures concurrently, each playing a number of turns through
+/generate-ai-response/, /continue-ai/ and /stream/ (in turn), against a
+throwaway test database created from the configured DATABASES setting.
+Requests are sent in-process to the project's ASGI application
+(imaginai_backend.asgi.application), so each one is handled as under an ASGI
+server, in its own thread-sensitive context. The
+LLM is replaced by benchmarks.fake_provider.FakeRotatingClient (injected via
+api.dependencies), so no API keys are used and provider timing is controlled.
+
+Reports p50/p99 latency per endpoint, time to first SSE chunk, requests/sec and
+DB queries per turn, and saves the results as JSON for comparing runs.
+
+Usage (from the backend/ directory):
+    python benchmarks/load_generation.py
+    python benchmarks/load_generation.py --adventures 50 --turns 6 --latency 0.5
+    python benchmarks/load_generation.py --output run.json --compare previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend root to path so we can import the project
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imaginai_backend.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.runner import DiscoverRunner
+from rest_framework.test import APIClient
+
+from api.dependencies import set_rotating_client
+from api.models import Card, Scenario
+from api.services.usage_recorder import usage_recorder
+from benchmarks.fake_provider import FakeRotatingClient
+from imaginai_backend.asgi import application
+
+ENDPOINTS = {
+    'generate': 'generate-ai-response/',
+    'continue': 'continue-ai/',
+    'stream': 'stream/',
+}
+MODEL = 'gemini/gemini-1.5-flash'
+
+
+class QueryCounter:
+    """Counts SQL queries on every database connection, in any thread."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        connection.execute_wrappers.append(self)
+        # Connections opened later (other threads) get the wrapper as well
+        connection_created.connect(self._on_connection_created, weak=False)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def summarize(latencies):
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def asgi_post(path, data, on_body=None):
+    """
+    POST JSON through the ASGI application.
+
+    Args:
+        on_body: Called with each response body chunk as it is sent
+
+    Returns:
+        The response status code
+    """
+    body = json.dumps(data).encode()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'client': ('127.0.0.1', 1), 'server': ('testserver', 80),
+        'headers': [
+            (b'host', b'testserver'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # The client stays connected until the response is complete
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body') and on_body:
+            on_body(message['body'])
+
+    await application(scope, receive, send)
+    return status
+
+
+async def play_turn(adventure_id, endpoint, turn, samples):
+    url = f'/api/adventures/{adventure_id}/{ENDPOINTS[endpoint]}'
+    data = {'selected_model': MODEL, 'max_tokens': 200}
+    if endpoint != 'continue':
+        data['text'] = f'I look around ({turn})'
+
+    first_chunk = None
+    errors = False
+
+    def on_body(part):
+        nonlocal first_chunk, errors
+        if first_chunk is None and b'"chunk"' in part:
+            first_chunk = time.perf_counter() - start
+        if b'"error"' in part:
+            errors = True
+
+    start = time.perf_counter()
+    status = await asgi_post(url, data, on_body if endpoint == 'stream' else None)
+
+    samples.append({
+        'endpoint': endpoint,
+        'latency': time.perf_counter() - start,
+        'first_chunk': first_chunk,
+        'ok': status in (200, 201) and not errors,
+    })
+
+
+async def play_adventure(adventure_id, endpoints, turns, samples):
+    for turn in range(turns):
+        await play_turn(adventure_id, endpoints[turn % len(endpoints)], turn, samples)
+
+
+def start_adventures(count, card_count):
+    scenario = Scenario.objects.create(
+        name='Load test', instructions='Narrate the story.', openingScene='You wake up.',
+        playerDescription='A traveller'
+    )
+    Card.objects.bulk_create([
+        Card(scenario=scenario, title=f'Card {i}', card_type='Concept',
+             trigger_words=f'word{i}, look', short_description='s', full_content='Lore ' * 40)
+        for i in range(card_count)
+    ])
+    client = APIClient()
+    return [
+        client.post('/api/adventures/start/', {'scenario_id': scenario.pk}, format='json').json()['id']
+        for _ in range(count)
+    ]
+
+
+def run(args):
+    provider = FakeRotatingClient(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    set_rotating_client(provider)
+
+    adventure_ids = start_adventures(args.adventures, args.cards)
+
+    counter = QueryCounter()
+    counter.install()
+    samples = []
+
+    async def drive():
+        await asyncio.gather(*(
+            play_adventure(adventure_id, args.endpoints, args.turns, samples)
+            for adventure_id in adventure_ids
+        ))
+        # Release the connections of the ORM's worker thread before teardown
+        await sync_to_async(connections.close_all)()
+
+    start = time.perf_counter()
+    asyncio.run(drive())
+    elapsed = time.perf_counter() - start
+    # Token accounting writes belong to the turns as well
+    usage_recorder.drain(timeout=30)
+
+    succeeded = [sample for sample in samples if sample['ok']]
+    return {
+        'label': args.label,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'config': {
+            'adventures': args.adventures,
+            'turns': args.turns,
+            'endpoints': args.endpoints,
+            'cards': args.cards,
+            'latency': provider.latency,
+            'tokens_per_second': provider.tokens_per_second,
+            'output_tokens': provider.output_tokens,
+            'chunk_tokens': provider.chunk_tokens,
+            'error_rate': provider.error_rate,
+        },
+        'results': {
+            'requests': len(samples),
+            'errors': len(samples) - len(succeeded),
+            'provider_calls': provider.calls,
+            'provider_errors': provider.errors,
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(len(samples) / elapsed, 2) if elapsed else None,
+            'db_queries_per_turn': round(counter.count / len(succeeded), 2) if succeeded else None,
+            'latency': {
+                endpoint: summarize([s['latency'] for s in succeeded if s['endpoint'] == endpoint])
+                for endpoint in args.endpoints
+            },
+            'stream_first_chunk': summarize(
+                [s['first_chunk'] for s in succeeded if s['first_chunk'] is not None]
+            ),
+        },
+    }
+
+
+def print_report(report, previous=None):
+    results = report['results']
+    old = previous['results'] if previous else {}
+
+    def delta(value, old_value):
+        if old_value in (None, 0) or value is None:
+            return ''
+        return f" ({(value - old_value) / old_value:+.1%})"
+
+    print("ImaginAI - Generation Load Test")
+    print("=" * 78)
+    print(f"{report['config']['adventures']} adventures x {report['config']['turns']} turns, "
+          f"provider latency {report['config']['latency']}s, "
+          f"{report['config']['tokens_per_second']} tokens/s")
+    print(f"requests: {results['requests']}  errors: {results['errors']}  "
+          f"elapsed: {results['elapsed_s']}s")
+    print(f"requests/s: {results['requests_per_s']}{delta(results['requests_per_s'], old.get('requests_per_s'))}")
+    print(f"DB queries/turn: {results['db_queries_per_turn']}"
+          f"{delta(results['db_queries_per_turn'], old.get('db_queries_per_turn'))}")
+    print(f"{'endpoint':<20} {'count':>6} {'p50 ms':>16} {'p99 ms':>16}")
+    rows = dict(results['latency'], **{'stream first chunk': results['stream_first_chunk']})
+    old_rows = dict(old.get('latency', {}), **{'stream first chunk': old.get('stream_first_chunk', {})})
+    for name, row in rows.items():
+        old_row = old_rows.get(name) or {}
+        p50 = f"{row['p50_ms']}{delta(row['p50_ms'], old_row.get('p50_ms'))}"
+        p99 = f"{row['p99_ms']}{delta(row['p99_ms'], old_row.get('p99_ms'))}"
+        print(f"{name:<20} {row['count']:>6} {p50:>16} {p99:>16}")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--adventures', type=int, default=20, help='Concurrent adventures')
+    parser.add_argument('--turns', type=int, default=6, help='Turns played per adventure')
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS),
+                        help='Endpoints used in turn, in this order')
+    parser.add_argument('--cards', type=int, default=50, help='Story cards in the scenario')
+    parser.add_argument('--latency', type=float, default=0.2, help='Provider seconds to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=100, help='Provider output token rate')
+    parser.add_argument('--output-tokens', type=int, default=120, help='Tokens per response')
+    parser.add_argument('--chunk-tokens', type=int, default=4, help='Tokens per streamed chunk')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of failing provider calls')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for error injection')
+    parser.add_argument('--label', default='', help='Free-form label stored with the results')
+    parser.add_argument('--output', type=Path, help='JSON file for the results')
+    parser.add_argument('--compare', type=Path, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    # The endpoints are called in-process; accept the in-process host
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        report = run(args)
+    finally:
+        runner.teardown_databases(old_config)
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(report, previous)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
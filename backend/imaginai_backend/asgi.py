@@ -2,6 +2,8 @@
 ASGI config for imaginai_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The Django application is wrapped in api.lifespan.LifespanApp, which warms
+the AIService at server startup and drains it at shutdown.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imaginai_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.lifespan import LifespanApp  # noqa: E402  (needs the app registry set up above)
+
+application = LifespanApp(django_application)
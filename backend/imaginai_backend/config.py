@@ -23,6 +23,11 @@ MODELS_WITH_EXPLICIT_THINKING_CONTROL = [
 DEFAULT_NON_THINKING_MODEL = 'gemma-3-27b-it'
 DEFAULT_THINKING_MODEL = 'gemini-2.5-flash-preview-05-20'
 
+# Generation defaults when neither the request nor GlobalSettings provide them
+# (the model must be provider-qualified for RotatingClient)
+DEFAULT_GENERATION_MODEL = 'gemini/gemini-1.5-flash'
+DEFAULT_MAX_OUTPUT_TOKENS = 200
+
 # Base System Instruction
 BASE_SYSTEM_INSTRUCTION = """You are an expert storyteller. Your primary goal is to seamlessly continue the narrative from the exact point where the previous turn left off. If a sentence ends with an open quotation mark (e.g., 'He said, "') or appears incomplete, you MUST continue that sentence directly, filling in the dialogue or completing the thought as if you are picking up mid-stream. Do not repeat the preceding text. Directly address and incorporate the player's latest action. Maintain strict consistency with the established tone, context, characters, and all prior events in the story."""
 
@@ -37,6 +42,19 @@ MODEL_CONTEXT_WINDOWS = {
 }
 DEFAULT_MAX_CONTEXT_TOKENS = 30720 # A general fallback if model specific is not listed
 
+# Tokenizer families, matched by prefix of the bare model name (provider prefix stripped).
+# Models sharing a tokenizer share memoized per-turn token counts; unknown models
+# fall back to their own bare name as the family.
+TOKENIZER_FAMILY_PREFIXES = [
+    ('gemini-', 'gemini'),
+    ('gemma-3', 'gemma3'),
+    ('gemma-', 'gemma'),
+    ('gpt-4o', 'o200k'),
+    ('gpt-4', 'cl100k'),
+    ('gpt-3.5', 'cl100k'),
+    ('claude-', 'claude'),
+]
+
 # Colors for token usage statistics visualization (ported from frontend)
 TOKEN_STATS_MODAL_COLORS = {
     'preciseSystemInstructionBlockTokens': '#1f77b4', # Muted Blue (For full Gemma prompt or Base for others)
@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from imaginai_backend.config import DEFAULT_GENERATION_MODEL
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.ServerTimingMiddleware',  # Request timing (REQUEST_TIMING_ENABLED), outermost to include the rest
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware - must be before CommonMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,6 +117,99 @@ CACHES = {
     }
 }
 
+# Compiled trigger index cache (story card injection)
+# Process-local LRU size, plus an optional shared tier in CACHES['default']
+TRIGGER_INDEX_CACHE_SIZE = int(os.environ.get('TRIGGER_INDEX_CACHE_SIZE', '256'))
+TRIGGER_INDEX_CACHE_SHARED = os.environ.get('TRIGGER_INDEX_CACHE_SHARED', 'False').lower() in ('true', '1', 'yes')
+TRIGGER_INDEX_CACHE_TIMEOUT = int(os.environ.get('TRIGGER_INDEX_CACHE_TIMEOUT', '3600'))
+
+# Token usage accounting (TokenUsageStats), written in the background after each turn
+# Fraction of turns that are accounted; lower it for high-traffic deployments
+TOKEN_USAGE_SAMPLE_RATE = float(os.environ.get('TOKEN_USAGE_SAMPLE_RATE', '1.0'))
+# Also store the full prompt in TokenUsageStats.prompt_payload (large)
+TOKEN_USAGE_STORE_PROMPT = os.environ.get('TOKEN_USAGE_STORE_PROMPT', 'False').lower() in ('true', '1', 'yes')
+
+# Available-models catalog (GET /api/models/), cached per process
+# Seconds before the catalog is revalidated in the background (stale-while-revalidate)
+MODEL_CATALOG_TTL = int(os.environ.get('MODEL_CATALOG_TTL', '300'))
+# Seconds to wait for one provider's model list before serving its last known list
+MODEL_CATALOG_PROVIDER_TIMEOUT = float(os.environ.get('MODEL_CATALOG_PROVIDER_TIMEOUT', '10'))
+
+# GlobalSettings are cached per process; seconds between checks for updates made by other workers
+GLOBAL_SETTINGS_CHECK_INTERVAL = float(os.environ.get('GLOBAL_SETTINGS_CHECK_INTERVAL', '2'))
+
+# Completion response cache (CACHES['default']), opt-in: identical requests with
+# temperature 0 or allow_cached=true are answered without calling the provider
+COMPLETION_CACHE_ENABLED = os.environ.get('COMPLETION_CACHE_ENABLED', 'False').lower() in ('true', '1', 'yes')
+COMPLETION_CACHE_TIMEOUT = int(os.environ.get('COMPLETION_CACHE_TIMEOUT', '3600'))
+# Larger responses are not cached
+COMPLETION_CACHE_MAX_BYTES = int(os.environ.get('COMPLETION_CACHE_MAX_BYTES', '262144'))
+
+# Prompt prefix caching: providers that get explicit cache_control breakpoints
+# (others cache stable prefixes automatically), and adventures tracked per
+# process for the prefix hit ratio
+PROMPT_CACHE_HINT_PROVIDERS = tuple(
+    provider.strip()
+    for provider in os.environ.get('PROMPT_CACHE_HINT_PROVIDERS', 'anthropic').split(',')
+    if provider.strip()
+)
+PROMPT_PREFIX_TRACKER_SIZE = int(os.environ.get('PROMPT_PREFIX_TRACKER_SIZE', '1024'))
+
+# Default card storage for new adventures: 'snapshot' (cards in scenarioSnapshot JSON)
+# or 'table' (AdventureCard rows; generation only loads full_content of triggered cards)
+# or 'shared' (content-addressed SnapshotBlob shared between adventures, plus per-adventure edits)
+ADVENTURE_CARD_STORAGE = os.environ.get('ADVENTURE_CARD_STORAGE', 'snapshot')
+# Shared card blobs: blobs kept parsed in memory per process, and seconds a
+# scenario's blob hash is remembered for its card fingerprint
+SNAPSHOT_BLOB_CACHE_SIZE = int(os.environ.get('SNAPSHOT_BLOB_CACHE_SIZE', '32'))
+SNAPSHOT_BLOB_SCENARIO_TIMEOUT = int(os.environ.get('SNAPSHOT_BLOB_SCENARIO_TIMEOUT', '86400'))
+
+# Per-adventure generation lock: generations on one adventure run one at a time.
+# Set ADVENTURE_LOCK_DISTRIBUTED with several worker processes so the lock is
+# also held in CACHES['default']; the TTL must exceed the longest generation
+ADVENTURE_LOCK_DISTRIBUTED = os.environ.get('ADVENTURE_LOCK_DISTRIBUTED', 'False').lower() in ('true', '1', 'yes')
+ADVENTURE_LOCK_WAIT = float(os.environ.get('ADVENTURE_LOCK_WAIT', '30'))
+ADVENTURE_LOCK_TTL = int(os.environ.get('ADVENTURE_LOCK_TTL', '300'))
+
+# Resumable SSE streams: events kept per stream in CACHES['default'] for clients
+# reconnecting with Last-Event-ID, and seconds kept after the last event
+STREAM_BUFFER_MAX_EVENTS = int(os.environ.get('STREAM_BUFFER_MAX_EVENTS', '2000'))
+STREAM_BUFFER_TTL = int(os.environ.get('STREAM_BUFFER_TTL', '600'))
+
+# LLM client class (dotted path); benchmarks.fake_provider.FakeRotatingClient
+# serves simulated completions for load tests without API keys
+ROTATING_CLIENT_CLASS = os.environ.get('ROTATING_CLIENT_CLASS', 'rotator_library.RotatingClient')
+
+# AIService lifecycle under ASGI (api.lifespan): seconds allowed per warm-up
+# step at startup, and seconds in-flight generations get to finish at shutdown
+AI_SERVICE_WARMUP_TIMEOUT = float(os.environ.get('AI_SERVICE_WARMUP_TIMEOUT', '10'))
+AI_SERVICE_DRAIN_TIMEOUT = float(os.environ.get('AI_SERVICE_DRAIN_TIMEOUT', '30'))
+
+# Request timing: stage durations of each request (lock wait, prompt assembly,
+# LLM call, turn writes, SQL) as Server-Timing headers and for the sinks below.
+# Off by default; when off, the instrumentation is a no-op
+REQUEST_TIMING_ENABLED = os.environ.get('REQUEST_TIMING_ENABLED', 'False').lower() in ('true', '1', 'yes')
+# Send the Server-Timing header (it shows internal timings to clients)
+REQUEST_TIMING_HEADER = os.environ.get('REQUEST_TIMING_HEADER', 'True').lower() in ('true', '1', 'yes')
+# Sinks receiving each finished timing (dotted paths): LogSink writes a log line,
+# HistogramSink keeps histograms per endpoint and model, served at /metrics
+REQUEST_TIMING_SINKS = tuple(
+    sink.strip()
+    for sink in os.environ.get(
+        'REQUEST_TIMING_SINKS',
+        'api.services.request_timing.LogSink,api.services.request_timing.HistogramSink'
+    ).split(',')
+    if sink.strip()
+)
+
+# Models reported by name in /metrics labels in addition to those in the model
+# catalog; others are reported by provider (bounds the number of series)
+METRICS_MODEL_LABELS = tuple(
+    model.strip()
+    for model in os.environ.get('METRICS_MODEL_LABELS', DEFAULT_GENERATION_MODEL).split(',')
+    if model.strip()
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
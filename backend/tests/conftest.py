@@ -0,0 +1,49 @@
+"""
+Pytest configuration for backend tests.
+
+Django-backed tests need the full backend environment (settings, database,
+rotator_library) and pytest-django. When that is not available, only the
+standalone test modules are collected.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add backend root to path so we can import the api package
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+# Test modules that run without Django
+STANDALONE_TEST_MODULES = {
+    'test_coalescing.py',
+    'test_json_stream.py',
+    'test_keyed_lock.py',
+    'test_metrics.py',
+    'test_rotator_import.py',
+    'test_timing.py',
+    'test_trigger_index.py',
+}
+
+_settings_from_env = 'DJANGO_SETTINGS_MODULE' in os.environ
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imaginai_backend.settings')
+
+try:
+    import pytest_django  # noqa: F401
+    import django
+    django.setup()
+    DJANGO_AVAILABLE = True
+except Exception:
+    DJANGO_AVAILABLE = False
+    # Keep pytest-django from configuring Django for the standalone tests
+    if not _settings_from_env:
+        os.environ.pop('DJANGO_SETTINGS_MODULE', None)
+
+
+def pytest_ignore_collect(collection_path, config):
+    if DJANGO_AVAILABLE or collection_path.suffix != '.py':
+        return None
+    if collection_path.name.startswith('test_') and collection_path.name not in STANDALONE_TEST_MODULES:
+        return True
+    return None
@@ -0,0 +1,281 @@
+"""Query-count regression tests for adventure endpoints and turn persistence."""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Adventure, AdventureTurn, Scenario, TokenUsageStats
+from api.services.adventure_cards import card_editor_for, create_adventure_cards, list_adventure_cards
+from api.services.ai_service import AIService
+from api.services.snapshot_blobs import blob_for_cards
+from api.services.turn_ordering import append_turns
+
+
+class AdventureQueryCountTests(TestCase):
+    """Query counts must not grow with the number of adventures or turns."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.scenario = Scenario.objects.create(
+            name='Scenario',
+            instructions='Instructions',
+            openingScene='Opening',
+            playerDescription='Player'
+        )
+    
+    def create_adventures(self, adventure_count, turn_count):
+        adventures = []
+        for i in range(adventure_count):
+            adventure = Adventure.objects.create(
+                sourceScenario=self.scenario,
+                sourceScenarioName=self.scenario.name,
+                adventureName=f'Adventure {i}',
+                scenarioSnapshot={'cards': []}
+            )
+            for j in range(turn_count):
+                AdventureTurn.objects.create(
+                    adventure=adventure,
+                    role='user' if j % 2 else 'model',
+                    text=f'Turn {j}',
+                    token_usage=TokenUsageStats.objects.create(model_used='test-model')
+                )
+            adventures.append(adventure)
+        return adventures
+    
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+    
+    def test_list_query_count_is_constant(self):
+        self.create_adventures(2, 2)
+        small_count, response = self.count_queries('/api/adventures/')
+        self.assertNotIn('adventureHistory', response.json()['results'][0])
+        
+        self.create_adventures(10, 10)
+        large_count, _ = self.count_queries('/api/adventures/')
+        self.assertEqual(small_count, large_count)
+    
+    def test_detail_query_count_is_constant(self):
+        small, = self.create_adventures(1, 2)
+        large, = self.create_adventures(1, 40)
+        
+        small_count, _ = self.count_queries(f'/api/adventures/{small.pk}/')
+        large_count, response = self.count_queries(f'/api/adventures/{large.pk}/')
+        self.assertEqual(len(response.json()['adventureHistory']), 40)
+        self.assertEqual(small_count, large_count)
+    
+    def test_turns_endpoint_paginates_with_constant_queries(self):
+        adventure, = self.create_adventures(1, 30)
+        
+        query_count, response = self.count_queries(
+            f'/api/adventures/{adventure.pk}/turns/?page_size=10'
+        )
+        page = response.json()
+        self.assertEqual([turn['text'] for turn in page['results']], [f'Turn {j}' for j in range(10)])
+        
+        next_count, response = self.count_queries(page['next'])
+        self.assertEqual([turn['text'] for turn in response.json()['results']], [f'Turn {j}' for j in range(10, 20)])
+        self.assertEqual(query_count, next_count)
+        
+        _, response = self.count_queries(
+            f'/api/adventures/{adventure.pk}/turns/?page_size=5&order=newest'
+        )
+        self.assertEqual(response.json()['results'][0]['text'], 'Turn 29')
+
+
+class FakeRotatingClient:
+    """Answers every completion with a fixed text, or fails if asked to."""
+    
+    def __init__(self, fail=False):
+        self.fail = fail
+    
+    async def acompletion(self, model, messages, **kwargs):
+        if self.fail:
+            raise RuntimeError('Provider unavailable')
+        return {'choices': [{'message': {'content': 'You see a door.'}}]}
+    
+    def token_count(self, model, text=None, messages=None):
+        return sum(len(message['content'].split()) for message in messages or [])
+
+
+class TurnPersistenceQueryTests(TestCase):
+    """A generated turn is saved with a fixed number of write queries, atomically."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        scenario = Scenario.objects.create(
+            name='Scenario',
+            instructions='Instructions',
+            openingScene='Opening',
+            playerDescription='Player'
+        )
+        self.adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot={'cards': []}
+        )
+        patcher = mock.patch.object(AIService, 'record_turn_usage')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def generate(self, rotating_client):
+        with mock.patch(
+            'api.views.adventure_views.get_ai_service',
+            return_value=AIService(rotating_client)
+        ):
+            return self.client.post(
+                f'/api/adventures/{self.adventure.pk}/generate-ai-response/',
+                {'text': 'Look around', 'selected_model': 'gemini/gemini-1.5-flash'},
+                format='json'
+            )
+    
+    def test_append_turns_uses_one_update_and_one_insert(self):
+        turns = [
+            AdventureTurn(role='user', text='Look around', actionType='do'),
+            AdventureTurn(role='model', text='You see a door.', actionType='story'),
+        ]
+        last_played_at = self.adventure.lastPlayedAt
+        # Savepoint, UPDATE (sequence and lastPlayedAt), SELECT, INSERT, release
+        with self.assertNumQueries(5):
+            saved = append_turns(self.adventure.pk, turns)
+        
+        self.assertEqual([turn.sequence for turn in saved], [1, 2])
+        self.adventure.refresh_from_db()
+        self.assertEqual(self.adventure.turnSequence, 2)
+        self.assertGreater(self.adventure.lastPlayedAt, last_played_at)
+    
+    def test_generation_writes_turns_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.generate(FakeRotatingClient())
+        self.assertEqual(response.status_code, 201)
+        
+        writes = [
+            query['sql'].split(' ', 2)[:2] for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(writes, [['UPDATE', '"api_adventure"'], ['INSERT', 'INTO']])
+        self.assertEqual(
+            list(self.adventure.adventureHistory.values_list('sequence', 'role')),
+            [(1, 'user'), (2, 'model')]
+        )
+    
+    def test_failed_generation_leaves_no_user_turn(self):
+        response = self.generate(FakeRotatingClient(fail=True))
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(self.adventure.adventureHistory.exists())
+
+
+class AdventureDuplicateTests(TestCase):
+    """Duplicating copies turns in bulk, with their order, timestamps and cards."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.scenario = Scenario.objects.create(
+            name='Scenario',
+            instructions='Instructions',
+            openingScene='Opening',
+            playerDescription='Player'
+        )
+        self.cards = [{'id': i, 'title': f'Card {i}', 'trigger_words': f'word{i}'} for i in range(3)]
+    
+    def create_adventure(self, turn_count, card_storage='snapshot'):
+        snapshot = {'name': 'Scenario'}
+        if card_storage == 'snapshot':
+            snapshot['cards'] = self.cards
+        adventure = Adventure.objects.create(
+            sourceScenario=self.scenario,
+            sourceScenarioName=self.scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot=snapshot,
+            cardStorage=card_storage,
+            snapshotBlob=blob_for_cards(self.cards) if card_storage == 'shared' else None,
+            turnSequence=turn_count * 3
+        )
+        if card_storage == 'table':
+            create_adventure_cards(adventure, self.cards)
+        started = timezone.now() - timedelta(days=1)
+        for j in range(turn_count):
+            AdventureTurn.objects.create(
+                adventure=adventure,
+                role='user' if j % 2 else 'model',
+                text=f'Turn {j}',
+                # Gaps, as left by deleted turns
+                sequence=(j + 1) * 3,
+                timestamp=started + timedelta(minutes=j),
+                token_usage=TokenUsageStats.objects.create(model_used='test-model', api_reported_output_tokens=j)
+            )
+        return adventure
+    
+    def duplicate(self, adventure, **data):
+        response = self.client.post(f'/api/adventures/{adventure.pk}/duplicate/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Adventure.objects.get(pk=response.json()['id'])
+    
+    def test_turns_keep_sequence_and_timestamp(self):
+        adventure = self.create_adventure(4)
+        
+        copy = self.duplicate(adventure)
+        
+        fields = ('sequence', 'timestamp', 'role', 'text')
+        self.assertEqual(
+            list(copy.adventureHistory.values_list(*fields)),
+            list(adventure.adventureHistory.values_list(*fields))
+        )
+        self.assertEqual(copy.turnSequence, adventure.turnSequence)
+        self.assertEqual(copy.adventureName, 'Adventure (Copy)')
+    
+    def test_cards_are_copied_in_every_storage_mode(self):
+        for card_storage in ('snapshot', 'table', 'shared'):
+            with self.subTest(card_storage=card_storage):
+                adventure = self.create_adventure(1, card_storage)
+                if card_storage != 'snapshot':
+                    card_editor_for(adventure).edit(1, {'title': 'Edited'})
+                    adventure.refresh_from_db()
+                
+                copy = self.duplicate(adventure)
+                
+                self.assertEqual(copy.cardStorage, card_storage)
+                self.assertEqual(list_adventure_cards(copy), list_adventure_cards(adventure))
+                if card_storage == 'shared':
+                    # The blob is shared, not copied
+                    self.assertEqual(copy.snapshotBlob_id, adventure.snapshotBlob_id)
+                # Edits of the copy leave the original alone
+                card_editor_for(copy).edit(0, {'title': 'Copy only'})
+                self.assertEqual(list_adventure_cards(adventure)[0]['title'], 'Card 0')
+    
+    def test_token_usage_is_copied_only_when_asked(self):
+        adventure = self.create_adventure(3)
+        
+        for value in (False, 'false', '0', None):
+            with self.subTest(copy_token_usage=value):
+                data = {} if value is None else {'copy_token_usage': value}
+                copy = self.duplicate(adventure, **data)
+                self.assertFalse(copy.adventureHistory.filter(token_usage__isnull=False).exists())
+        
+        for value in (True, 'true', '1'):
+            with self.subTest(copy_token_usage=value):
+                copy = self.duplicate(adventure, copy_token_usage=value)
+                turns = list(copy.adventureHistory.select_related('token_usage'))
+                self.assertEqual([turn.token_usage.api_reported_output_tokens for turn in turns], [0, 1, 2])
+                # Copies of the stats, not shared rows
+                original_ids = set(adventure.adventureHistory.values_list('token_usage_id', flat=True))
+                self.assertFalse(original_ids & {turn.token_usage_id for turn in turns})
+    
+    def test_query_count_is_constant(self):
+        small = self.create_adventure(2)
+        large = self.create_adventure(40)
+        
+        counts = []
+        for adventure in (small, large):
+            with CaptureQueriesContext(connection) as context:
+                self.duplicate(adventure, copy_token_usage=True)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,85 @@
+"""Tests for streaming AI Dungeon story card exports."""
+
+import asyncio
+import gzip
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TransactionTestCase
+
+from api.models import Card, Scenario
+from api.utils import AIDTranslator
+from api.views import scenario_views
+from imaginai_backend.asgi import application
+
+
+async def asgi_get(path, query_string, on_body):
+    """GET through the ASGI application; on_body(chunk) is called as each body message is sent."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query_string,
+        'root_path': '', 'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 1), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            on_body(message['body'])
+
+    await application(scope, receive, send)
+    return status
+
+
+class AIDStreamingExportTests(TransactionTestCase):
+
+    def setUp(self):
+        self.scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        Card.objects.bulk_create([
+            Card(scenario=self.scenario, title=f'Card {i}', card_type='Concept',
+                 trigger_words=f'key{i}', full_content=f'Value {i}')
+            for i in range(7)
+        ])
+        self.path = f'/api/scenarios/{self.scenario.pk}/export-cards-aid/'
+
+    def test_asgi_export_sends_each_page_as_it_is_read(self):
+        encoded = []
+        body = []
+
+        def on_body(chunk):
+            # Cards encoded by the time this chunk is sent
+            body.append((chunk, len(encoded)))
+
+        aid_card_from_values = AIDTranslator.aid_card_from_values
+
+        def encode(values):
+            encoded.append(values)
+            return aid_card_from_values(values)
+
+        with mock.patch.object(scenario_views, 'BULK_BATCH_SIZE', 3), \
+                mock.patch.object(AIDTranslator, 'aid_card_from_values', staticmethod(encode)):
+            status = async_to_sync(asgi_get)(self.path, b'stream=true', on_body)
+
+        self.assertEqual(status, 200)
+        # Opening bracket, three pages of at most 3 cards, metadata
+        self.assertEqual([count for _, count in body], [0, 3, 6, 7, 7])
+        document = json.loads(b''.join(chunk for chunk, _ in body))
+        self.assertEqual(document['cards'], AIDTranslator.export_to_aid(self.scenario)['cards'])
+
+    def test_asgi_export_gzip(self):
+        body = []
+        status = async_to_sync(asgi_get)(self.path, b'stream=true&gzip=true', body.append)
+
+        self.assertEqual(status, 200)
+        document = json.loads(gzip.decompress(b''.join(body)))
+        self.assertEqual([card['title'] for card in document['cards']], [f'Card {i}' for i in range(7)])
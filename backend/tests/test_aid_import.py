@@ -0,0 +1,73 @@
+"""Tests for AI Dungeon story card imports."""
+
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Card, Scenario
+from api.views import scenario_views
+
+
+def aid_card(i, **fields):
+    return {'keys': f'key{i}', 'value': f'Value {i}', 'type': 'Concept', 'title': f'Card {i}', **fields}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AIDImportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        self.url = f'/api/scenarios/{self.scenario.pk}/import-cards-aid/'
+
+    def post_stream(self, cards):
+        return self.client.post(
+            f'{self.url}?stream=true', data=json.dumps({'cards': cards}), content_type='application/json'
+        )
+
+    def test_non_string_description_is_rejected(self):
+        cards = [aid_card(0, description='A card'), aid_card(1, description={'a': 1}), aid_card(2, description=None)]
+
+        response = self.post_stream(cards)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['imported'], 2)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'error': "Field 'description' must be a string"}])
+        self.assertEqual(
+            sorted(Card.objects.values_list('short_description', flat=True)), ['', 'A card']
+        )
+
+        response = self.client.post(self.url, data={'cards': cards}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_progress_is_reported_per_batch(self):
+        progress_url = f'/api/scenarios/{self.scenario.pk}/import-cards-aid-progress/'
+        self.assertEqual(self.client.get(progress_url).status_code, 404)
+
+        cards = [aid_card(i) for i in range(5)] + [aid_card(5, title=7)]
+        with mock.patch.object(scenario_views, 'BULK_BATCH_SIZE', 2), \
+                mock.patch.object(scenario_views, 'report_import_progress',
+                                  wraps=scenario_views.report_import_progress) as report:
+            self.post_stream(cards)
+
+        self.assertEqual(
+            [(call.kwargs['status'], call.kwargs['imported']) for call in report.call_args_list],
+            [('running', 0), ('running', 2), ('running', 4), ('running', 5), ('done', 5)]
+        )
+        self.assertEqual(
+            self.client.get(progress_url).json(), {'status': 'done', 'imported': 5, 'failed': 1}
+        )
+
+    def test_malformed_json_reports_failure(self):
+        response = self.client.post(
+            f'{self.url}?stream=true', data='{"cards": [{"keys": "a"', content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        progress = self.client.get(f'/api/scenarios/{self.scenario.pk}/import-cards-aid-progress/').json()
+        self.assertEqual((progress['status'], progress['imported']), ('failed', 0))
+        self.assertIn('error', progress)
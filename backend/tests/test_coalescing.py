@@ -0,0 +1,107 @@
+"""Tests for single-flight generation and stream coalescing."""
+
+import asyncio
+import threading
+
+from api.utils.coalescing import SingleFlight, StreamCoalescer, coalescing_key
+
+
+def run_in_threads(*coroutine_functions):
+    """Run each coroutine on its own thread and event loop, like WSGI requests."""
+    results = [None] * len(coroutine_functions)
+
+    def run(index, function):
+        results[index] = asyncio.run(function())
+
+    threads = [
+        threading.Thread(target=run, args=(index, function))
+        for index, function in enumerate(coroutine_functions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_coalescing_key_depends_on_adventure_and_parameters():
+    key = coalescing_key(1, 'generate', 'look', {'temperature': 0})
+    assert key == coalescing_key(1, 'generate', 'look', {'temperature': 0})
+    assert key != coalescing_key(2, 'generate', 'look', {'temperature': 0})
+    assert key != coalescing_key(1, 'generate', 'look', {'temperature': 1})
+
+
+def test_single_flight_shares_one_call_across_loops():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    async def generate():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.2)
+        return 'turn'
+
+    async def leader():
+        return await flights.do('key', generate)
+
+    async def follower():
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        return await flights.do('key', generate)
+
+    assert run_in_threads(leader, follower) == ['turn', 'turn']
+    assert len(calls) == 1
+    assert flights.stats() == {'in_flight': 0, 'leaders': 1, 'followers': 1}
+
+
+def test_followers_of_a_cancelled_leader_run_the_call_again():
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return f'turn {len(calls)}'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do('key', generate))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(flights.do('key', generate)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        try:
+            await leader
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError('the leader was not cancelled')
+        return results
+
+    # One follower took over; the others shared its result
+    assert asyncio.run(scenario()) == ['turn 2'] * 3
+    assert len(calls) == 2
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_late_stream_joiner_replays_earlier_chunks():
+    coalescer = StreamCoalescer()
+    first_chunk = threading.Event()
+
+    async def produce():
+        for index in range(4):
+            yield f'chunk {index}'
+            first_chunk.set()
+            await asyncio.sleep(0.05)
+
+    async def leader():
+        return [chunk async for chunk in coalescer.stream('key', produce)]
+
+    async def follower():
+        await asyncio.get_running_loop().run_in_executor(None, first_chunk.wait)
+        return [chunk async for chunk in coalescer.stream('key', produce)]
+
+    leader_chunks, follower_chunks = run_in_threads(leader, follower)
+    assert leader_chunks == ['chunk 0', 'chunk 1', 'chunk 2', 'chunk 3']
+    assert follower_chunks == leader_chunks
+    assert coalescer.stats()['followers'] == 1
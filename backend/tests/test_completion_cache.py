@@ -0,0 +1,72 @@
+"""Tests for the opt-in completion cache in AIService.complete."""
+
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.services.ai_service import AIService
+from api.services.completion_cache import CompletionCache
+
+
+class FakeRotatingClient:
+    """Counts upstream acompletion calls instead of calling a provider."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def acompletion(self, model, messages, **kwargs):
+        self.calls += 1
+        return {'choices': [{'message': {'content': f'Response {self.calls}'}}]}
+
+
+MESSAGES = [{'role': 'system', 'content': 'Narrate.'}, {'role': 'user', 'content': 'Look around'}]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CompletionCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = FakeRotatingClient()
+        self.service = AIService(self.client)
+        self.cache = CompletionCache(enabled=True)
+        patcher = mock.patch('api.services.ai_service.completion_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def complete(self, **kwargs):
+        response = async_to_sync(self.service.complete)('gemini/gemini-1.5-flash', MESSAGES, **kwargs)
+        return response['choices'][0]['message']['content']
+
+    def test_deterministic_requests_are_served_from_cache(self):
+        self.assertEqual(self.complete(temperature=0, max_tokens=50), 'Response 1')
+        self.assertEqual(self.complete(temperature=0, max_tokens=50), 'Response 1')
+        self.assertEqual(self.client.calls, 1)
+
+        # Different sampling parameters are a different request
+        self.complete(temperature=0, max_tokens=60)
+        self.assertEqual(self.client.calls, 2)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_reuse_requires_opt_in(self):
+        self.complete(temperature=0.8)
+        self.complete(temperature=0.8)
+        self.assertEqual(self.client.calls, 2)
+
+        self.complete(temperature=0.8, allow_cached=True)
+        self.assertEqual(self.complete(temperature=0.8, allow_cached=True), 'Response 3')
+        self.assertEqual(self.client.calls, 3)
+
+    def test_bypass_and_size_limit(self):
+        self.complete(temperature=0)
+        self.complete(temperature=0, bypass_cache=True)
+        self.assertEqual(self.client.calls, 2)
+        self.assertEqual(self.cache.stats()['bypassed'], 1)
+
+        self.cache.max_bytes = 10
+        self.complete(temperature=0, max_tokens=5)
+        self.complete(temperature=0, max_tokens=5)
+        self.assertEqual(self.client.calls, 4)
+        self.assertEqual(self.cache.stats()['too_large'], 2)
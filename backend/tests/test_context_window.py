@@ -0,0 +1,78 @@
+"""Tests for token-budgeted history selection (ContextWindowSelector)."""
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Adventure, AdventureTurn, Scenario
+from api.services.context_window import HISTORY_PAGE_SIZE, ContextWindowSelector
+
+
+def ten_tokens(turn):
+    return 10
+
+
+class ContextWindowSelectorTests(TestCase):
+
+    def setUp(self):
+        scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        self.adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot={'cards': []}
+        )
+
+    def create_turns(self, sequences):
+        """Create one turn per sequence number; returns them in chronological order."""
+        turns = AdventureTurn.objects.bulk_create([
+            AdventureTurn(adventure=self.adventure, role='user', text=f'Turn {i}', sequence=sequence)
+            for i, sequence in enumerate(sequences)
+        ])
+        return sorted(turns, key=lambda turn: (turn.sequence, turn.id))
+
+    def test_fills_budget_newest_first(self):
+        turns = self.create_turns(range(120))
+
+        window = async_to_sync(ContextWindowSelector(self.adventure, ten_tokens).select)(555)
+
+        # 55 turns of 10 tokens fit; the newest 55 are kept, in chronological order
+        self.assertEqual([turn.id for turn in window.turns], [turn.id for turn in turns[-55:]])
+        self.assertEqual(window.history_tokens, 550)
+        self.assertEqual(window.newest_dropped_turn_id, turns[-56].id)
+        self.assertEqual(window.dropped_turn_count, 65)
+        self.assertTrue(window.truncated)
+
+    def test_pages_across_tied_sequences(self):
+        # Legacy turns share sequence 0, others come in pairs; ties are ordered by id
+        sequences = [0] * 70 + [n // 2 for n in range(2, 62)]
+        turns = self.create_turns(sequences)
+
+        with CaptureQueriesContext(connection) as context:
+            window = async_to_sync(ContextWindowSelector(self.adventure, ten_tokens).select)(10_000)
+
+        self.assertEqual([turn.id for turn in window.turns], [turn.id for turn in turns])
+        self.assertFalse(window.truncated)
+        # 130 turns: two full pages and a partial one
+        self.assertEqual(len(context.captured_queries), -(-len(turns) // HISTORY_PAGE_SIZE))
+
+    def test_dropped_count_inside_a_later_page(self):
+        turns = self.create_turns([0] * 70 + [1] * 60)
+
+        window = async_to_sync(ContextWindowSelector(self.adventure, ten_tokens).select)(10 * 75)
+
+        self.assertEqual([turn.id for turn in window.turns], [turn.id for turn in turns[-75:]])
+        self.assertEqual(window.newest_dropped_turn_id, turns[-76].id)
+        self.assertEqual(window.dropped_turn_count, 55)
+
+    def test_history_before_and_recent_turns(self):
+        turns = self.create_turns(range(10))
+        selector = ContextWindowSelector(self.adventure, ten_tokens, history_before=turns[6])
+
+        recent = async_to_sync(selector.recent_turns)(3)
+        window = async_to_sync(selector.select)(10_000)
+
+        self.assertEqual([turn.id for turn in recent], [turn.id for turn in turns[3:6]])
+        self.assertEqual([turn.id for turn in window.turns], [turn.id for turn in turns[:6]])
+
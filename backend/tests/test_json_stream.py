@@ -0,0 +1,92 @@
+"""Test the incremental JSON helpers used by the streaming AID import and export."""
+
+import asyncio
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend root to path so we can import the api package
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from api.utils.json_stream import JSONStreamError, aiter_gzip, iter_gzip, iter_json_array_items
+
+
+def parse(document, key='cards', read_size=7):
+    stream = io.BytesIO(document.encode('utf-8'))
+    return list(iter_json_array_items(stream, key=key, read_size=read_size))
+
+
+CARDS = [
+    {'keys': 'dragon, cave', 'value': 'A red dragon. ' * 20, 'type': 'Concept', 'title': 'Drágon'},
+    {'keys': 'sir gawain', 'value': 'Knight "of" the [round] {table}', 'type': 'Character', 'title': 'Gawain'},
+    12345,
+    [1.5, None, True],
+]
+
+
+@pytest.mark.parametrize('read_size', [1, 3, 7, 64, 4096])
+def test_top_level_array(read_size):
+    assert parse(json.dumps(CARDS), read_size=read_size) == CARDS
+
+
+@pytest.mark.parametrize('read_size', [1, 5, 4096])
+def test_cards_key_in_object(read_size):
+    document = json.dumps({'metadata': {'cards': ['not', 'these']}, 'cards': CARDS, 'extra': 1}, indent=2)
+    assert parse(document, read_size=read_size) == CARDS
+
+
+def test_empty_array():
+    assert parse('  [ ]  ') == []
+    assert parse('{"cards": []}') == []
+
+
+def test_malformed_documents():
+    for document in ['', '{"other": []}', '[{"a": 1} {"b": 2}]', '[{"a": 1},', '"cards"', '{"cards": {}}']:
+        with pytest.raises(JSONStreamError):
+            parse(document)
+
+
+def test_item_size_limit():
+    stream = io.BytesIO(json.dumps([{'value': 'x' * 1000}]).encode('utf-8'))
+    with pytest.raises(JSONStreamError):
+        list(iter_json_array_items(stream, read_size=64, max_item_size=256))
+
+
+def test_items_are_yielded_before_the_document_ends():
+    class Source:
+        def __init__(self):
+            self.chunks = [b'[{"a": 1}, ', b'{"b": 2}, ']
+
+        def read(self, size):
+            if not self.chunks:
+                raise AssertionError('read past the data needed for the first items')
+            return self.chunks.pop(0)
+
+    items = iter_json_array_items(Source(), read_size=16)
+    assert next(items) == {'a': 1}
+    assert next(items) == {'b': 2}
+
+
+def test_gzip_round_trip():
+    pieces = ['{"cards": [', json.dumps(CARDS)[1:-1], '], "metadata": {}}']
+    compressed = b''.join(iter_gzip(pieces))
+    assert json.loads(gzip.decompress(compressed)) == {'cards': CARDS, 'metadata': {}}
+
+
+def test_async_gzip_matches_sync():
+    pieces = ['{"cards": [', json.dumps(CARDS)[1:-1], '], "metadata": {}}']
+
+    async def agen():
+        for piece in pieces:
+            yield piece
+
+    async def collect():
+        return b''.join([chunk async for chunk in aiter_gzip(agen())])
+
+    assert gzip.decompress(asyncio.run(collect())) == gzip.decompress(b''.join(iter_gzip(pieces)))
@@ -0,0 +1,55 @@
+"""Tests for the per-key lock used to serialize generations per adventure."""
+
+import asyncio
+import threading
+import time
+
+from api.utils.keyed_lock import KeyedLock
+
+
+def test_same_key_is_exclusive_across_loops():
+    lock = KeyedLock()
+    active = []
+    overlaps = []
+
+    async def hold():
+        assert await lock.acquire('adventure-1', timeout=5)
+        try:
+            active.append(1)
+            overlaps.append(len(active) > 1)
+            await asyncio.sleep(0.02)
+            active.pop()
+        finally:
+            lock.release('adventure-1')
+
+    threads = [threading.Thread(target=asyncio.run, args=(hold(),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(overlaps) == 4
+    assert not any(overlaps)
+    assert not lock.locked('adventure-1')
+
+
+def test_other_keys_do_not_wait_and_timeout_leaves_queue():
+    lock = KeyedLock()
+
+    async def scenario():
+        assert await lock.acquire(1)
+        # A different key is free while key 1 is held
+        assert await lock.acquire(2, timeout=0.01)
+        lock.release(2)
+
+        started = time.monotonic()
+        assert not await lock.acquire(1, timeout=0.05)
+        assert time.monotonic() - started >= 0.04
+
+        # The timed-out waiter is gone: releasing frees the key
+        lock.release(1)
+        assert not lock.locked(1)
+        assert await lock.acquire(1, timeout=0.01)
+        lock.release(1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+"""Tests for the ASGI lifespan hooks of the AIService singleton."""
+
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from api.lifespan import LifespanApp
+from api.services.ai_service import AIService
+from api.services.settings_cache import GlobalSettingsCache
+from api.services.turn_ordering import adventure_locks
+from imaginai_backend.config import DEFAULT_GENERATION_MODEL
+
+
+class FakeRotatingClient:
+    """Records warm-up and shutdown calls."""
+
+    def __init__(self):
+        self.counted = []
+        self.closed = False
+
+    def token_count(self, model, text=None, messages=None):
+        self.counted.append(model)
+        return 1
+
+    async def close(self):
+        self.closed = True
+
+
+async def run_lifespan(app, before_shutdown=None):
+    """Send startup and shutdown to the app; returns the messages it sent back."""
+    events = asyncio.Queue()
+    sent = []
+
+    async def send(message):
+        sent.append(message['type'])
+
+    await events.put({'type': 'lifespan.startup'})
+    await events.put({'type': 'lifespan.shutdown'})
+    if before_shutdown is None:
+        await app({'type': 'lifespan'}, events.get, send)
+    else:
+        task = asyncio.ensure_future(app({'type': 'lifespan'}, events.get, send))
+        await before_shutdown(sent)
+        await task
+    return sent
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    AI_SERVICE_WARMUP_TIMEOUT=1.0,
+    AI_SERVICE_DRAIN_TIMEOUT=5.0,
+)
+class LifespanTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = FakeRotatingClient()
+        self.service = AIService(self.client)
+        patcher = mock.patch('api.lifespan.get_ai_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = LifespanApp(mock.AsyncMock())
+
+    def test_startup_warms_up_and_shutdown_closes_client(self):
+        # SimpleTestCase fails any database query; warm-up must not make one
+        with mock.patch('api.services.ai_service.global_settings', GlobalSettingsCache()):
+            sent = async_to_sync(run_lifespan)(self.app)
+
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertEqual(self.client.counted, [DEFAULT_GENERATION_MODEL])
+        self.assertTrue(self.client.closed)
+        self.app.app.assert_not_called()
+
+    def test_startup_warms_the_tokenizer_of_loaded_settings(self):
+        settings_cache = GlobalSettingsCache()
+        settings_cache._settings = mock.Mock(selected_model='openai/gpt-4o-mini', global_max_output_tokens=0)
+        with mock.patch('api.services.ai_service.global_settings', settings_cache):
+            async_to_sync(run_lifespan)(self.app)
+
+        self.assertEqual(self.client.counted, ['openai/gpt-4o-mini'])
+
+    def test_shutdown_waits_for_running_generations(self):
+        finished = []
+
+        async def generate_during_shutdown(sent):
+            async with adventure_locks.hold('adventure-1'):
+                # Shutdown has begun and is waiting for this generation
+                await asyncio.sleep(0.3)
+                self.assertFalse(self.client.closed)
+                finished.append(True)
+
+        sent = async_to_sync(run_lifespan)(self.app, generate_during_shutdown)
+
+        self.assertEqual(finished, [True])
+        self.assertEqual(sent[-1], 'lifespan.shutdown.complete')
+        self.assertTrue(self.client.closed)
+
+    def test_other_connections_go_to_django(self):
+        scope = {'type': 'http'}
+        async_to_sync(self.app)(scope, None, None)
+        self.app.app.assert_awaited_once_with(scope, None, None)
@@ -0,0 +1,55 @@
+"""Tests for the bounded model and provider labels of the backend metrics."""
+
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from api.services import metrics
+from api.services.model_catalog import ModelCatalog
+
+
+class CatalogClient:
+    api_keys = {'gemini': ['key'], 'openai': ['key']}
+
+    async def get_available_models(self, provider):
+        return [f'{provider}/listed']
+
+
+@override_settings(METRICS_MODEL_LABELS=('anthropic/allowed',))
+class MetricLabelTests(SimpleTestCase):
+
+    def setUp(self):
+        catalog = ModelCatalog()
+        async_to_sync(catalog.get_models)(CatalogClient())
+        for target, value in (
+            ('api.services.model_catalog.model_catalog', catalog),
+            ('api.dependencies.get_rotating_client', lambda: CatalogClient()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_model_labels(self):
+        self.assertEqual(metrics.model_label('gemini/listed'), 'gemini/listed')
+        self.assertEqual(metrics.model_label('anthropic/allowed'), 'anthropic/allowed')
+        # Unknown models of configured providers are reported by provider
+        self.assertEqual(metrics.model_label('openai/unlisted'), 'openai')
+        self.assertEqual(metrics.model_label('anthropic/unlisted'), 'anthropic')
+        for model in ('madeup/model', 'no-provider', '', None):
+            self.assertEqual(metrics.model_label(model), 'other')
+
+    def test_arbitrary_models_add_no_series(self):
+        series = lambda: set(metrics.llm_requests.values()) | set(metrics.generation_duration.values())
+        metrics.record_completion('gemini/listed', stream=False, seconds=0.1)
+        metrics.record_completion('gemini/unlisted', stream=False, seconds=0.1)
+        metrics.record_completion('madeup/x', stream=False, seconds=0.1, error=ValueError())
+        before = series()
+
+        for i in range(500):
+            metrics.record_completion(f'gemini/made-up-{i}', stream=False, seconds=0.1)
+            metrics.record_completion(f'madeup-{i}/model', stream=False, seconds=0.1, error=ValueError())
+
+        self.assertEqual(series(), before)
+        self.assertNotIn(('madeup-1', 'ValueError'), metrics.upstream_errors.values())
+        self.assertIn(('other', 'ValueError'), metrics.upstream_errors.values())
@@ -0,0 +1,85 @@
+"""Tests for the sharded Prometheus metrics."""
+
+import threading
+
+from api.utils.metrics import MetricsRegistry
+
+
+def test_counter_shards_sum_across_threads():
+    registry = MetricsRegistry()
+    tokens = registry.counter('tokens_total', 'Tokens.', ('model', 'direction'))
+
+    def record():
+        for _ in range(10_000):
+            tokens.inc(2, model='m', direction='in')
+        tokens.inc(model='m', direction='out')
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens.values() == {('m', 'in'): 160_000, ('m', 'out'): 8}
+
+
+def test_gauge_goes_up_and_down_from_different_threads():
+    registry = MetricsRegistry()
+    in_flight = registry.gauge('in_flight', 'In flight.')
+    in_flight.inc()
+    in_flight.inc()
+    thread = threading.Thread(target=in_flight.dec)
+    thread.start()
+    thread.join()
+    assert in_flight.values() == {(): 1}
+
+
+def test_render_in_text_exposition_format():
+    registry = MetricsRegistry()
+    duration = registry.histogram('duration_seconds', 'Duration.', ('model',), buckets=(0.1, 1.0))
+    duration.observe(0.05, model='a"b')
+    duration.observe(0.5, model='a"b')
+    duration.observe(5, model='a"b')
+    registry.function('running', 'Running.', lambda: 3)
+
+    def broken():
+        raise KeyError('stats')
+    registry.function('broken', 'Broken.', broken)
+
+    assert registry.render().splitlines() == [
+        '# HELP duration_seconds Duration.',
+        '# TYPE duration_seconds histogram',
+        'duration_seconds_bucket{model="a\\"b",le="0.1"} 1',
+        'duration_seconds_bucket{model="a\\"b",le="1.0"} 2',
+        'duration_seconds_bucket{model="a\\"b",le="+Inf"} 3',
+        'duration_seconds_sum{model="a\\"b"} 5.55',
+        'duration_seconds_count{model="a\\"b"} 3',
+        '# HELP running Running.',
+        '# TYPE running gauge',
+        'running 3',
+    ]
+
+
+def test_shards_of_exited_threads_are_retired():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests.', ('status',))
+    duration = registry.histogram('duration_seconds', 'Duration.', buckets=(0.1, 1.0))
+
+    def record():
+        requests.inc(status='ok')
+        duration.observe(0.5)
+
+    for _ in range(2000):
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+
+    # Only live threads keep a shard
+    assert len(requests._shards) == 0
+    assert len(duration._shards) == 0
+    assert requests.values() == {('ok',): 2000}
+    assert duration.values() == {(): ([0, 2000, 0], 1000.0)}
+
+    requests.inc(status='ok')
+    assert len(requests._shards) == 1
+    assert requests.values() == {('ok',): 2001}
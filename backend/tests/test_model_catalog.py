@@ -0,0 +1,147 @@
+"""Tests for the stale-while-revalidate model catalog and async viewset handlers."""
+
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.services.model_catalog import ModelCatalog
+from api.views.mixins import AsyncHandlerMixin
+
+
+class CatalogClient:
+    """Counts model list fetches; versions its lists so refreshes are visible."""
+
+    def __init__(self, providers=('gemini', 'openai'), hang=(), fail=()):
+        self.api_keys = {provider: ['key'] for provider in providers}
+        self.hang = set(hang)
+        self.fail = set(fail)
+        self.fetches = {provider: 0 for provider in providers}
+        # Cleared to hold fetches until the test releases them
+        self.gate = threading.Event()
+        self.gate.set()
+
+    async def get_available_models(self, provider):
+        self.fetches[provider] += 1
+        while not self.gate.is_set():
+            await asyncio.sleep(0.005)
+        if provider in self.hang:
+            await asyncio.sleep(60)
+        if provider in self.fail:
+            raise ConnectionError(f'{provider} is down')
+        return [f'{provider}/model-v{self.fetches[provider]}']
+
+
+class ModelCatalogTests(SimpleTestCase):
+
+    def test_concurrent_first_requests_share_one_fetch(self):
+        catalog = ModelCatalog()
+        client = CatalogClient()
+
+        async def load():
+            return await asyncio.gather(*(catalog.get_models(client) for _ in range(5)))
+
+        results = async_to_sync(load)()
+
+        self.assertEqual(client.fetches, {'gemini': 1, 'openai': 1})
+        for result in results:
+            self.assertEqual(result['models'], {'gemini': ['gemini/model-v1'], 'openai': ['openai/model-v1']})
+            self.assertFalse(result['stale'])
+        self.assertEqual(catalog.stats()['misses'], 5)
+        self.assertEqual(catalog.stats()['refreshes'], 1)
+
+    def test_expired_catalog_is_served_stale_while_refreshing(self):
+        catalog = ModelCatalog()
+        client = CatalogClient()
+        async_to_sync(catalog.get_models)(client)
+        catalog.invalidate()
+
+        client.gate.clear()
+        stale = [async_to_sync(catalog.get_models)(client) for _ in range(3)]
+        refresh = catalog._refresh_future
+        client.gate.set()
+        refresh.result(timeout=5)
+
+        for result in stale:
+            self.assertTrue(result['stale'])
+            self.assertEqual(result['models']['gemini'], ['gemini/model-v1'])
+        # One background refresh for all stale requests
+        self.assertEqual(client.fetches, {'gemini': 2, 'openai': 2})
+
+        fresh = async_to_sync(catalog.get_models)(client)
+        self.assertFalse(fresh['stale'])
+        self.assertEqual(fresh['models']['gemini'], ['gemini/model-v2'])
+        self.assertEqual(catalog.stats()['stale_hits'], 3)
+
+    def test_slow_and_failing_providers_keep_their_last_list(self):
+        catalog = ModelCatalog(provider_timeout=0.05)
+        client = CatalogClient(providers=('gemini', 'openai', 'anthropic'))
+        async_to_sync(catalog.get_models)(client)
+
+        client.hang = {'openai'}
+        client.fail = {'anthropic'}
+        catalog.invalidate()
+        async_to_sync(catalog.get_models)(client)
+        catalog._refresh_future.result(timeout=5)
+        result = async_to_sync(catalog.get_models)(client)
+
+        self.assertEqual(result['models'], {
+            'gemini': ['gemini/model-v2'],
+            'openai': ['openai/model-v1'],
+            'anthropic': ['anthropic/model-v1'],
+        })
+        self.assertEqual(result['failed_providers'], {'openai': 'timeout', 'anthropic': 'anthropic is down'})
+
+    def test_provider_failing_on_first_fetch_is_left_out(self):
+        catalog = ModelCatalog()
+        result = async_to_sync(catalog.get_models)(CatalogClient(fail=('openai',)))
+
+        self.assertEqual(result['models'], {'gemini': ['gemini/model-v1']})
+        self.assertEqual(list(result['failed_providers']), ['openai'])
+
+
+class ExampleViewSet(AsyncHandlerMixin, viewsets.ViewSet):
+
+    async def list(self, request):
+        await asyncio.sleep(0)
+        return Response({'handler': 'async'})
+
+    async def retrieve(self, request, pk=None):
+        raise NotFound(f'No item {pk}')
+
+    @action(detail=False, methods=['get'])
+    def plain(self, request):
+        return Response({'handler': 'sync'})
+
+
+class AsyncHandlerMixinTests(SimpleTestCase):
+
+    def call(self, actions, **kwargs):
+        request = APIRequestFactory().get('/')
+        return ExampleViewSet.as_view(actions)(request, **kwargs)
+
+    def test_async_and_sync_handlers(self):
+        self.assertEqual(self.call({'get': 'list'}).data, {'handler': 'async'})
+        self.assertEqual(self.call({'get': 'plain'}).data, {'handler': 'sync'})
+
+    def test_exceptions_from_async_handlers_are_handled_by_drf(self):
+        response = self.call({'get': 'retrieve'}, pk=3)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {'detail': 'No item 3'})
+
+    def test_models_endpoint(self):
+        catalog = ModelCatalog()
+        with mock.patch('api.views.model_views.get_rotating_client', return_value=CatalogClient()), \
+                mock.patch('api.views.model_views.model_catalog', catalog):
+            response = APIClient().get('/api/models/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['models']['openai'], ['openai/model-v1'])
@@ -0,0 +1,46 @@
+"""Tests for prompt prefix cache hints and the prefix hit ratio."""
+
+from django.test import SimpleTestCase, override_settings
+
+from api.services.prompt_cache import PrefixCacheTracker, with_cache_hints
+
+
+def prompt(history, cards, user):
+    messages = [{'role': 'system', 'content': 'Instructions'}]
+    messages += [{'role': role, 'content': text} for role, text in history]
+    messages += [{'role': 'system', 'content': cards}, {'role': 'user', 'content': user}]
+    return messages
+
+
+class PrefixCacheTrackerTests(SimpleTestCase):
+
+    def test_hit_ratio_counts_leading_identical_messages(self):
+        tracker = PrefixCacheTracker()
+        first = prompt([('model', 'Opening')], 'Cards A', 'go north')
+        self.assertIsNone(tracker.observe(1, first))
+
+        second = prompt([('model', 'Opening'), ('user', 'go north'), ('model', 'You walk.')], 'Cards B', 'look')
+        shared = len('Instructions') + len('Opening')
+        total = sum(len(message['content']) for message in second)
+        self.assertAlmostEqual(tracker.observe(1, second), shared / total)
+
+        # Other adventures are tracked separately
+        self.assertIsNone(tracker.observe(2, second))
+        self.assertEqual(tracker.stats()['turns'], 1)
+
+
+class CacheHintTests(SimpleTestCase):
+
+    @override_settings(PROMPT_CACHE_HINT_PROVIDERS=('anthropic',))
+    def test_breakpoints_only_for_hint_providers(self):
+        messages = prompt([('model', 'Opening')], 'Cards', 'go')
+
+        self.assertIs(with_cache_hints('gemini/gemini-1.5-flash', messages, 2), messages)
+
+        hinted = with_cache_hints('anthropic/claude-3-5-haiku', messages, 2)
+        for index in (0, 1):
+            block = hinted[index]['content'][0]
+            self.assertEqual(block['text'], messages[index]['content'])
+            self.assertEqual(block['cache_control'], {'type': 'ephemeral'})
+        self.assertEqual(hinted[2:], messages[2:])
+        self.assertEqual(messages[0]['content'], 'Instructions')
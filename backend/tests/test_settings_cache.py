@@ -0,0 +1,71 @@
+"""Tests for the per-process GlobalSettings cache."""
+
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import GlobalSettings
+from api.services.settings_cache import GlobalSettingsCache
+from imaginai_backend.config import DEFAULT_GENERATION_MODEL, DEFAULT_MAX_OUTPUT_TOKENS
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class GlobalSettingsCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_update_reaches_other_workers_through_the_version_key(self):
+        # Two workers, each with its own copy
+        this_worker = GlobalSettingsCache(check_interval=60)
+        other_worker = GlobalSettingsCache(check_interval=60)
+        self.assertEqual(other_worker.get().global_max_output_tokens, 200)
+        with self.assertNumQueries(0):
+            other_worker.get()
+
+        with mock.patch('api.views.settings_views.global_settings', this_worker):
+            response = APIClient().put(
+                '/api/global-settings/1/', {'globalMaxOutputTokens': 512}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(this_worker.get().global_max_output_tokens, 512)
+
+        # Within the check interval the other worker keeps its copy
+        self.assertEqual(other_worker.get().global_max_output_tokens, 200)
+
+        # After it, the changed version makes it reload once
+        other_worker._checked_at -= 60
+        self.assertEqual(other_worker.get().global_max_output_tokens, 512)
+        other_worker._checked_at -= 60
+        with self.assertNumQueries(0):
+            other_worker.get()
+        self.assertEqual(other_worker.reloads, 2)
+
+    def test_async_reads_see_updates(self):
+        worker = GlobalSettingsCache(check_interval=0)
+        self.assertEqual(async_to_sync(worker.aget)().selected_model, 'gemini-pro')
+
+        GlobalSettings.objects.filter(pk=1).update(selected_model='openai/gpt-4o-mini')
+        GlobalSettingsCache().notify_changed(GlobalSettings.objects.get(pk=1))
+
+        self.assertEqual(async_to_sync(worker.aget)().selected_model, 'openai/gpt-4o-mini')
+
+    def test_generation_defaults(self):
+        worker = GlobalSettingsCache(check_interval=0)
+        GlobalSettings.objects.create(pk=1, selected_model='gemini-pro', global_max_output_tokens=0)
+
+        # Models without a provider prefix and unset limits fall back to the defaults
+        defaults = async_to_sync(worker.generation_defaults)()
+        self.assertEqual((defaults.model, defaults.max_tokens), (DEFAULT_GENERATION_MODEL, DEFAULT_MAX_OUTPUT_TOKENS))
+
+        instance = GlobalSettings.objects.get(pk=1)
+        instance.selected_model = 'anthropic/claude-3-5-haiku'
+        instance.global_max_output_tokens = 300
+        instance.save()
+        worker.notify_changed(instance)
+
+        defaults = async_to_sync(worker.generation_defaults)()
+        self.assertEqual((defaults.model, defaults.max_tokens), ('anthropic/claude-3-5-haiku', 300))
@@ -0,0 +1,170 @@
+"""Tests for targeted snapshot card mutations in all card storage modes."""
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.models import Adventure, Scenario
+from api.services.adventure_cards import card_editor_for, create_adventure_cards, list_adventure_cards
+from api.services.snapshot_blobs import blob_for_cards
+from api.services.snapshot_cards import SnapshotCardNotFound, SnapshotConflict
+
+
+class SnapshotCardEditorTests(TestCase):
+    """Cards stored in scenarioSnapshot['cards'] (SnapshotCardEditor)."""
+
+    card_storage = 'snapshot'
+
+    def setUp(self):
+        scenario = Scenario.objects.create(
+            name='Scenario',
+            instructions='Instructions',
+            openingScene='Opening',
+            playerDescription='Player'
+        )
+        cards = [{'id': i, 'title': f'Card {i}', 'trigger_words': f'word{i}'} for i in range(5)]
+        snapshot = {'name': 'Scenario'}
+        if self.card_storage == 'snapshot':
+            snapshot['cards'] = cards
+        self.adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot=snapshot,
+            cardStorage=self.card_storage,
+            snapshotBlob=blob_for_cards(cards) if self.card_storage == 'shared' else None
+        )
+        if self.card_storage == 'table':
+            create_adventure_cards(self.adventure, cards)
+        self.editor = card_editor_for(self.adventure)
+
+    def snapshot(self):
+        self.adventure.refresh_from_db()
+        return {**self.adventure.scenarioSnapshot, 'cards': list_adventure_cards(self.adventure)}
+
+    def titles(self):
+        return [card.get('title') for card in self.snapshot()['cards']]
+
+    def test_mutations_keep_order_and_bump_version(self):
+        self.assertEqual(self.editor.edit(1, {'title': 'Edited'}), 1)
+        new_id, version = self.editor.duplicate(1)
+        self.assertEqual(version, 2)
+        self.assertEqual(self.editor.delete(3), 3)
+        self.assertEqual(self.editor.add({'id': 'new', 'title': 'New'}), 4)
+
+        self.assertEqual(
+            self.titles(),
+            ['Card 0', 'Edited', 'Edited (Copy)', 'Card 2', 'Card 4', 'New']
+        )
+        cards = self.snapshot()['cards']
+        self.assertEqual(cards[1], {'id': 1, 'title': 'Edited'})
+        self.assertEqual(cards[2]['id'], new_id)
+        self.assertEqual(self.snapshot()['name'], 'Scenario')
+        self.assertEqual(self.adventure.snapshotVersion, 4)
+
+    def test_missing_card(self):
+        with self.assertRaises(SnapshotCardNotFound):
+            self.editor.edit('missing', {'title': 'x'})
+        with self.assertRaises(SnapshotCardNotFound):
+            self.editor.delete('missing')
+        self.assertEqual(len(self.snapshot()['cards']), 5)
+
+    def test_optimistic_version_check(self):
+        self.editor.edit(0, {'title': 'First'}, expected_version=0)
+        with self.assertRaises(SnapshotConflict) as context:
+            self.editor.edit(0, {'title': 'Second'}, expected_version=0)
+        self.assertEqual(context.exception.current_version, 1)
+        with self.assertRaises(SnapshotConflict):
+            self.editor.add({'id': 'x'}, expected_version=0)
+        self.assertEqual(self.titles()[0], 'First')
+
+
+class AdventureCardEditorTests(SnapshotCardEditorTests):
+    """Cards stored as AdventureCard rows (AdventureCardEditor)."""
+
+    card_storage = 'table'
+
+
+class SharedCardEditorTests(SnapshotCardEditorTests):
+    """Cards stored in a shared SnapshotBlob plus overlay (SharedCardEditor)."""
+
+    card_storage = 'shared'
+
+    def test_edits_do_not_leak_into_shared_blob(self):
+        other = Adventure.objects.create(
+            sourceScenario=self.adventure.sourceScenario,
+            sourceScenarioName='Scenario',
+            adventureName='Other',
+            scenarioSnapshot={'name': 'Scenario'},
+            cardStorage='shared',
+            snapshotBlob_id=self.adventure.snapshotBlob_id
+        )
+        new_id, _ = self.editor.duplicate(2)
+        self.editor.duplicate(new_id)
+        self.editor.delete(0)
+
+        self.assertEqual(
+            self.titles(),
+            ['Card 1', 'Card 2', 'Card 2 (Copy)', 'Card 2 (Copy) (Copy)', 'Card 3', 'Card 4']
+        )
+        self.assertEqual(len(list_adventure_cards(other)), 5)
+
+
+class AdventureSnapshotUpdateTests(TestCase):
+    """PUT/PATCH of scenarioSnapshot takes part in the optimistic versioning."""
+
+    def setUp(self):
+        self.client = APIClient()
+        scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        self.adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot={'name': 'Scenario', 'cards': [{'id': 0, 'title': 'Card 0'}]},
+        )
+        self.url = f'/api/adventures/{self.adventure.pk}/'
+
+    def patch(self, **data):
+        return self.client.patch(self.url, data, format='json')
+
+    def test_snapshot_replacement_bumps_version(self):
+        response = self.patch(scenarioSnapshot={'cards': [{'id': 1, 'title': 'Replaced'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['snapshotVersion'], 1)
+
+        # Other fields leave the version alone
+        response = self.patch(adventureName='Renamed')
+        self.assertEqual(response.json()['snapshotVersion'], 1)
+
+    def test_card_edit_with_old_version_conflicts_after_replacement(self):
+        self.patch(scenarioSnapshot={'cards': [{'id': 1, 'title': 'Replaced'}]})
+
+        response = self.client.post(
+            f'{self.url}edit-card-in-snapshot/',
+            {'card_id': 1, 'updated_card': {'title': 'Stale edit'}, 'snapshot_version': 0},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['snapshot_version'], 1)
+
+    def test_expected_version_is_checked(self):
+        card_editor_for(self.adventure).edit(0, {'title': 'Edited elsewhere'})
+
+        response = self.patch(scenarioSnapshot={'cards': []}, snapshotVersion=0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['snapshot_version'], 1)
+        self.adventure.refresh_from_db()
+        self.assertEqual(self.adventure.scenarioSnapshot['cards'][0]['title'], 'Edited elsewhere')
+
+        response = self.patch(scenarioSnapshot={'cards': []}, snapshotVersion=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['snapshotVersion'], 2)
+
+    def test_table_storage_replacement_bumps_version(self):
+        self.adventure.cardStorage = 'table'
+        self.adventure.save()
+        create_adventure_cards(self.adventure, [{'id': 0, 'title': 'Card 0'}])
+
+        response = self.patch(scenarioSnapshot={'name': 'Scenario', 'cards': [{'id': 2, 'title': 'Row'}]})
+
+        self.assertEqual(response.json()['snapshotVersion'], 1)
+        self.assertEqual([card['title'] for card in list_adventure_cards(self.adventure)], ['Row'])
@@ -0,0 +1,111 @@
+"""Tests for buffered, resumable SSE streams."""
+
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.models import Adventure, Scenario
+from api.services.stream_buffer import StreamBuffer, parse_event_id
+
+
+def chunks(count, delay=0.0):
+    async def produce():
+        for number in range(count):
+            await asyncio.sleep(delay)
+            yield f"data: {number}\n\n"
+    return produce
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StreamBufferTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.buffer = StreamBuffer(max_events=5, poll_interval=0.01)
+
+    def collect(self, stream_id, after=0):
+        async def run():
+            return [message async for message in self.buffer.sse(stream_id, after)]
+        return async_to_sync(run)()
+
+    def test_events_carry_ids_and_resume_after_last_event_id(self):
+        stream_id = self.buffer.start(chunks(4, delay=0.01))
+        messages = self.collect(stream_id)
+        self.assertEqual(messages[0], f"id: {stream_id}:1\ndata: 0\n\n")
+        self.assertEqual(len(messages), 4)
+
+        # Finished streams are replayed from the buffer
+        self.assertEqual(parse_event_id(f"{stream_id}:2"), (stream_id, 2))
+        self.assertEqual(self.collect(stream_id, after=2), messages[2:])
+
+    def test_generation_continues_without_a_client(self):
+        stream_id = self.buffer.start(chunks(3, delay=0.01))
+
+        async def read_one():
+            async for message in self.buffer.sse(stream_id):
+                return message
+        async_to_sync(read_one)()
+
+        # Reconnecting later still gets the rest of the stream
+        self.assertEqual(
+            self.collect(stream_id, after=1),
+            [f"id: {stream_id}:2\ndata: 1\n\n", f"id: {stream_id}:3\ndata: 2\n\n"]
+        )
+
+    def test_dropped_or_unknown_events_end_with_an_error(self):
+        stream_id = self.buffer.start(chunks(8))
+        self.collect(stream_id)
+
+        # Only the last 5 of 8 events are kept
+        self.assertEqual(len(self.collect(stream_id, after=3)), 5)
+        self.assertIn('"error"', self.collect(stream_id, after=1)[0])
+        self.assertIn('"error"', self.collect('unknown', after=1)[0])
+        self.assertIsNone(parse_event_id('no-number'))
+
+    def test_streams_remember_their_owner(self):
+        stream_id = self.buffer.start(chunks(2), owner='7')
+        self.collect(stream_id)
+
+        self.assertEqual(async_to_sync(self.buffer.owner)(stream_id), '7')
+        self.assertIsNone(async_to_sync(self.buffer.owner)('unknown'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StreamResumeViewTests(TestCase):
+
+    def test_streams_resume_only_on_their_adventure(self):
+        scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        own, other = [
+            Adventure.objects.create(
+                sourceScenario=scenario, sourceScenarioName=scenario.name,
+                adventureName=name, scenarioSnapshot={'cards': []}
+            )
+            for name in ('Own', 'Other')
+        ]
+        buffer = StreamBuffer(poll_interval=0.01)
+        stream_id = buffer.start(chunks(2), owner=str(own.pk))
+        # Wait until the stream has finished
+        async_to_sync(_drain)(buffer.sse(stream_id))
+
+        client = APIClient()
+        with mock.patch('api.views.adventure_views.stream_buffer', buffer):
+            denied = client.post(
+                f'/api/adventures/{other.pk}/stream/', {}, format='json', HTTP_LAST_EVENT_ID=f'{stream_id}:1'
+            )
+            resumed = client.post(
+                f'/api/adventures/{own.pk}/stream/', {}, format='json', HTTP_LAST_EVENT_ID=f'{stream_id}:1'
+            )
+            body = b''.join(async_to_sync(_drain)(resumed.streaming_content))
+
+        self.assertEqual(denied.status_code, 404)
+        self.assertIn('Unknown or expired stream', denied.json()['error'])
+        self.assertEqual(resumed.status_code, 200)
+        self.assertEqual(body.decode(), f"id: {stream_id}:2\ndata: 1\n\n")
+
+
+async def _drain(messages):
+    return [message async for message in messages]
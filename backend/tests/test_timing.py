@@ -0,0 +1,51 @@
+"""Tests for request timing spans."""
+
+import asyncio
+import time
+
+from api.utils.timing import Timing, activate, add_span, current_timing, set_label, span, timed
+
+
+def test_spans_are_noops_without_a_current_timing():
+    assert current_timing() is None
+    with span('db'):
+        pass
+    add_span('llm', 1.0)
+    set_label('model', 'm')
+    assert span('db') is span('llm')
+
+
+def test_spans_accumulate_and_follow_the_context_into_threads():
+    timing = Timing(endpoint='generate')
+
+    @timed('prompt')
+    async def build():
+        with span('history'):
+            await asyncio.sleep(0.01)
+        # Worker threads get a copy of the context, with the same Timing
+        await asyncio.to_thread(add_span, 'db', 0.002)
+        await asyncio.to_thread(add_span, 'db', 0.003)
+
+    with activate(timing):
+        set_label('model', 'gemini/gemini-1.5-flash')
+        asyncio.run(build())
+    assert current_timing() is None
+
+    assert list(timing.spans) == ['history', 'db', 'prompt']
+    assert timing.spans['db'][1] == 2
+    assert abs(timing.spans['db'][0] - 0.005) < 1e-9
+    assert timing.spans['prompt'][0] >= timing.spans['history'][0] >= 0.01
+    assert timing.labels == {'endpoint': 'generate', 'model': 'gemini/gemini-1.5-flash'}
+
+
+def test_server_timing_header():
+    timing = Timing()
+    timing.add('lock', 0.0012)
+    timing.add('db', 0.004)
+    timing.add('db', 0.001)
+    time.sleep(0.001)
+    timing.finish()
+
+    parts = timing.server_timing().split(', ')
+    assert parts[:2] == ['lock;dur=1.2', 'db;dur=5.0;desc="2x"']
+    assert parts[2].startswith('total;dur=')
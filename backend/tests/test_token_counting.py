@@ -0,0 +1,89 @@
+"""Tests for memoized per-turn token counts and their backfill command."""
+
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Adventure, AdventureTurn, Scenario
+from api.services.token_counting import TurnTokenCounter, get_tokenizer_family
+
+
+class CountingClient:
+    """Token count is the number of words; counts tokenizer calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def token_count(self, model, text=None, messages=None):
+        self.calls += 1
+        return sum(len(message['content'].split()) for message in messages)
+
+
+class TurnTokenCountTests(TestCase):
+
+    def setUp(self):
+        scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        self.adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot={'cards': []}
+        )
+        self.client = CountingClient()
+
+    def create_turn(self, text, token_counts=None):
+        return AdventureTurn.objects.create(
+            adventure=self.adventure, role='user', text=text, tokenCounts=token_counts or {}
+        )
+
+    def test_tokenizer_family(self):
+        self.assertEqual(get_tokenizer_family('gemini/gemini-1.5-flash'), 'gemini')
+        self.assertEqual(get_tokenizer_family('openai/gpt-4o-mini'), 'o200k')
+        self.assertEqual(get_tokenizer_family('some/Custom-Model'), 'custom-model')
+
+    def test_counts_are_memoized_per_family(self):
+        counted = self.create_turn('one two three')
+        memoized = self.create_turn('four five', {'gemini': 7})
+
+        counter = TurnTokenCounter(self.client, 'gemini/gemini-1.5-flash')
+        self.assertEqual(counter(counted), 3)
+        self.assertEqual(counter(memoized), 7)
+        self.assertEqual((counter.hits, counter.misses, self.client.calls), (1, 1, 1))
+
+        async_to_sync(counter.flush)()
+        counted.refresh_from_db()
+        self.assertEqual(counted.tokenCounts, {'gemini': 3})
+
+        # The next counter of the family reads the stored count; other families tokenize
+        again = TurnTokenCounter(self.client, 'gemini/gemini-2.0-flash')
+        self.assertEqual(again(counted), 3)
+        self.assertEqual(self.client.calls, 1)
+
+        other = TurnTokenCounter(self.client, 'openai/gpt-4o')
+        self.assertEqual(other(counted), 3)
+        async_to_sync(other.flush)()
+        counted.refresh_from_db()
+        self.assertEqual(counted.tokenCounts, {'gemini': 3, 'o200k': 3})
+
+    def test_backfill_command_fills_missing_counts(self):
+        turns = [self.create_turn(f'word {"x " * i}') for i in range(5)]
+        done = self.create_turn('already counted', {'gemini': 99})
+        other_family = self.create_turn('two words', {'o200k': 2})
+
+        with mock.patch(
+            'api.management.commands.backfill_turn_token_counts.get_rotating_client',
+            return_value=self.client
+        ):
+            call_command('backfill_turn_token_counts', 'gemini/gemini-1.5-flash', batch_size=2, stdout=StringIO())
+
+        for i, turn in enumerate(turns):
+            turn.refresh_from_db()
+            self.assertEqual(turn.tokenCounts, {'gemini': i + 1})
+        done.refresh_from_db()
+        self.assertEqual(done.tokenCounts, {'gemini': 99})
+        other_family.refresh_from_db()
+        self.assertEqual(other_family.tokenCounts, {'o200k': 2, 'gemini': 2})
+        self.assertEqual(self.client.calls, 6)
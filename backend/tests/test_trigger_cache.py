@@ -0,0 +1,67 @@
+"""Tests for the per-adventure TriggerIndex cache."""
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.services.trigger_cache import TriggerIndexCache
+
+
+def cards(*triggers):
+    return [{'id': f'card-{i}', 'trigger_words': words, 'title': f'Card {i}'} for i, words in enumerate(triggers)]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TriggerIndexCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_until_trigger_words_change(self):
+        trigger_cache = TriggerIndexCache()
+        first = async_to_sync(trigger_cache.aget)(1, cards('dragon', 'castle'))
+        self.assertIs(async_to_sync(trigger_cache.aget)(1, cards('dragon', 'castle')), first)
+
+        # Content-only edits keep the fingerprint
+        edited = cards('dragon', 'castle')
+        edited[0]['title'] = 'Renamed'
+        self.assertIs(async_to_sync(trigger_cache.aget)(1, edited), first)
+
+        # New trigger words are a different fingerprint: rebuilt even without invalidate()
+        rebuilt = async_to_sync(trigger_cache.aget)(1, cards('dragon', 'tower'))
+        self.assertIsNot(rebuilt, first)
+        self.assertEqual(rebuilt.match('a tall tower', cards('dragon', 'tower'))[0]['id'], 'card-1')
+
+        stats = trigger_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_invalidate_drops_the_entry(self):
+        trigger_cache = TriggerIndexCache()
+        first = async_to_sync(trigger_cache.aget)(1, cards('dragon'))
+        trigger_cache.invalidate(1)
+
+        self.assertIsNot(async_to_sync(trigger_cache.aget)(1, cards('dragon')), first)
+        self.assertEqual(trigger_cache.stats()['invalidations'], 1)
+
+    def test_least_recently_used_adventure_is_evicted(self):
+        trigger_cache = TriggerIndexCache(max_entries=2)
+        indexes = {pk: async_to_sync(trigger_cache.aget)(pk, cards('dragon')) for pk in (1, 2)}
+        # Adventure 1 was used last, so adding 3 evicts 2
+        async_to_sync(trigger_cache.aget)(1, cards('dragon'))
+        async_to_sync(trigger_cache.aget)(3, cards('dragon'))
+
+        self.assertEqual(trigger_cache.stats()['entries'], 2)
+        self.assertIs(async_to_sync(trigger_cache.aget)(1, cards('dragon')), indexes[1])
+        self.assertIsNot(async_to_sync(trigger_cache.aget)(2, cards('dragon')), indexes[2])
+
+    def test_shared_tier_serves_other_processes(self):
+        builder = TriggerIndexCache(shared=True)
+        async_to_sync(builder.aget)(1, cards('dragon', 'castle'))
+
+        # A second process (its own local tier) starting from the same scenario
+        other = TriggerIndexCache(shared=True)
+        index = async_to_sync(other.aget)(2, cards('dragon', 'castle'))
+
+        self.assertEqual(index.match('the castle', cards('dragon', 'castle'))[0]['id'], 'card-1')
+        self.assertEqual(other.stats()['shared_hits'], 1)
+        self.assertEqual(other.stats()['builds'], 0)
@@ -0,0 +1,65 @@
+"""Test that TriggerIndex matches the legacy per-trigger regex semantics."""
+
+import random
+import re
+import sys
+from pathlib import Path
+
+# Add backend root to path so we can import the api package
+backend_root = Path(__file__).parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from api.utils.trigger_index import TriggerIndex
+
+
+def legacy_triggered_cards(context_text, available_cards):
+    """Reference implementation: one regex search per trigger word."""
+    triggered_cards = []
+    context_lower = context_text.lower()
+    for card in available_cards:
+        trigger_words = [w.strip() for w in card.get('trigger_words', '').split(',') if w.strip()]
+        for trigger in trigger_words:
+            pattern = r'\b' + re.escape(trigger.lower()) + r'\b'
+            if re.search(pattern, context_lower):
+                triggered_cards.append(card)
+                break
+    return triggered_cards
+
+
+def test_basic_matching():
+    cards = [
+        {'id': 1, 'trigger_words': 'Dragon, cave'},
+        {'id': 2, 'trigger_words': 'drag'},
+        {'id': 3, 'trigger_words': 'Sir Gawain'},
+        {'id': 4, 'trigger_words': ''},
+    ]
+    index = TriggerIndex.from_cards(cards)
+    triggered = index.match("The DRAGON stirred. sir gawain drew his sword.", cards)
+    assert [card['id'] for card in triggered] == [1, 3]
+
+
+def test_non_word_triggers():
+    cards = [
+        {'id': 1, 'trigger_words': '@home'},
+        {'id': 2, 'trigger_words': 'c++'},
+        {'id': 3, 'trigger_words': 'snake_case'},
+    ]
+    for text in ["go @home now", "go x@home now", "c++ rocks", "xc++y", "a snake_case b", "snake_cases"]:
+        assert TriggerIndex.from_cards(cards).match(text, cards) == legacy_triggered_cards(text, cards)
+
+
+def test_matches_legacy_on_random_input():
+    rng = random.Random(1234)
+    alphabet = "ab_ -.,'!é"
+    for _ in range(300):
+        cards = [
+            {'id': i, 'trigger_words': ','.join(
+                ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                for _ in range(rng.randint(0, 3))
+            )}
+            for i in range(rng.randint(0, 12))
+        ]
+        text = ''.join(rng.choice(alphabet + 'AB') for _ in range(rng.randint(0, 60)))
+        expected = legacy_triggered_cards(text, cards)
+        assert TriggerIndex.from_cards(cards).match(text, cards) == expected, (cards, text)
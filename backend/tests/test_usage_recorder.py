@@ -0,0 +1,136 @@
+"""Tests for background TokenUsageStats accounting (UsageRecorder)."""
+
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+
+from api.models import Adventure, AdventureTurn, Scenario, TokenUsageStats
+from api.services.ai_service import AdventurePrompt
+from api.services.context_window import ContextWindow
+from api.services.usage_recorder import UsageRecorder
+
+
+class SynchronousExecutor:
+    """Runs submitted work immediately, in the calling thread."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class WordCountClient:
+    """Token count is the number of words."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def token_count(self, model, text=None, messages=None):
+        time.sleep(self.delay)
+        return len(text.split())
+
+
+PROMPT = AdventurePrompt(
+    messages=[{'role': 'system', 'content': 'Narrate the story'}, {'role': 'user', 'content': 'go north'}],
+    context_window=ContextWindow(history_tokens=40, budget=1000),
+    sections={
+        'system_instruction_block': 'Narrate the story',
+        'scenario_instructions': 'Narrate',
+        'cards': 'Dragon: a red dragon',
+        'current_user_message': 'go north',
+    },
+    prefix_hit_ratio=0.5,
+)
+
+
+class RecorderTestMixin:
+
+    def create_turns(self, count):
+        scenario = Scenario.objects.create(name='Scenario', instructions='Instructions')
+        adventure = Adventure.objects.create(
+            sourceScenario=scenario,
+            sourceScenarioName=scenario.name,
+            adventureName='Adventure',
+            scenarioSnapshot={'cards': []}
+        )
+        return [AdventureTurn.objects.create(adventure=adventure, role='model', text='Text') for _ in range(count)]
+
+
+class UsageRecorderTests(RecorderTestMixin, TestCase):
+
+    def make_recorder(self, **kwargs):
+        recorder = UsageRecorder(**kwargs)
+        recorder._executor = SynchronousExecutor()
+        # The write runs inside the test's transaction; keep its connection open
+        patcher = mock.patch('api.services.usage_recorder.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return recorder
+
+    def test_section_counts_and_reported_usage(self):
+        turn, = self.create_turns(1)
+        recorder = self.make_recorder(store_prompt=True)
+        response = {'usage': {
+            'prompt_tokens': 120,
+            'completion_tokens': 30,
+            'completion_tokens_details': {'reasoning_tokens': 5},
+            'prompt_tokens_details': {'cached_tokens': 64},
+        }}
+
+        recorder.record(WordCountClient(), turn.pk, 'gemini/gemini-1.5-flash', PROMPT, response=response)
+
+        turn.refresh_from_db()
+        stats = turn.token_usage
+        self.assertEqual(
+            (stats.api_reported_prompt_tokens, stats.api_reported_output_tokens,
+             stats.api_reported_thinking_tokens, stats.api_reported_cached_prompt_tokens),
+            (120, 30, 5, 64)
+        )
+        self.assertEqual(stats.precise_system_instruction_block_tokens, 3)
+        self.assertEqual(stats.precise_cards_tokens, 4)
+        self.assertEqual(stats.precise_plot_essentials_tokens, 0)
+        self.assertEqual(stats.precise_adventure_history_tokens, 40)
+        self.assertEqual(stats.total_input_tokens_from_precise_sum, 3 + 4 + 40 + 2)
+        self.assertEqual(stats.prefix_hit_ratio, 0.5)
+        self.assertEqual(stats.prompt_payload, PROMPT.messages)
+
+    def test_usage_objects_and_anthropic_cache_reads(self):
+        turn, = self.create_turns(1)
+        recorder = self.make_recorder()
+        usage = mock.Mock(
+            spec=['prompt_tokens', 'completion_tokens', 'cache_read_input_tokens'],
+            prompt_tokens=80, completion_tokens=20, cache_read_input_tokens=48
+        )
+
+        recorder.record(WordCountClient(), turn.pk, 'anthropic/claude-3-5-haiku', PROMPT, usage=usage)
+
+        stats = TokenUsageStats.objects.get(turn=turn)
+        self.assertEqual(stats.api_reported_cached_prompt_tokens, 48)
+        self.assertIsNone(stats.api_reported_thinking_tokens)
+        self.assertIsNone(stats.prompt_payload)
+
+    def test_sampling(self):
+        turns = self.create_turns(4)
+        self.assertIsNone(self.make_recorder(sample_rate=0).record(WordCountClient(), turns[0].pk, 'm', PROMPT))
+
+        recorder = self.make_recorder(sample_rate=0.5)
+        with mock.patch('api.services.usage_recorder.random.random', side_effect=[0.2, 0.7, 0.49, 0.5]):
+            sampled = [recorder.record(WordCountClient(), turn.pk, 'm', PROMPT) is not None for turn in turns]
+
+        self.assertEqual(sampled, [True, False, True, False])
+        self.assertEqual(TokenUsageStats.objects.count(), 2)
+
+
+class UsageRecorderDrainTests(RecorderTestMixin, TransactionTestCase):
+
+    def test_drain_waits_for_background_writes(self):
+        turns = self.create_turns(3)
+        recorder = UsageRecorder()
+
+        for turn in turns:
+            recorder.record(WordCountClient(delay=0.02), turn.pk, 'm', PROMPT)
+        recorder.drain(timeout=10)
+
+        self.assertEqual(AdventureTurn.objects.filter(token_usage__isnull=False).count(), 3)
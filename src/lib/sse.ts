@@ -1,6 +1,8 @@
 /**
  * Stream SSE (Server-Sent Events) from backend endpoint.
  * Handles the backend format: data: {"chunk": "text"}
+ * Dropped connections are resumed with the Last-Event-ID header; the backend
+ * replays the events that were missed.
  * 
  * @param url - The SSE endpoint URL (POST request with JSON body)
  * @param options - Callbacks and abort signal
@@ -13,17 +15,52 @@ export async function streamSSE(
     onComplete: () => void
     signal?: AbortSignal
     body?: Record<string, any>
+    maxReconnects?: number
   }
 ): Promise<void> {
   const { onMessage, onError, onComplete, signal, body } = options
+  const maxReconnects = options.maxReconnects ?? 3
+
+  // Id of the last event received; a reconnect resumes after it
+  let lastEventId: string | null = null
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const finished = await readStream(lastEventId)
+      if (finished) return
+    } catch (error) {
+      if (error instanceof Error && error.name === 'AbortError') {
+        onComplete()
+        return
+      }
+      // Network errors are retried once an event id is known: the server
+      // keeps generating and replays the missed events
+      if (lastEventId === null || attempt >= maxReconnects) {
+        onError(error instanceof Error ? error : new Error('Unknown error during SSE streaming'))
+        return
+      }
+      continue
+    }
+    // The connection closed without [DONE]: resume if possible
+    if (lastEventId === null || attempt >= maxReconnects) {
+      onComplete()
+      return
+    }
+  }
+
+  /** Read one connection; returns true once the stream has ended. */
+  async function readStream(resumeAfter: string | null): Promise<boolean> {
+    const headers: Record<string, string> = {
+      'Accept': 'text/event-stream',
+      'Content-Type': 'application/json',
+    }
+    if (resumeAfter) {
+      headers['Last-Event-ID'] = resumeAfter
+    }
 
-  try {
     const response = await fetch(url, {
       method: 'POST',
-      headers: {
-        'Accept': 'text/event-stream',
-        'Content-Type': 'application/json',
-      },
+      headers,
       body: body ? JSON.stringify(body) : undefined,
       signal,
     })
@@ -44,8 +81,7 @@ export async function streamSSE(
       const { done, value } = await reader.read()
 
       if (done) {
-        onComplete()
-        break
+        return false
       }
 
       // Decode chunk and add to buffer
@@ -58,6 +94,12 @@ export async function streamSSE(
       for (const message of messages) {
         if (!message.trim()) continue
 
+        // Remember the event id for reconnects
+        const idMatch = message.match(/^id: (.+)$/m)
+        if (idMatch) {
+          lastEventId = idMatch[1]
+        }
+
         // Parse SSE data line
         const dataMatch = message.match(/^data: (.+)$/m)
         if (!dataMatch) continue
@@ -67,7 +109,7 @@ export async function streamSSE(
         // Check for completion signal
         if (data === '[DONE]') {
           onComplete()
-          return
+          return true
         }
 
         try {
@@ -76,7 +118,7 @@ export async function streamSSE(
           
           if (parsed.error) {
             onError(new Error(parsed.error))
-            return
+            return true
           }
           
           if (parsed.chunk) {
@@ -87,15 +129,5 @@ export async function streamSSE(
         }
       }
     }
-  } catch (error) {
-    if (error instanceof Error) {
-      if (error.name === 'AbortError') {
-        onComplete()
-      } else {
-        onError(error)
-      }
-    } else {
-      onError(new Error('Unknown error during SSE streaming'))
-    }
   }
 }